@@ -0,0 +1,250 @@
+"""benchmarks of the hot paths of a simulation on the bundled model in `data/`.
+
+Usage (from the root of the repository):
+
+    python benchmarks/run_benchmarks.py --output benchmarks/results.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --tolerance 0.25
+    python benchmarks/run_benchmarks.py --curves benchmarks/curves.json
+
+The results are written as JSON: per benchmark the median, minimum and maximum time per call [s] over the
+repeats. If a baseline (a previous results file) is specified, every benchmark is compared to it and the
+script exits with status 1 if any benchmark is slower than the baseline by more than the tolerance.
+The accuracy-vs-cost curves contain, per failure probability estimator and number of draws, the time per
+estimate and the relative standard error of the estimated failure probability.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import tempfile
+import statistics
+import numpy as np
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from hofss import Simulator, Structure, bendingMomentULS, __version__  # noqa: E402
+
+DATA_DIRECTORY = os.path.join(ROOT_DIRECTORY, "data")
+BENCHMARK_SEEDS = (1, 2, 3, 4, 5)
+"the seeds that every call of a simulation benchmark simulates, such that every call does the same work"
+
+
+def benchmark(function: callable, repeat: int = 5, min_time: float = 0.2) -> dict[str, float]:
+    """times a function: the number of calls per repeat is chosen such that a repeat takes at least `min_time`
+
+    Args:
+        function (callable): the function to time, without arguments
+        repeat (int, optional): the number of repeats. Defaults to 5.
+        min_time (float, optional): the minimum time of a repeat [s]. Defaults to 0.2.
+
+    Returns:
+        dict[str, float]: the median, minimum and maximum time per call [s] and the number of calls per repeat
+    """
+    timer = timeit.Timer(function)
+    number, time_taken = timer.autorange()
+    number = max(1, round(number * min_time / time_taken))
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {"median": statistics.median(times), "min": min(times), "max": max(times), "number": number}
+
+
+def benchmark_cases(output_directory: str, quick: bool = False) -> dict[str, callable]:
+    """creates the benchmarked functions, by their names. The benchmarks that draw errors or multipliers run
+    for all of `BENCHMARK_SEEDS` per call, each with a generator of its own, such that the timings of a baseline
+    and a candidate compare the same work.
+
+    Args:
+        output_directory (str): the directory to which the results of the writing benchmark are written
+        quick (bool, optional): if True, the expensive benchmarks use fewer draws. Defaults to False.
+
+    Returns:
+        dict[str, callable]: the functions, without arguments
+    """
+    simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+    simulator_without_check = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+    structure = simulator.structure
+    parameter = next(parameter for parameter in structure.parameters if parameter.standard_deviation > 0)
+    factor = simulator.tasks[0].task_type.factors[0]
+    task = simulator.tasks[0]
+    initial_failure_probabilities = {"bendingMomentULS": 1.5e-4, "total": 1.5e-4}
+    parameter_values = structure.draw_parameter_values(int(1e5))
+    number_of_simulation_draws = 1e4 if quick else 1e5
+    results_df = simulator.simulate(1, 1e3, 1e3, initial_failure_probabilities)
+
+    cases = {
+        "Parameter.draw[1e5]": lambda: parameter.draw(1e5),
+        "bendingMomentULS[1e5]": lambda: bendingMomentULS(**parameter_values),
+        f"Factor.draw_multiplier[{len(BENCHMARK_SEEDS)} seeds]": lambda: [
+            factor.draw_multiplier(np.random.default_rng(seed)) for seed in BENCHMARK_SEEDS
+        ],
+        f"Task.do_task[{len(BENCHMARK_SEEDS)} seeds]": lambda: [
+            task.do_task(np.random.default_rng(seed)) for seed in BENCHMARK_SEEDS
+        ],
+    }
+    for number_of_draws in [1e3, 1e4, 1e5] if quick else [1e3, 1e4, 1e5, 1e6]:
+        cases[f"Structure.calculate_failure_probabilities[{number_of_draws:.0e}]"] = (
+            lambda number_of_draws=number_of_draws: structure.calculate_failure_probabilities(
+                number_of_draws, number_of_draws
+            )
+        )
+    for name, case_simulator in [("check", simulator), ("no_check", simulator_without_check)]:
+        cases[f"Simulator.simulate[{name},{number_of_simulation_draws:.0e},{len(BENCHMARK_SEEDS)} seeds]"] = (
+            lambda case_simulator=case_simulator: [
+                case_simulator.simulate(
+                    seed, number_of_simulation_draws, number_of_simulation_draws, initial_failure_probabilities
+                )
+                for seed in BENCHMARK_SEEDS
+            ]
+        )
+    cases[f"Simulator.simulate_error_path[{len(BENCHMARK_SEEDS)} seeds]"] = lambda: [
+        simulator.simulate_error_path(seed) for seed in BENCHMARK_SEEDS
+    ]
+    cases["Simulator.parse_from_directory"] = lambda: Simulator.parse_from_directory(DATA_DIRECTORY)
+    cases["Structure.parse_from_file"] = lambda: Structure.parse_from_file(
+        os.path.join(DATA_DIRECTORY, "structure.csv")
+    )
+    cases["write_results"] = lambda: results_df.to_csv(os.path.join(output_directory, "1.csv"), index=False)
+    return cases
+
+
+def accuracy_vs_cost(
+    draws: list[int] = (1e3, 1e4, 1e5, 1e6), number_of_estimates: int = 20, number_of_states: int = 64,
+    seed: int = 1
+) -> list[dict]:
+    """determines the accuracy and cost of the failure probability estimators for several numbers of draws.
+
+    The estimators are the crude Monte Carlo estimator of one state
+    (`Structure.calculate_failure_probabilities`) and the batched estimator of many states with common random
+    numbers (`Structure.calculate_failure_probabilities_batch`), of which the cost is given per state. The
+    accuracy is the relative standard error of repeated estimates of the failure probability of the initial
+    structure.
+
+    Args:
+        draws (list[int], optional): the numbers of draws. Defaults to (1e3, 1e4, 1e5, 1e6).
+        number_of_estimates (int, optional): the number of repeated estimates per point. Defaults to 20.
+        number_of_states (int, optional): the number of states per batch. Defaults to 64.
+        seed (int, optional): the seed of the batched estimator. Defaults to 1.
+
+    Returns:
+        list[dict]: per estimator and number of draws: the time per estimate [s], the mean and relative
+        standard error of the estimates
+    """
+    structure = Simulator.parse_from_directory(DATA_DIRECTORY).structure
+    initial_state = structure.initial_state()
+    rng = np.random.default_rng(seed)
+
+    # the batch contains the initial state and states with a mutated parameter
+    states = [initial_state.as_tuple()]
+    while len(states) < number_of_states:
+        state = initial_state.copy()
+        state.multiply(state.names[rng.integers(len(state.names))], rng.lognormal(0, 0.3))
+        states.append(state.as_tuple())
+
+    curves = []
+    for number_of_draws in draws:
+        number_of_draws = int(number_of_draws)
+        estimators = {
+            "crude": (1, lambda: structure.calculate_failure_probabilities(
+                number_of_draws, number_of_draws, initial_state, rng
+            )["total"]),
+            "batch": (number_of_states, lambda: structure.calculate_failure_probabilities_batch(
+                states, number_of_draws, number_of_draws, seed=int(rng.integers(2**32))
+            )["total"].iloc[0]),
+        }
+        for name, (states_per_estimate, estimator) in estimators.items():
+            estimates = []
+            start = time.perf_counter()
+            for _ in range(number_of_estimates):
+                estimates.append(estimator())
+            seconds = (time.perf_counter() - start) / number_of_estimates / states_per_estimate
+            mean = float(np.mean(estimates))
+            curves.append({
+                "estimator": name,
+                "draws": number_of_draws,
+                "seconds_per_estimate": seconds,
+                "mean": mean,
+                "relative_standard_error": float(np.std(estimates, ddof=1) / mean) if mean > 0 else float("nan"),
+            })
+    return curves
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """compares benchmark results to a baseline
+
+    Args:
+        results (dict): the benchmark results
+        baseline (dict): the benchmark results of the baseline
+        tolerance (float): the allowed relative slowdown of the median time
+
+    Returns:
+        list[str]: the names of the benchmarks that are slower than the baseline by more than the tolerance
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            print(f"{name:<60}{'(new)':>12}")
+            continue
+        ratio = result["median"] / baseline["benchmarks"][name]["median"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<60}{ratio:>11.2f}x{flag}")
+    return regressions
+
+
+def main(arguments: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", help="the file to write the results to")
+    parser.add_argument("--baseline", help="a results file to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="the allowed relative slowdown")
+    parser.add_argument("--curves", help="the file to write the accuracy-vs-cost curves to")
+    parser.add_argument("--filter", default="", help="only run the benchmarks of which the name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of repeats per benchmark")
+    parser.add_argument("--quick", action="store_true", help="use fewer draws and shorter repeats")
+    arguments = parser.parse_args(arguments)
+
+    results = {
+        "environment": {
+            "hofss": __version__, "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "cpu_count": os.cpu_count(),
+        },
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory() as output_directory:
+        for name, function in benchmark_cases(output_directory, arguments.quick).items():
+            if arguments.filter not in name:
+                continue
+            results["benchmarks"][name] = benchmark(function, arguments.repeat, 0.05 if arguments.quick else 0.2)
+            print(f"{name:<60}{1e3 * results['benchmarks'][name]['median']:>12.3f} ms")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if arguments.curves is not None:
+        draws = (1e3, 1e4, 1e5) if arguments.quick else (1e3, 1e4, 1e5, 1e6)
+        curves = accuracy_vs_cost(draws)
+        for point in curves:
+            print(
+                f"{point['estimator']:<8}{point['draws']:>10d}{1e3 * point['seconds_per_estimate']:>12.3f} ms"
+                f"{point['relative_standard_error']:>10.3f}"
+            )
+        with open(arguments.curves, "w") as f:
+            json.dump(curves, f, indent=2)
+
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, arguments.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {arguments.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,16 @@
-from .data_structures import Factor, Parameter, TaskType, FactorLevel
+from .data_structures import Factor, Parameter, TaskType, FactorLevel, StructureState
 from .failure_modes import failure_mode_functions, bendingMomentULS
 from .src import Task, Check, Structure, Scenario, Simulator
+from .src import ErrorBiasing, InflatedErrorBiasing, StratifiedErrorBiasing, NestedEstimator
+from .src import LatinHypercubeDesign, SurrogateLimitState, BaseSample, SimulationService, SimulationClient
+from .src import SystemReliability, Profiler, profiler
 
 from ._version import __version__
+
+
+def __getattr__(name: str):
+    # imported on first use, see hofss.src
+    if name in ("Campaign", "StoppingRule", "CampaignScheduler", "Variant", "analysis"):
+        from . import src
+        return getattr(src, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
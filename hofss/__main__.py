@@ -0,0 +1,139 @@
+"""the command line interface of hofss, see `python -m hofss --help`"""
+import os
+import sys
+import logging
+import argparse
+
+
+def rerun(args: argparse.Namespace) -> int:
+    """brings the results of a campaign up to date with the input files of its model, see `Campaign.rerun`"""
+    from .src import Simulator
+    from .src.campaign import METADATA_FILENAME, Campaign, StoppingRule
+    from .src.dependencies import read_metadata
+
+    old_metadata = read_metadata(os.path.join(args.output_directory, METADATA_FILENAME))
+    if old_metadata is None:
+        print(f"no campaign metadata found in {args.output_directory}", file=sys.stderr)
+        return 1
+    settings = old_metadata["settings"]
+    if settings["biasing"] is not None or settings["factor_design"] is not None:
+        print(
+            "the campaign was run with a biasing or factor design, which cannot be restored from its metadata: "
+            "rerun it with `Campaign.rerun`", file=sys.stderr
+        )
+        return 1
+
+    simulator = Simulator.load_from_directory(
+        args.input_directory, number_of_initial_draws=args.initial_draws,
+        include_check=old_metadata["model"]["check"] is not None
+    )
+    number_of_parameter_draws = settings["number_of_parameter_draws"]
+    if args.number_of_parameter_draws is not None:
+        number_of_parameter_draws = args.number_of_parameter_draws
+    parameter_draw_batch_size = settings["parameter_draw_batch_size"]
+    if args.parameter_draw_batch_size is not None:
+        parameter_draw_batch_size = args.parameter_draw_batch_size
+    campaign = Campaign(
+        simulator, args.output_directory, number_of_parameter_draws, parameter_draw_batch_size,
+        stopping_rule=StoppingRule(**settings["stopping_rule"]), first_seed=settings["first_seed"]
+    )
+
+    plan = campaign.plan_rerun()
+    print("\n".join(plan.reasons) if plan.reasons else "the results are up to date")
+    if args.dry_run:
+        return 0
+    print(campaign.rerun(number_of_workers=args.workers).to_string())
+    return 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    """serves a simulator that is kept warm for interactive queries, see `service.SimulationService`"""
+    from .src import Simulator
+    from .src.service import SimulationService, serve as serve_service
+
+    simulator = Simulator.load_from_directory(
+        args.input_directory, number_of_initial_draws=args.initial_draws, include_check=True
+    )
+    if args.base_sample_draws is not None:
+        simulator.structure.retain_base_sample(args.base_sample_draws, args.parameter_draw_batch_size)
+    service = SimulationService(
+        simulator, args.number_of_parameter_draws, args.parameter_draw_batch_size, args.workers, args.max_seeds,
+        args.max_parameter_draws
+    )
+    serve_service(service, args.host, args.port)
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    """runs a command
+
+    Args:
+        argv (list[str], optional): the command line arguments. Defaults to None, i.e. those of this process.
+
+    Returns:
+        int: the exit status
+    """
+    parser = argparse.ArgumentParser(prog="hofss", description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rerun_parser = subparsers.add_parser(
+        "rerun", help="recompute only what is affected by changes of the model of a campaign"
+    )
+    rerun_parser.add_argument("input_directory", help="the directory containing the input files of the model")
+    rerun_parser.add_argument("output_directory", help="the output directory of the campaign")
+    rerun_parser.add_argument("--workers", type=int, default=5, help="the number of workers (default: 5)")
+    rerun_parser.add_argument("--dry-run", action="store_true", help="only print what would be recomputed")
+    rerun_parser.add_argument(
+        "--number-of-parameter-draws", type=float, default=None,
+        help="the number of draws per failure probability calculation (default: that of the results)"
+    )
+    rerun_parser.add_argument(
+        "--parameter-draw-batch-size", type=float, default=None,
+        help="the number of draws per batch (default: that of the results)"
+    )
+    rerun_parser.add_argument(
+        "--initial-draws", type=float, default=None,
+        help="the number of draws of the failure probabilities of the initial structure, if the structure changed "
+        "(default: 1e8)"
+    )
+    rerun_parser.set_defaults(function=rerun)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="keep a simulator warm in a local process and answer queries over HTTP"
+    )
+    serve_parser.add_argument("input_directory", help="the directory containing the input files of the model")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="the address to listen on (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="the port to listen on (default: 8765)")
+    serve_parser.add_argument("--workers", type=int, default=4, help="the number of workers (default: 4)")
+    serve_parser.add_argument(
+        "--number-of-parameter-draws", type=float, default=1e6,
+        help="the default number of draws per failure probability calculation (default: 1e6)"
+    )
+    serve_parser.add_argument(
+        "--parameter-draw-batch-size", type=float, default=1e6, help="the number of draws per batch (default: 1e6)"
+    )
+    serve_parser.add_argument(
+        "--initial-draws", type=float, default=1e7,
+        help="the number of draws of the failure probabilities of the initial structure (default: 1e7)"
+    )
+    serve_parser.add_argument(
+        "--base-sample-draws", type=float, default=None,
+        help="the number of draws of a retained sample of the structure, with which the failure probabilities of "
+        "mutated states are estimated by reweighting (default: no retained sample)"
+    )
+    serve_parser.add_argument(
+        "--max-seeds", type=int, default=10000, help="the largest number of seeds of a request (default: 10000)"
+    )
+    serve_parser.add_argument(
+        "--max-parameter-draws", type=float, default=1e8,
+        help="the largest number of draws per failure probability calculation of a request (default: 1e8)"
+    )
+    serve_parser.set_defaults(function=serve)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,3 +3,4 @@ from .parameter import Parameter
 from .factor_level import FactorLevel
 
 from .task_type import TaskType
+from .structure_state import StructureState
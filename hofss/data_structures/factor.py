@@ -1,7 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
 import random
-import pandas as pd
 import numpy as np
 
 from .factor_level import FactorLevel
@@ -88,7 +87,18 @@ class Factor:
 
         effect_draw = rng.uniform(0, 1)
         multiplier_draw = rng.uniform(0, 1)
+        return self.multiplier_from_draws(effect_draw, multiplier_draw)
 
+    def multiplier_from_draws(self, effect_draw: float, multiplier_draw: float) -> tuple[float, FactorLevel]:
+        """determines the multiplier and factor level that follow from the draws of a uniform distribution.
+
+        Args:
+            effect_draw (float): the draw that determines the effect (negative, none or positive), between [0,1]
+            multiplier_draw (float): the draw that determines the multiplier and the factor level, between [0,1]
+
+        Returns:
+            tuple[float, FactorLevel]: the multiplier and the factor level
+        """
         factor_level = None
         if multiplier_draw < 0.05:
             factor_level = FactorLevel.OBVIOUS
@@ -107,6 +117,30 @@ class Factor:
 
         return effect, factor_level
 
+    def multipliers_from_draws(self, effect_draws: np.ndarray, multiplier_draws: np.ndarray) -> np.ndarray:
+        """determines the multipliers that follow from arrays of draws of a uniform distribution, see
+        `multiplier_from_draws`.
+
+        Args:
+            effect_draws (np.ndarray): the draws that determine the effects, between [0,1]
+            multiplier_draws (np.ndarray): the draws that determine the multipliers, between [0,1]
+
+        Returns:
+            np.ndarray: the multipliers
+        """
+        effect_draws = np.asarray(effect_draws, dtype=float)
+        multiplier_draws = np.asarray(multiplier_draws, dtype=float)
+        p_values = [0, 0.05, 0.5, 0.95, 1]
+        negative_values = [self.m_neg_lower, self.m_neg_5, self.m_neg_50, self.m_neg_95, self.m_neg_upper]
+        positive_values = [self.m_pos_lower, self.m_pos_5, self.m_pos_50, self.m_pos_95, self.m_pos_upper]
+
+        negative = effect_draws < self.p_negative_effect
+        positive = ~negative & (effect_draws > (1-self.p_positive_effect))
+        multipliers = np.ones(effect_draws.shape)
+        multipliers[negative] = np.interp(multiplier_draws[negative], p_values, negative_values)
+        multipliers[positive] = np.interp(multiplier_draws[positive], p_values, positive_values)
+        return multipliers
+
     @classmethod
     def parse_from_file(cls, data_file_path) -> list[Factor]:
         """parses all factors from a data file.
@@ -124,6 +158,7 @@ class Factor:
         Returns:
             list[Factor]: the factors contained in the specified data file
         """
+        import pandas as pd
         factor_data = pd.read_csv(data_file_path, index_col=0, header=0)
 
         factors = []
@@ -0,0 +1,154 @@
+from __future__ import annotations
+import math
+from typing import Iterable
+from dataclasses import dataclass
+import numpy as np
+
+from .parameter import Parameter
+
+
+DISTRIBUTION_TYPES = ("normal", "lognormal", "gamma", "exponential")
+"the supported distribution types, the code of a distribution type is its index"
+
+
+@dataclass
+class StructureState:
+    """the state of the parameters of a structure, stored as contiguous arrays (one element per parameter).
+
+    A state is cheap to copy and mutate, so every simulation can work on its own copy of the initial state
+    instead of copying the parameter definitions of the structure. The values of many states can be stacked
+    into a 2-D array (see `stack`) to evaluate them at once.
+    """
+
+    names: tuple[str, ...]
+    "the names of the parameters"
+    index: dict[str, int]
+    "the index of each parameter by its name"
+    values: np.ndarray
+    "the (nominal) values of the parameters"
+    standard_deviations: np.ndarray
+    "the standard deviations of the parameters"
+    distribution_codes: np.ndarray
+    "the distribution type of each parameter, as an index of `DISTRIBUTION_TYPES`"
+
+    @classmethod
+    def from_parameters(cls, parameters: list[Parameter]) -> StructureState:
+        """creates the state of a list of parameters
+
+        Args:
+            parameters (list[Parameter]): the parameters
+
+        Returns:
+            StructureState: the state of the parameters
+        """
+        distribution_codes = []
+        for parameter in parameters:
+            function_name = parameter.distribution_function.__name__
+            if function_name not in DISTRIBUTION_TYPES:
+                raise ValueError(f"unknown distribution type of parameter '{parameter.name}': {function_name}")
+            distribution_codes.append(DISTRIBUTION_TYPES.index(function_name))
+        names = tuple(parameter.name for parameter in parameters)
+        return cls(
+            names=names,
+            index={name: i for i, name in enumerate(names)},
+            values=np.array([parameter.value for parameter in parameters], dtype=float),
+            standard_deviations=np.array([parameter.standard_deviation for parameter in parameters], dtype=float),
+            distribution_codes=np.array(distribution_codes, dtype=np.int8)
+        )
+
+    def copy(self) -> StructureState:
+        """copies this state, only the values are copied as they are the only part that is mutated"""
+        return StructureState(
+            self.names, self.index, self.values.copy(), self.standard_deviations, self.distribution_codes
+        )
+
+    def multiply(self, name: str, multiplier: float):
+        """multiplies the value of a parameter in place
+
+        Args:
+            name (str): the name of the parameter
+            multiplier (float): the multiplier
+        """
+        self.values[self.index[name]] *= multiplier
+        return
+
+    def as_tuple(self) -> tuple[float, ...]:
+        """the values of this state as a (hashable) tuple"""
+        return tuple(self.values.tolist())
+
+    def draw(self, rng: np.random.Generator, n: int, names: Iterable[str] = None) -> dict[str, np.ndarray | float]:
+        """draws n values of each parameter from its distribution, in the same way (and order) as
+        `Parameter.draw` does for each parameter of a structure
+
+        Args:
+            rng (np.random.Generator): the random number generator
+            n (int): the number of values to draw per parameter
+            names (Iterable[str], optional): the names of the parameters to draw, these are drawn in the order
+            of this state. Defaults to None, i.e. all parameters.
+
+        Returns:
+            dict[str, np.ndarray | float]: the drawn values by the names of the parameters, parameters without
+            a standard deviation have their value instead
+        """
+        names = None if names is None else set(names)
+        draws = {}
+        for name, value, standard_deviation, code in zip(
+            self.names, self.values.tolist(), self.standard_deviations.tolist(), self.distribution_codes.tolist()
+        ):
+            if names is not None and name not in names:
+                continue
+            if standard_deviation == 0:
+                draws[name] = value
+                continue
+            distribution_type = DISTRIBUTION_TYPES[code]
+            if distribution_type == "lognormal":
+                mu = math.log(value**2 / math.sqrt(value**2 + standard_deviation**2))
+                sigma = math.sqrt(math.log(1 + (standard_deviation**2) / (value**2)))
+                draws[name] = rng.lognormal(mu, sigma, int(n))
+            elif distribution_type == "gamma":
+                draws[name] = rng.gamma(value ** 2 / standard_deviation ** 2, standard_deviation ** 2 / value, int(n))
+            else:
+                draws[name] = getattr(rng, distribution_type)(value, standard_deviation, int(n))
+        return draws
+
+    def log_density(self, name: str, x: np.ndarray) -> np.ndarray | None:
+        """the log probability density of draws of a parameter under its distribution in this state, see `draw`
+
+        Args:
+            name (str): the name of the parameter
+            x (np.ndarray): the draws of the parameter
+
+        Returns:
+            np.ndarray | None: the log density of each draw, None if the parameter has no standard deviation or
+            its density is not supported (an exponential distribution or a non-positive value of a lognormal or
+            gamma distribution)
+        """
+        i = self.index[name]
+        value, standard_deviation = float(self.values[i]), float(self.standard_deviations[i])
+        distribution_type = DISTRIBUTION_TYPES[self.distribution_codes[i]]
+        if standard_deviation == 0:
+            return None
+        if distribution_type == "normal":
+            normalization = math.log(standard_deviation * math.sqrt(2 * math.pi))
+            return -0.5 * ((x - value) / standard_deviation) ** 2 - normalization
+        if distribution_type == "exponential" or value <= 0:
+            return None
+        if distribution_type == "lognormal":
+            mu = math.log(value**2 / math.sqrt(value**2 + standard_deviation**2))
+            sigma = math.sqrt(math.log(1 + (standard_deviation**2) / (value**2)))
+            log_x = np.log(x)
+            return -0.5 * ((log_x - mu) / sigma) ** 2 - log_x - math.log(sigma * math.sqrt(2 * math.pi))
+        shape, scale = value ** 2 / standard_deviation ** 2, standard_deviation ** 2 / value
+        return (shape - 1) * np.log(x) - x / scale - shape * math.log(scale) - math.lgamma(shape)
+
+    @staticmethod
+    def stack(states: list[StructureState]) -> np.ndarray:
+        """stacks the values of states into one array
+
+        Args:
+            states (list[StructureState]): the states, all of the same structure
+
+        Returns:
+            np.ndarray: the values of the states, with shape (number of states, number of parameters)
+        """
+        return np.stack([state.values for state in states])
@@ -1,6 +1,5 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-import pandas as pd
 
 from .factor import Factor
 
@@ -35,6 +34,7 @@ class TaskType:
         Returns:
             list[TaskType]: the task types contained in the specified data file
         """
+        import pandas as pd
         factor_lookup_table = {factor.name: factor for factor in hofs}
         task_type_data = pd.read_csv(data_file_path, index_col=0)
         task_types = []
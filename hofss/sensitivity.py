@@ -0,0 +1,268 @@
+from __future__ import annotations
+import dataclasses
+from concurrent.futures import Executor
+from typing import Iterable
+import numpy as np
+import pandas as pd
+
+from .src import Simulator
+
+
+INPUT_KINDS = ("factor", "nhep", "check", "parameter")
+
+
+@dataclasses.dataclass
+class SensitivityInput:
+    """an input of a sensitivity analysis: a multiplier on a quantity of the model that is uniformly
+    distributed between a lower and upper bound.
+
+    Depending on its kind, the input multiplies the probability of a negative effect of a factor ('factor'), the
+    nominal HEP of a task type ('nhep'), the effectiveness of the check ('check') or the mean of a structural
+    parameter ('parameter').
+    """
+
+    name: str
+    "the name of this input"
+    kind: str
+    "the kind of this input: 'factor', 'nhep', 'check' or 'parameter'"
+    target: str = None
+    "the name of the factor, task type or parameter this input applies to"
+    lower: float = 0.5
+    "the lower bound of the multiplier"
+    upper: float = 1.5
+    "the upper bound of the multiplier"
+
+    def __post_init__(self):
+        if self.kind not in INPUT_KINDS:
+            raise ValueError(f"kind should be one of {INPUT_KINDS}; received: {self.kind}")
+        if self.lower > self.upper:
+            raise ValueError(f"lower bound of input '{self.name}' is larger than its upper bound")
+        return
+
+
+def default_inputs(
+    simulator: Simulator, factor_range: tuple[float, float] = (0.5, 1.5), nhep_range: tuple[float, float] = (0.5, 2.0),
+    check_range: tuple[float, float] = (0.8, 1.2), parameter_range: tuple[float, float] = (0.9, 1.1)
+) -> list[SensitivityInput]:
+    """creates the inputs of a sensitivity analysis for all factors, task types, the check and the structural
+    parameters of a simulator
+
+    Args:
+        simulator (Simulator): the simulator
+        factor_range (tuple[float, float], optional): the range of the multiplier on the probability of a
+        negative effect of each factor. Defaults to (0.5, 1.5).
+        nhep_range (tuple[float, float], optional): the range of the multiplier on the nominal HEP of each task
+        type. Defaults to (0.5, 2.0).
+        check_range (tuple[float, float], optional): the range of the multiplier on the effectiveness of the
+        check. Defaults to (0.8, 1.2).
+        parameter_range (tuple[float, float], optional): the range of the multiplier on the mean of each
+        structural parameter. Defaults to (0.9, 1.1).
+
+    Returns:
+        list[SensitivityInput]: the inputs
+    """
+    factors, task_types = {}, {}
+    for task in simulator.tasks:
+        task_types[task.task_type.name] = task.task_type
+        for factor in task.task_type.factors:
+            factors[factor.name] = factor
+
+    inputs = [
+        SensitivityInput(factor.name, "factor", factor.name, *factor_range)
+        for factor in sorted(factors.values(), key=lambda factor: Simulator._data_column_sort_key(factor.name))
+    ]
+    inputs.extend(
+        SensitivityInput(f"nhep_{name}", "nhep", name, *nhep_range)
+        for name in sorted(task_types, key=Simulator._data_column_sort_key)
+    )
+    if simulator.check is not None:
+        inputs.append(SensitivityInput("check", "check", None, *check_range))
+    inputs.extend(
+        SensitivityInput(parameter.name, "parameter", parameter.name, *parameter_range)
+        for parameter in simulator.structure.parameters
+    )
+    return inputs
+
+
+def saltelli_design(number_of_inputs: int, number_of_samples: int, rng: np.random.Generator = None) -> np.ndarray:
+    """creates the sample design of Saltelli for the estimation of first order and total Sobol indices
+
+    Args:
+        number_of_inputs (int): the number of inputs d
+        number_of_samples (int): the number of base samples N
+        rng (np.random.Generator, optional): the random number generator. Defaults to None.
+
+    Returns:
+        np.ndarray: the design of shape (d + 2, N, d) with values between [0,1]: the matrices A, B and, for
+        each input i, the matrix A with column i taken from B
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    a = rng.uniform(0, 1, (number_of_samples, number_of_inputs))
+    b = rng.uniform(0, 1, (number_of_samples, number_of_inputs))
+    design = np.empty((number_of_inputs + 2, number_of_samples, number_of_inputs))
+    design[0], design[1] = a, b
+    for i in range(number_of_inputs):
+        design[i + 2] = a
+        design[i + 2, :, i] = b[:, i]
+    return design
+
+
+def _sobol_estimates(outputs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """estimates the first order (Saltelli 2010) and total (Jansen) indices from the outputs of a design"""
+    y_a, y_b, y_ab = outputs[0], outputs[1], outputs[2:]
+    variance = np.var(np.concatenate([y_a, y_b]), ddof=1)
+    if variance == 0:
+        return np.full(len(y_ab), np.nan), np.full(len(y_ab), np.nan)
+    first_order = np.mean(y_b * (y_ab - y_a), axis=1) / variance
+    total = 0.5 * np.mean((y_a - y_ab) ** 2, axis=1) / variance
+    return first_order, total
+
+
+def sobol_indices(
+    simulator: Simulator, inputs: list[SensitivityInput] = None, number_of_samples: int = 64,
+    seeds: Iterable[int] = range(1, 1001), number_of_parameter_draws: int = 1e5,
+    parameter_draw_batch_size: int = 1e5, number_of_resamples: int = 200, confidence_level: float = 0.95,
+    failure_mode: str = "total", seed: int = None, executor: Executor = None, states_per_chunk: int = 1024,
+    max_batch_elements: int = 4e6, states_per_job: int = 64
+) -> pd.DataFrame:
+    """estimates the first order and total Sobol indices of the mean final failure probability of a campaign.
+
+    The error paths of the campaign are simulated once, with their draws recorded. Inputs that affect the
+    occurrence of errors (factors, nominal HEPs and the check) are evaluated by reweighting these error paths
+    (see `Simulator.reweight`), inputs that affect the structure by evaluating the failure probabilities of the
+    final states of the error paths with common random numbers. Rows of the Saltelli design that only differ in
+    inputs of the first kind share their failure probability calculations, so a full analysis costs one
+    campaign of error paths plus one batched evaluation of the final states per distinct structural row. The
+    final states of the distinct structural rows are evaluated in chunks of `states_per_chunk` states, each in
+    passes of at most `max_batch_elements` draws per parameter (per job of the executor), which bounds the
+    memory in use regardless of the number of inputs and seeds.
+
+    Args:
+        simulator (Simulator): the simulator of the campaign
+        inputs (list[SensitivityInput], optional): the inputs of the analysis. Defaults to the inputs created by
+        `default_inputs`.
+        number_of_samples (int, optional): the number of base samples N of the Saltelli design.
+        Defaults to 64.
+        seeds (Iterable[int], optional): the seeds of the error paths of the campaign. Defaults to 1..1000.
+        number_of_parameter_draws (int, optional): the number of draws per failure probability calculation.
+        Defaults to 1e5.
+        parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e5.
+        number_of_resamples (int, optional): the number of bootstrap resamples of the confidence intervals.
+        Defaults to 200.
+        confidence_level (float, optional): the confidence level of the confidence intervals. Defaults to 0.95.
+        failure_mode (str, optional): the failure mode of which the failure probability is analysed.
+        Defaults to "total".
+        seed (int, optional): the seed of the design, the base variates and the bootstrap. Defaults to None.
+        executor (Executor, optional): the executor that simulates the error paths and evaluates the failure
+        probabilities in parallel. Defaults to None, i.e. everything is done in this process.
+        states_per_chunk (int, optional): the number of (scaled final) states that are evaluated at once.
+        Defaults to 1024.
+        max_batch_elements (int, optional): the maximum number of draws per parameter of a pass, see
+        `Structure.calculate_failure_probabilities_batch`. Defaults to 4e6.
+        states_per_job (int, optional): the number of states per job of the executor. Defaults to 64.
+
+    Returns:
+        pd.DataFrame: per input, the first order index 'S1' and total index 'ST' with the lower and upper
+        bounds of their confidence intervals
+    """
+    if inputs is None:
+        inputs = default_inputs(simulator)
+    rng = np.random.default_rng(seed)
+    base_variates_seed = int(rng.integers(2**32))
+    structure = simulator.structure
+    parameter_indices = {parameter.name: j for j, parameter in enumerate(structure.parameters)}
+    factors = {factor.name: factor for task in simulator.tasks for factor in task.task_type.factors}
+    task_types = {task.task_type.name: task.task_type for task in simulator.tasks}
+
+    # simulate the error paths once, recording their draws such that they can be reweighted
+    seeds = list(seeds)
+    if executor is None:
+        error_paths = dict(zip(seeds, (simulator.simulate_error_path(s, record_draws=True) for s in seeds)))
+    else:
+        error_paths = dict(zip(seeds, executor.map(
+            simulator.simulate_error_path, seeds, [None] * len(seeds), [True] * len(seeds)
+        )))
+    log_likelihood_ratios, recorded_draws = simulator.recorded_draws(
+        {path_seed: path_df for path_seed, (path_df, _) in error_paths.items()}
+    )
+    final_states, final_state_ids = {}, []
+    for path_df, states in error_paths.values():
+        final_state_ids.append(final_states.setdefault(states[path_df["state"].iloc[-1]], len(final_states)))
+    final_state_values = np.array(list(final_states.keys()), dtype=float)
+    final_state_ids = np.array(final_state_ids)
+
+    # map the design to the multipliers of the inputs
+    design = saltelli_design(len(inputs), number_of_samples, rng)
+    lower = np.array([model_input.lower for model_input in inputs])
+    upper = np.array([model_input.upper for model_input in inputs])
+    multipliers = lower + design * (upper - lower)
+
+    # the parameter multipliers of each design row, rows that only differ in other inputs share their evaluation
+    parameter_multipliers = np.ones(multipliers.shape[:2] + (len(structure.parameters),))
+    for i, model_input in enumerate(inputs):
+        if model_input.kind == "parameter":
+            parameter_multipliers[:, :, parameter_indices[model_input.target]] = multipliers[:, :, i]
+    distinct_multipliers, multiplier_ids = np.unique(
+        parameter_multipliers.reshape(-1, len(structure.parameters)), axis=0, return_inverse=True
+    )
+    multiplier_ids = multiplier_ids.reshape(multipliers.shape[:2])
+
+    # evaluate the failure probabilities of the final states for all distinct parameter multipliers, in chunks of
+    # states that share the base variates (the same seed)
+    number_of_parameters = len(structure.parameters)
+    rows_per_chunk = max(1, int(states_per_chunk) // len(final_state_values))
+    failure_probabilities = np.empty((len(distinct_multipliers), len(final_state_values)))
+    for start in range(0, len(distinct_multipliers), rows_per_chunk):
+        chunk = distinct_multipliers[start:start + rows_per_chunk]
+        scaled_states = chunk[:, np.newaxis, :] * final_state_values[np.newaxis, :, :]
+        failure_probabilities[start:start + len(chunk)] = structure.calculate_failure_probabilities_batch(
+            scaled_states.reshape(-1, number_of_parameters), number_of_parameter_draws, parameter_draw_batch_size,
+            seed=base_variates_seed, max_batch_elements=max_batch_elements, executor=executor,
+            states_per_job=states_per_job
+        )[failure_mode].to_numpy().reshape(len(chunk), len(final_state_values))
+
+    # determine the output (the weighted mean final failure probability) of each row of the design
+    outputs = np.empty(multipliers.shape[:2])
+    for matrix_index in range(multipliers.shape[0]):
+        for sample_index in range(multipliers.shape[1]):
+            row = multipliers[matrix_index, sample_index]
+            modified_factors, nheps, check_effectiveness = [], {}, None
+            for model_input, multiplier in zip(inputs, row):
+                if model_input.kind == "factor":
+                    factor = factors[model_input.target]
+                    p_negative_effect = min(factor.p_negative_effect * multiplier, 1 - factor.p_positive_effect)
+                    modified_factors.append(dataclasses.replace(
+                        factor, p_negative_effect=p_negative_effect,
+                        p_no_effect=1 - factor.p_positive_effect - p_negative_effect
+                    ))
+                elif model_input.kind == "nhep":
+                    nheps[model_input.target] = task_types[model_input.target].nhep * multiplier
+                elif model_input.kind == "check":
+                    check_effectiveness = min(simulator.check.effectiveness * multiplier, 1.0)
+            weights = simulator.likelihood_ratios(
+                log_likelihood_ratios, recorded_draws, modified_factors, nheps, check_effectiveness
+            )
+            final_failure_probabilities = failure_probabilities[multiplier_ids[matrix_index, sample_index]]
+            outputs[matrix_index, sample_index] = (
+                np.sum(weights * final_failure_probabilities[final_state_ids]) / np.sum(weights)
+            )
+
+    # estimate the indices and their bootstrap confidence intervals
+    first_order, total = _sobol_estimates(outputs)
+    resampled_first_order, resampled_total = [], []
+    for _ in range(number_of_resamples):
+        resample = rng.integers(0, number_of_samples, number_of_samples)
+        resample_first_order, resample_total = _sobol_estimates(outputs[:, resample])
+        resampled_first_order.append(resample_first_order)
+        resampled_total.append(resample_total)
+    alpha = (1 - confidence_level) / 2
+    quantiles = [100 * alpha, 100 * (1 - alpha)]
+    first_order_bounds = np.nanpercentile(resampled_first_order, quantiles, axis=0)
+    total_bounds = np.nanpercentile(resampled_total, quantiles, axis=0)
+
+    return pd.DataFrame({
+        "S1": first_order, "S1_lower": first_order_bounds[0], "S1_upper": first_order_bounds[1],
+        "ST": total, "ST_lower": total_bounds[0], "ST_upper": total_bounds[1]
+    }, index=[model_input.name for model_input in inputs])
@@ -1,5 +1,28 @@
+import importlib
+
 from .task import Task
 from .check import Check
 from .structure import Structure
 from .scenario import Scenario
 from .simulator import Simulator
+from .biasing import ErrorBiasing, InflatedErrorBiasing, StratifiedErrorBiasing
+from .design import LatinHypercubeDesign
+from .surrogate import SurrogateLimitState
+from .base_sample import BaseSample
+from .system_reliability import SystemReliability
+from .nested import NestedEstimator
+from .service import SimulationService, SimulationClient
+from .profiling import Profiler, profiler
+
+# the campaign and analysis modules work on DataFrames throughout, they (and pandas) are imported on first use
+_lazy_attributes = {
+    "Campaign": "campaign", "StoppingRule": "campaign", "CampaignScheduler": "scheduler", "Variant": "scheduler",
+    "analysis": None
+}
+
+
+def __getattr__(name: str):
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{_lazy_attributes[name] or name}")
+    return module if _lazy_attributes[name] is None else getattr(module, name)
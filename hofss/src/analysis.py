@@ -0,0 +1,243 @@
+from __future__ import annotations
+import os
+import re
+from statistics import NormalDist
+from typing import Iterable
+import numpy as np
+import pandas as pd
+
+
+def _as_bool(values: pd.Series) -> pd.Series:
+    """interprets a column of booleans, that may have been written to and read from a file, as booleans"""
+    return values.astype(str).str.lower().eq("true")
+
+
+def read_simulations(directory: str) -> dict[int, pd.DataFrame]:
+    """reads the simulation results of a campaign, i.e. the files named `<seed>.csv`, from a directory
+
+    Args:
+        directory (str): the directory containing the simulation results
+
+    Returns:
+        dict[int, pd.DataFrame]: the simulation results by their seeds
+    """
+    simulations = {}
+    for filename in sorted(os.listdir(directory)):
+        re_result = re.fullmatch(r"(\d+)\.csv", filename)
+        if re_result is None:
+            continue
+        simulations[int(re_result.group(1))] = pd.read_csv(os.path.join(directory, filename))
+    return simulations
+
+
+def final_results(simulations: dict[int, pd.DataFrame] | Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """summarizes each simulation by its final state.
+
+    The failure probability columns are those that have a value for the initial structure (the first row of a
+    simulation). The weight of a simulation is its likelihood ratio if it was simulated with a biasing, 1 otherwise.
+
+    Args:
+        simulations (dict[int, pd.DataFrame] | Iterable[pd.DataFrame]): the simulation results, by their seeds
+
+    Returns:
+        pd.DataFrame: per simulation: the final failure probabilities, the number of errors and uncorrected errors,
+        whether an uncorrected error occurred and the weight
+    """
+    if not isinstance(simulations, dict):
+        simulations = dict(enumerate(simulations))
+
+    rows = {}
+    for seed, simulation_df in simulations.items():
+        initial_row = simulation_df.iloc[0]
+        failure_mode_columns = [
+            column for column in simulation_df.columns
+            if column != "likelihood_ratio" and pd.notna(initial_row[column])
+        ]
+        task_rows = simulation_df.iloc[1:]
+        errors = _as_bool(task_rows["error_occurred"])
+        uncorrected_errors = errors & ~_as_bool(task_rows["error_corrected"])
+
+        row = {column: float(simulation_df[column].iloc[-1]) for column in failure_mode_columns}
+        row["number_of_errors"] = int(errors.sum())
+        row["number_of_uncorrected_errors"] = int(uncorrected_errors.sum())
+        row["uncorrected_error"] = bool(uncorrected_errors.any())
+        row["weight"] = float(initial_row["likelihood_ratio"]) if "likelihood_ratio" in simulation_df else 1.0
+        rows[seed] = row
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def effective_sample_size(weights: np.ndarray) -> float:
+    """determines the (Kish) effective sample size of weighted samples
+
+    Args:
+        weights (np.ndarray): the weights of the samples
+
+    Returns:
+        float: the effective sample size
+    """
+    weights = np.asarray(weights, dtype=float)
+    sum_of_squares = np.sum(weights ** 2)
+    if sum_of_squares == 0:
+        return 0.0
+    return float(np.sum(weights) ** 2 / sum_of_squares)
+
+
+def weighted_mean(values: np.ndarray, weights: np.ndarray = None) -> tuple[float, float]:
+    """estimates the mean of weighted samples with the unbiased importance sampling estimator mean(w * x)
+
+    Args:
+        values (np.ndarray): the sampled values
+        weights (np.ndarray, optional): the weights (likelihood ratios) of the samples. Defaults to None,
+        i.e. all weights are 1.
+
+    Returns:
+        tuple[float, float]: the estimated mean and its standard error
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    weighted_values = weights * values
+    if len(values) < 2:
+        return float(np.mean(weighted_values)), np.nan
+    return float(np.mean(weighted_values)), float(np.std(weighted_values, ddof=1) / np.sqrt(len(values)))
+
+
+def weighted_quantile(values: np.ndarray, quantiles: Iterable[float], weights: np.ndarray = None) -> np.ndarray:
+    """estimates quantiles of weighted samples from their self-normalized cumulative distribution
+
+    Args:
+        values (np.ndarray): the sampled values
+        quantiles (Iterable[float]): the quantiles to estimate, each between [0,1]
+        weights (np.ndarray, optional): the weights (likelihood ratios) of the samples. Defaults to None,
+        i.e. all weights are 1.
+
+    Returns:
+        np.ndarray: the estimated quantiles
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    order = np.argsort(values)
+    cumulative_weights = np.cumsum(weights[order])
+    cumulative_weights /= cumulative_weights[-1]
+    indices = np.searchsorted(cumulative_weights, np.asarray(list(quantiles), dtype=float), side="left")
+    return values[order][np.minimum(indices, len(values) - 1)]
+
+
+def summarize(
+    simulations: dict[int, pd.DataFrame] | Iterable[pd.DataFrame], quantiles: Iterable[float] = (0.5, 0.9, 0.99),
+    failure_mode: str = "total", weights: pd.Series = None
+) -> pd.Series:
+    """estimates the quantities that are reported of a campaign, taking the weights of biased simulations
+    into account.
+
+    Args:
+        simulations (dict[int, pd.DataFrame] | Iterable[pd.DataFrame]): the simulation results, by their seeds
+        quantiles (Iterable[float], optional): the quantiles of the final failure probability to estimate.
+        Defaults to (0.5, 0.9, 0.99).
+        failure_mode (str, optional): the failure mode of which the failure probability is summarized.
+        Defaults to "total".
+        weights (pd.Series, optional): the weights of the simulations by their seeds, e.g. as determined by
+        `Simulator.reweight`. Defaults to None, i.e. the weights of the simulations themselves.
+
+    Returns:
+        pd.Series: the mean final failure probability and the probability of an uncorrected error (with their
+        standard errors), the quantiles of the final failure probability, the number of simulations and the
+        effective sample size
+    """
+    results = final_results(simulations)
+    if weights is not None:
+        results["weight"] = weights.reindex(results.index)
+    weights = results["weight"].to_numpy(dtype=float)
+
+    summary = {}
+    summary["mean"], summary["mean_se"] = weighted_mean(results[failure_mode], weights)
+    for quantile, value in zip(quantiles, weighted_quantile(results[failure_mode], quantiles, weights)):
+        summary[f"q{quantile:g}"] = value
+    summary["p_uncorrected_error"], summary["p_uncorrected_error_se"] = weighted_mean(
+        results["uncorrected_error"], weights
+    )
+    summary["number_of_simulations"] = len(results)
+    summary["effective_sample_size"] = effective_sample_size(weights)
+    return pd.Series(summary)
+
+
+class RunningEstimates:
+    """running estimates, with confidence intervals, of the quantities that are reported of a campaign: the mean
+    and quantiles of the final failure probability and the probability of an uncorrected error.
+
+    Simulations can be added one by one as they complete. The weights of biased simulations are taken into
+    account as in `summarize`; the confidence intervals of the quantiles are distribution free (order
+    statistics), based on the effective sample size.
+    """
+
+    def __init__(
+        self, quantiles: Iterable[float] = (0.95, 0.99), failure_mode: str = "total", confidence_level: float = 0.95
+    ) -> None:
+        """
+        Args:
+            quantiles (Iterable[float], optional): the quantiles of the final failure probability to track.
+            Defaults to (0.95, 0.99).
+            failure_mode (str, optional): the failure mode of which the failure probability is tracked.
+            Defaults to "total".
+            confidence_level (float, optional): the confidence level of the confidence intervals.
+            Defaults to 0.95.
+        """
+        self.quantiles = list(quantiles)
+        self.failure_mode = failure_mode
+        self.confidence_level = confidence_level
+        self.seeds = []
+        self.failure_probabilities = []
+        self.uncorrected_errors = []
+        self.weights = []
+        return
+
+    @property
+    def number_of_simulations(self) -> int:
+        """the number of simulations added so far"""
+        return len(self.seeds)
+
+    def add(self, seed: int, simulation_df: pd.DataFrame):
+        """adds the results of a simulation
+
+        Args:
+            seed (int): the seed of the simulation
+            simulation_df (pd.DataFrame): the results of the simulation
+        """
+        result = final_results({seed: simulation_df}).iloc[0]
+        self.seeds.append(seed)
+        self.failure_probabilities.append(result[self.failure_mode])
+        self.uncorrected_errors.append(result["uncorrected_error"])
+        self.weights.append(result["weight"])
+        return
+
+    def estimates(self) -> pd.DataFrame:
+        """determines the estimates and their confidence intervals from the simulations added so far
+
+        Returns:
+            pd.DataFrame: per quantity ('mean', 'p_uncorrected_error' and 'q<quantile>'), the estimate, the lower
+            and upper bound of its confidence interval and the half width of the interval relative to the estimate
+        """
+        z = NormalDist().inv_cdf(0.5 + self.confidence_level / 2)
+        weights = np.array(self.weights, dtype=float)
+        failure_probabilities = np.array(self.failure_probabilities, dtype=float)
+
+        rows = {}
+        for name, values in [("mean", failure_probabilities), ("p_uncorrected_error", self.uncorrected_errors)]:
+            estimate, standard_error = weighted_mean(values, weights) if len(weights) > 0 else (np.nan, np.nan)
+            rows[name] = (estimate, estimate - z * standard_error, estimate + z * standard_error)
+
+        sample_size = effective_sample_size(weights)
+        for quantile in self.quantiles:
+            if sample_size == 0:
+                rows[f"q{quantile:g}"] = (np.nan, np.nan, np.nan)
+                continue
+            margin = z * np.sqrt(quantile * (1 - quantile) / sample_size)
+            rows[f"q{quantile:g}"] = tuple(weighted_quantile(
+                failure_probabilities, [quantile, max(0.0, quantile - margin), min(1.0, quantile + margin)], weights
+            ))
+
+        estimates_df = pd.DataFrame.from_dict(rows, orient="index", columns=["estimate", "lower", "upper"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            estimates_df["relative_half_width"] = (
+                (estimates_df["upper"] - estimates_df["lower"]) / 2 / estimates_df["estimate"].abs()
+            )
+        return estimates_df
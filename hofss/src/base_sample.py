@@ -0,0 +1,143 @@
+from __future__ import annotations
+import numpy as np
+
+from .profiling import profiler
+from ..data_structures import StructureState
+
+
+# the sample that was last drawn again after a base sample was copied to this process, by its key (see
+# `BaseSample._key`), such that a worker draws a base sample only once instead of once per copy. Only the most
+# recent sample is kept, such that a worker that receives many base samples does not retain all of them.
+_redrawn_samples = {}
+
+
+class BaseSample:
+    """a retained sample of the parameters of a structure in its initial state, with the outcome of each failure
+    mode in every draw.
+
+    The failure probabilities of a state in which only the values of random parameters differ from the initial
+    state are estimated by reweighting the sample with the likelihood ratio of its draws: the product over the
+    changed parameters of their density in the state divided by their density in the initial state. This
+    costs one vectorized weight computation instead of new draws and failure function evaluations. A state
+    cannot be reweighted if a parameter without standard deviation changed (the failure functions themselves
+    change), or if the effective sample size of the weights is below `min_effective_sample_fraction` of the
+    sample; its failure probabilities are then determined with new draws.
+
+    A copy of a base sample in another process (e.g. a worker of a process pool) does not contain the sample,
+    the sample is drawn again from its seed once per process.
+    """
+
+    def __init__(
+        self, initial_state: StructureState, failure_modes: list[callable], number_of_draws: int = 1e6,
+        parameter_draw_batch_size: int = 1e6, min_effective_sample_fraction: float = 0.1, seed: int = None
+    ) -> None:
+        """
+        Args:
+            initial_state (StructureState): the initial state of the structure
+            failure_modes (list[callable]): the failure modes of the structure
+            number_of_draws (int, optional): the number of draws of the sample. Defaults to 1e6.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            min_effective_sample_fraction (float, optional): the minimum effective sample size of the weights
+            of a state, as a fraction of the number of draws. Defaults to 0.1.
+            seed (int, optional): the seed of the sample. Defaults to None.
+        """
+        if not 0 < min_effective_sample_fraction <= 1:
+            raise ValueError(
+                "min_effective_sample_fraction must lie between 0 and 1, "
+                f"received value: {min_effective_sample_fraction}"
+            )
+        self.initial_state = initial_state
+        self.failure_modes = failure_modes
+        self.number_of_draws = int(number_of_draws)
+        self.parameter_draw_batch_size = int(parameter_draw_batch_size)
+        self.min_effective_sample_fraction = min_effective_sample_fraction
+        self.seed = np.random.SeedSequence(seed).entropy
+        self._sample = self._draw()
+        return
+
+    def __getstate__(self) -> dict:
+        # the sample is not copied to other processes, see `_draw`
+        state = self.__dict__.copy()
+        state["_sample"] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        key = self._key()
+        self._sample = _redrawn_samples.get(key)
+        if self._sample is None:
+            self._sample = self._draw()
+            _redrawn_samples.clear()
+            _redrawn_samples[key] = self._sample
+        return
+
+    def _key(self) -> tuple:
+        return (
+            self.seed, self.number_of_draws, self.initial_state.as_tuple(),
+            tuple(failure_mode.__name__ for failure_mode in self.failure_modes)
+        )
+
+    def _draw(self) -> dict:
+        """draws the sample and evaluates the failure modes in every draw
+
+        Returns:
+            dict: the draws of the random parameters by their names ('values'), the log density of each draw
+            in the initial state by the names of the parameters ('log_densities', determined on first use)
+            and the indices of the draws in which each failure mode (the last one is the total) occurred
+            ('failures')
+        """
+        rng = np.random.default_rng(self.seed)
+        values, failures = {}, [[] for _ in range(len(self.failure_modes) + 1)]
+        number_of_total_draws = 0
+        while number_of_total_draws < self.number_of_draws:
+            number_of_draws = min(self.parameter_draw_batch_size, self.number_of_draws - number_of_total_draws)
+            number_of_total_draws += number_of_draws
+            parameter_values = self.initial_state.draw(rng, number_of_draws)
+            batch_failures = np.array([failure_mode(**parameter_values) < 0 for failure_mode in self.failure_modes])
+            batch_failures = np.broadcast_to(batch_failures, (len(self.failure_modes), number_of_draws))
+            for i, failure_occured in enumerate([*batch_failures, np.any(batch_failures, axis=0)]):
+                failures[i].append(number_of_total_draws - number_of_draws + np.flatnonzero(failure_occured))
+            for name, draws in parameter_values.items():
+                if np.ndim(draws) > 0:
+                    values.setdefault(name, []).append(draws)
+        profiler.count("parameter_draws", self.number_of_draws)
+        return {
+            "values": {name: np.concatenate(draws) for name, draws in values.items()},
+            "log_densities": {},
+            "failures": [np.concatenate(indices) for indices in failures],
+        }
+
+    def failure_probabilities(self, state: StructureState) -> dict[str, float] | None:
+        """estimates the failure probabilities of a state by reweighting the sample
+
+        Args:
+            state (StructureState): the state of the structure
+
+        Returns:
+            dict[str, float] | None: the failure probability per failure mode and in total, None if the state
+            cannot be reweighted
+        """
+        changed = np.flatnonzero(state.values != self.initial_state.values)
+        log_weights = np.zeros(self.number_of_draws)
+        for i in changed.tolist():
+            name = state.names[i]
+            if name not in self._sample["values"]:
+                return None
+            draws = self._sample["values"][name]
+            log_density = state.log_density(name, draws)
+            initial_log_density = self._sample["log_densities"].get(name)
+            if initial_log_density is None:
+                initial_log_density = self.initial_state.log_density(name, draws)
+                self._sample["log_densities"][name] = initial_log_density
+            if log_density is None or initial_log_density is None:
+                return None
+            log_weights += log_density - initial_log_density
+        weights = np.exp(log_weights)
+        effective_sample_size = np.sum(weights) ** 2 / np.sum(weights ** 2)
+        if effective_sample_size < self.min_effective_sample_fraction * self.number_of_draws:
+            return None
+        names = [failure_mode.__name__ for failure_mode in self.failure_modes]
+        return {
+            name: float(np.sum(weights[indices]) / self.number_of_draws)
+            for name, indices in zip([*names, "total"], self._sample["failures"])
+        }
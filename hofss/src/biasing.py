@@ -0,0 +1,180 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+class ErrorBiasing(ABC):
+    """a biased sampling distribution for the occurrence and correction of human errors.
+
+    A biasing decides for all tasks of a simulation at once whether an error occurs and whether it is corrected,
+    and returns the likelihood ratio of the sampled outcome: the probability of the outcome under the actual
+    distribution divided by its probability under the biased distribution. Weighting each simulation with its
+    likelihood ratio yields unbiased estimates (see `hofss.src.analysis`).
+    """
+
+    @abstractmethod
+    def sample_errors(
+        self, error_probabilities: np.ndarray, correction_probability: float = None, rng: np.random.Generator = None
+    ) -> tuple[np.ndarray, np.ndarray, float]:
+        """samples which tasks lead to an error and which of those errors are corrected
+
+        Args:
+            error_probabilities (np.ndarray): the Human Error Probability (HEP) of each task
+            correction_probability (float, optional): the probability that an error is corrected by a check.
+            Defaults to None, i.e. no check is done.
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, float]: whether an error occurred per task, whether it was corrected
+            per task, and the likelihood ratio of the sampled outcome
+        """
+        raise NotImplementedError
+
+
+class InflatedErrorBiasing(ErrorBiasing):
+    """biases the sampling by inflating the error probability of each task and the probability that an error
+    is not corrected with a multiplier
+    """
+
+    def __init__(
+        self, error_multiplier: float = 3.0, non_correction_multiplier: float = 1.0, max_probability: float = 0.9
+    ) -> None:
+        """
+        Args:
+            error_multiplier (float, optional): the multiplier on the error probability of each task.
+            Defaults to 3.
+            non_correction_multiplier (float, optional): the multiplier on the probability that an error is not
+            corrected. Defaults to 1.
+            max_probability (float, optional): the maximum inflated probability, probabilities that are larger
+            than this are not inflated. Defaults to 0.9.
+        """
+        if error_multiplier < 1 or non_correction_multiplier < 1:
+            raise ValueError("the multipliers of an inflated error biasing should be at least 1")
+        if max_probability <= 0 or max_probability >= 1:
+            raise ValueError(f"max_probability must lie between 0 and 1, received value: {max_probability}")
+        self.error_multiplier = error_multiplier
+        self.non_correction_multiplier = non_correction_multiplier
+        self.max_probability = max_probability
+        return
+
+    def _inflate(self, probabilities: np.ndarray, multiplier: float) -> np.ndarray:
+        probabilities = np.clip(probabilities, 0, 1)
+        return np.maximum(probabilities, np.minimum(probabilities * multiplier, self.max_probability))
+
+    def sample_errors(
+        self, error_probabilities: np.ndarray, correction_probability: float = None, rng: np.random.Generator = None
+    ) -> tuple[np.ndarray, np.ndarray, float]:
+
+        if rng is None:
+            rng = np.random.default_rng()
+
+        error_probabilities = np.clip(np.asarray(error_probabilities, dtype=float), 0, 1)
+        biased_error_probabilities = self._inflate(error_probabilities, self.error_multiplier)
+        errors = rng.uniform(0, 1, len(error_probabilities)) < biased_error_probabilities
+        with np.errstate(divide="ignore", invalid="ignore"):
+            likelihood_ratio = np.prod(np.where(
+                errors, error_probabilities / biased_error_probabilities,
+                (1 - error_probabilities) / (1 - biased_error_probabilities)
+            ))
+
+        corrected = np.zeros(len(error_probabilities), dtype=bool)
+        if correction_probability is None:
+            return errors, corrected, float(likelihood_ratio)
+
+        non_correction_probability = 1 - correction_probability
+        biased_non_correction_probability = float(
+            self._inflate(np.array([non_correction_probability]), self.non_correction_multiplier)[0]
+        )
+        corrected = errors & (rng.uniform(0, 1, len(error_probabilities)) >= biased_non_correction_probability)
+        number_of_corrections = np.sum(corrected)
+        number_of_non_corrections = np.sum(errors) - number_of_corrections
+        if number_of_corrections > 0:
+            correction_ratio = correction_probability / (1 - biased_non_correction_probability)
+            likelihood_ratio *= correction_ratio ** number_of_corrections
+        if number_of_non_corrections > 0:
+            non_correction_ratio = non_correction_probability / biased_non_correction_probability
+            likelihood_ratio *= non_correction_ratio ** number_of_non_corrections
+        return errors, corrected, float(likelihood_ratio)
+
+
+class StratifiedErrorBiasing(ErrorBiasing):
+    """biases the sampling by forcing the number of uncorrected errors in a simulation (a stratum).
+
+    First the number of uncorrected errors k is drawn from the specified stratum probabilities, then the tasks
+    with an uncorrected error are drawn from their actual distribution conditioned on there being exactly k of
+    them. The likelihood ratio is the actual probability of k uncorrected errors divided by the probability of
+    the stratum. Strata without a probability are never sampled, so estimates only cover the specified strata.
+    """
+
+    def __init__(self, stratum_probabilities: dict[int, float]) -> None:
+        """
+        Args:
+            stratum_probabilities (dict[int, float]): the probability of sampling each stratum, by the number of
+            uncorrected errors of the stratum
+        """
+        if len(stratum_probabilities) == 0:
+            raise ValueError("at least one stratum should be specified")
+        if round(sum(stratum_probabilities.values()), 3) != 1.0:
+            raise ValueError(f"sum of stratum probabilities should be 1, is: {sum(stratum_probabilities.values())}")
+        self.strata = np.array([int(k) for k in stratum_probabilities])
+        self.stratum_probabilities = np.array(list(stratum_probabilities.values()), dtype=float)
+        if np.any(self.strata < 0) or np.any(self.stratum_probabilities < 0):
+            raise ValueError("strata and their probabilities should not be negative")
+        return
+
+    @staticmethod
+    def _count_probabilities(probabilities: np.ndarray, max_count: int) -> np.ndarray:
+        """determines the probability of exactly r successes among tasks i..n-1, for all i and r <= max_count"""
+        number_of_tasks = len(probabilities)
+        count_probabilities = np.zeros((number_of_tasks + 1, max_count + 1))
+        count_probabilities[number_of_tasks, 0] = 1
+        for i in range(number_of_tasks - 1, -1, -1):
+            count_probabilities[i] = (1 - probabilities[i]) * count_probabilities[i + 1]
+            count_probabilities[i, 1:] += probabilities[i] * count_probabilities[i + 1, :-1]
+        return count_probabilities
+
+    def sample_errors(
+        self, error_probabilities: np.ndarray, correction_probability: float = None, rng: np.random.Generator = None
+    ) -> tuple[np.ndarray, np.ndarray, float]:
+
+        if rng is None:
+            rng = np.random.default_rng()
+
+        error_probabilities = np.clip(np.asarray(error_probabilities, dtype=float), 0, 1)
+        if correction_probability is None:
+            correction_probability = 0.0
+        uncorrected_probabilities = error_probabilities * (1 - correction_probability)
+
+        stratum_sampling_probabilities = self.stratum_probabilities / self.stratum_probabilities.sum()
+        number_of_errors = int(rng.choice(self.strata, p=stratum_sampling_probabilities))
+        stratum_probability = self.stratum_probabilities[self.strata == number_of_errors].sum()
+        if number_of_errors > len(error_probabilities):
+            raise ValueError(f"stratum of {number_of_errors} uncorrected errors exceeds the number of tasks")
+        count_probabilities = self._count_probabilities(uncorrected_probabilities, number_of_errors)
+        probability_of_stratum = count_probabilities[0, number_of_errors]
+        if probability_of_stratum == 0:
+            # this stratum cannot occur, the simulation does not contribute to any estimate
+            no_errors = np.zeros(len(error_probabilities), dtype=bool)
+            return no_errors, no_errors, 0.0
+
+        # draw the tasks with an uncorrected error, conditioned on there being exactly k of them
+        uncorrected = np.zeros(len(error_probabilities), dtype=bool)
+        remaining_errors = number_of_errors
+        for i, probability in enumerate(uncorrected_probabilities):
+            if remaining_errors == 0:
+                break
+            conditional_probability = probability * (
+                count_probabilities[i + 1, remaining_errors - 1] / count_probabilities[i, remaining_errors]
+            )
+            if rng.uniform(0, 1) < conditional_probability:
+                uncorrected[i] = True
+                remaining_errors -= 1
+
+        # the other tasks may still have led to an error that was corrected
+        corrected_probabilities = np.divide(
+            error_probabilities * correction_probability, 1 - uncorrected_probabilities,
+            out=np.zeros(len(error_probabilities)), where=uncorrected_probabilities < 1
+        )
+        corrected = ~uncorrected & (rng.uniform(0, 1, len(error_probabilities)) < corrected_probabilities)
+
+        return uncorrected | corrected, corrected, float(probability_of_stratum / stratum_probability)
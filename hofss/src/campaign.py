@@ -0,0 +1,395 @@
+from __future__ import annotations
+import os
+import re
+import time
+import logging
+import dataclasses
+from dataclasses import dataclass, field
+from traceback import format_exc
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+
+from .simulator import Simulator
+from .biasing import ErrorBiasing
+from .design import LatinHypercubeDesign
+from .analysis import RunningEstimates
+from .profiling import profiler
+from .dependencies import RerunPlan, describe, model_hashes, normalize, plan_rerun, read_metadata, write_metadata
+from .._version import __version__
+
+
+METADATA_FILENAME = "campaign.json"
+"the name of the file in the output directory of a campaign that contains the metadata of its results"
+
+
+@dataclass
+class StoppingRule:
+    """a rule that stops a campaign once the estimates of the reported quantities are precise enough.
+
+    The quantities are the mean final failure probability ('mean'), the probability of an uncorrected error
+    ('p_uncorrected_error') and quantiles of the final failure probability ('q<quantile>', e.g. 'q0.95').
+    """
+
+    targets: dict[str, float] = field(default_factory=lambda: {"mean": 0.05, "p_uncorrected_error": 0.05})
+    "the maximum half width of the confidence interval relative to the estimate, by quantity"
+    min_simulations: int = 1000
+    "the minimum number of simulations before the campaign may stop"
+    max_simulations: int = 100000
+    "the maximum number of simulations of the campaign"
+    check_interval: int = 100
+    "the number of completed simulations between evaluations of the rule"
+    confidence_level: float = 0.95
+    "the confidence level of the confidence intervals"
+
+    @property
+    def quantiles(self) -> list[float]:
+        """the quantiles of the final failure probability that are targeted by this rule"""
+        return [float(quantity[1:]) for quantity in self.targets if quantity.startswith("q")]
+
+    def is_satisfied(self, estimates: RunningEstimates) -> bool:
+        """determines whether the campaign may stop
+
+        Args:
+            estimates (RunningEstimates): the running estimates of the campaign
+
+        Returns:
+            bool: True if the minimum number of simulations is reached and all targets are met, or if the maximum
+            number of simulations is reached. A rule without targets is only satisfied by the maximum.
+        """
+        if estimates.number_of_simulations >= self.max_simulations:
+            return True
+        if estimates.number_of_simulations < self.min_simulations or not self.targets:
+            return False
+        relative_half_widths = estimates.estimates()["relative_half_width"]
+        return all(
+            relative_half_widths.get(quantity, float("inf")) <= target for quantity, target in self.targets.items()
+        )
+
+
+class Campaign:
+    """a campaign of simulations of which the results are written to an output directory, one file per seed.
+
+    Simulations are run by a pool of workers until a stopping rule is satisfied. Seeds of which an output file
+    already exists are not simulated again, but their results do count towards the estimates.
+
+    The output directory also contains the metadata of the results (see `metadata`): the hashes of the elements
+    of the model and the settings of the simulations. A campaign does not continue with results of which the
+    model or settings differ, these are brought up to date with `rerun`, which only recomputes what is affected
+    by the changes.
+    """
+
+    def __init__(
+        self, simulator: Simulator, output_directory: str, number_of_parameter_draws: int = 5e6,
+        parameter_draw_batch_size: int = 5e6, initial_failure_probabilities: dict[str: float] = None,
+        stopping_rule: StoppingRule = None, first_seed: int = 1, biasing: ErrorBiasing = None,
+        report_interval: float = 60.0, factor_design: LatinHypercubeDesign = None
+    ) -> None:
+        """
+        Args:
+            simulator (Simulator): the simulator of the campaign
+            output_directory (str): the directory to which the results are written
+            number_of_parameter_draws (int, optional): the number of draws per failure probability calculation.
+            Defaults to 5e6.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 5e6.
+            initial_failure_probabilities (dict[str: float], optional): the failure probabilities of the
+            initial structure. Defaults to None, i.e. those of the simulator or, if unknown, these are determined
+            with 1e8 draws before the campaign starts.
+            stopping_rule (StoppingRule, optional): the rule that determines when the campaign stops.
+            Defaults to a rule without targets, i.e. the campaign stops after its maximum number of simulations.
+            first_seed (int, optional): the seed of the first simulation, subsequent simulations use subsequent
+            seeds. Defaults to 1.
+            biasing (ErrorBiasing, optional): the biased distribution of the errors, see `Simulator.simulate`.
+            Defaults to None.
+            report_interval (float, optional): the number of seconds between reports of the progress of the
+            campaign. Defaults to 60.
+            factor_design (LatinHypercubeDesign, optional): the stratified design of the factor draws of the
+            seeds, see `Simulator.simulate`. Its batches are best aligned with the first seed of the campaign.
+            Defaults to None, i.e. independent factor draws.
+        """
+        self.simulator = simulator
+        self.output_directory = output_directory
+        self.number_of_parameter_draws = number_of_parameter_draws
+        self.parameter_draw_batch_size = parameter_draw_batch_size
+        self.initial_failure_probabilities = initial_failure_probabilities
+        self.stopping_rule = StoppingRule(targets={}) if stopping_rule is None else stopping_rule
+        self.first_seed = first_seed
+        self.biasing = biasing
+        self.report_interval = report_interval
+        self.factor_design = factor_design
+        self._pid = os.getpid()
+        return
+
+    def output_file(self, seed: int) -> str:
+        """the path of the output file of a seed"""
+        return os.path.join(self.output_directory, f"{seed}.csv")
+
+    @property
+    def metadata_file(self) -> str:
+        """the path of the metadata file of the results of this campaign"""
+        return os.path.join(self.output_directory, METADATA_FILENAME)
+
+    def metadata(self) -> dict:
+        """the metadata of the results of this campaign
+
+        Returns:
+            dict: the version of this package, the hashes of the elements of the model (see
+            `dependencies.model_hashes`) and the settings of the simulations, as read back from the metadata file
+        """
+        initial_failure_probabilities = self.initial_failure_probabilities
+        if initial_failure_probabilities is None:
+            initial_failure_probabilities = self.simulator.initial_failure_probabilities
+        if initial_failure_probabilities is not None:
+            initial_failure_probabilities = {
+                failure_mode: float(failure_probability)
+                for failure_mode, failure_probability in dict(initial_failure_probabilities).items()
+            }
+        return normalize({
+            "version": __version__,
+            "model": model_hashes(self.simulator),
+            "settings": {
+                "number_of_parameter_draws": int(self.number_of_parameter_draws),
+                "parameter_draw_batch_size": int(self.parameter_draw_batch_size),
+                "initial_failure_probabilities": initial_failure_probabilities,
+                "biasing": describe(self.biasing),
+                "factor_design": describe(self.factor_design),
+                "first_seed": self.first_seed,
+                "stopping_rule": dataclasses.asdict(self.stopping_rule),
+            },
+        })
+
+    def plan_rerun(self) -> RerunPlan:
+        """determines what has to be recomputed of the existing results of this campaign, see
+        `dependencies.plan_rerun`
+
+        Raises:
+            FileNotFoundError: if the output directory contains no metadata
+
+        Returns:
+            RerunPlan: the plan
+        """
+        old_metadata = read_metadata(self.metadata_file)
+        if old_metadata is None:
+            raise FileNotFoundError(f"no campaign metadata found: {self.metadata_file}")
+        return plan_rerun(old_metadata, self.metadata())
+
+    def _determine_initial_failure_probabilities(self, old_metadata: dict = None, plan: RerunPlan = None):
+        """determines the failure probabilities of the initial structure, if not specified: those of the
+        simulator, those of the existing results if the structure did not change, or with 1e8 draws"""
+        if self.initial_failure_probabilities is None:
+            self.initial_failure_probabilities = self.simulator.initial_failure_probabilities
+        if self.initial_failure_probabilities is None and old_metadata is not None and not plan.structure_changed:
+            self.initial_failure_probabilities = old_metadata["settings"]["initial_failure_probabilities"]
+        if self.initial_failure_probabilities is None:
+            self.initial_failure_probabilities = self.simulator.structure.calculate_failure_probabilities(1e8, 1e7)
+            logging.info(f"determined initial failure probabilities:\n{self.initial_failure_probabilities}")
+        return
+
+    def _seeds_with_results(self) -> list[int]:
+        """the seeds of which the output directory contains results"""
+        seeds = []
+        for filename in os.listdir(self.output_directory):
+            re_result = re.fullmatch(r"(\d+)\.csv", filename)
+            if re_result is not None:
+                seeds.append(int(re_result.group(1)))
+        return sorted(seeds)
+
+    def simulate_seed(self, seed: int) -> pd.DataFrame:
+        """simulates a seed and writes its results to its output file. If the simulation fails, the traceback is
+        written to a log file instead.
+
+        Args:
+            seed (int): the seed to simulate
+
+        Returns:
+            pd.DataFrame: the results of the simulation, None if the simulation failed
+        """
+        try:
+            simulation_df = self.simulator.simulate(
+                seed, self.number_of_parameter_draws, self.parameter_draw_batch_size,
+                self.initial_failure_probabilities, biasing=self.biasing, factor_design=self.factor_design
+            )
+            with profiler.timer("write_results"):
+                simulation_df.to_csv(self.output_file(seed), index=False)
+        except Exception:
+            error_file = os.path.join(self.output_directory, f"{seed}.log")
+            logging.warning(f"failure on seed: {seed}. Check: {error_file}")
+            with open(error_file, "w") as err_f:
+                err_f.write(format_exc())
+            return None
+        return simulation_df
+
+    def _simulate_seed_in_worker(self, seed: int, profile: bool) -> tuple[pd.DataFrame, dict]:
+        """simulates a seed in a worker of the executor, see `simulate_seed`. If the worker runs in another
+        process, its profiler is enabled as in the main process and its timings and counts are returned, such
+        that they can be aggregated in the main process.
+        """
+        if os.getpid() == self._pid:
+            return self.simulate_seed(seed), None
+        profiler.enabled = profile
+        simulation_df = self.simulate_seed(seed)
+        return simulation_df, profiler.pop() if profile else None
+
+    def run(self, executor: Executor = None, number_of_workers: int = 5) -> pd.DataFrame:
+        """runs the campaign until its stopping rule is satisfied
+
+        Args:
+            executor (Executor, optional): the executor that runs the simulations. Defaults to None, i.e. a pool
+            of threads.
+            number_of_workers (int, optional): the number of workers of the executor, used to keep the workers
+            busy and, if no executor is specified, as the number of threads. Defaults to 5.
+
+        Returns:
+            pd.DataFrame: the final estimates of the campaign, see `RunningEstimates.estimates`
+        """
+        os.makedirs(self.output_directory, exist_ok=True)
+        old_metadata = read_metadata(self.metadata_file)
+        plan = None if old_metadata is None else plan_rerun(old_metadata, self.metadata())
+        if plan is not None and not plan.is_empty:
+            raise RuntimeError(
+                f"the results in {self.output_directory} are out of date ({'; '.join(plan.reasons)}), "
+                "bring them up to date with `rerun`"
+            )
+        self._determine_initial_failure_probabilities(old_metadata, plan)
+        metadata = self.metadata()
+        if metadata != old_metadata:
+            write_metadata(self.metadata_file, metadata)
+
+        rule = self.stopping_rule
+        estimates = RunningEstimates(rule.quantiles, confidence_level=rule.confidence_level)
+        self._pid = os.getpid()
+        progress = {"start": time.perf_counter(), "last_report": time.perf_counter(), "simulated": 0, "draws": 0}
+        seeds = iter(range(self.first_seed, self.first_seed + int(rule.max_simulations)))
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=number_of_workers)
+        in_flight = {}
+        stopping = False
+        try:
+            while True:
+                # keep the workers busy, results of seeds that were simulated before are used directly
+                while not stopping and len(in_flight) < 2 * number_of_workers:
+                    seed = next(seeds, None)
+                    if seed is None:
+                        break
+                    if os.path.exists(self.output_file(seed)):
+                        estimates.add(seed, pd.read_csv(self.output_file(seed)))
+                        stopping = self._check(estimates)
+                        continue
+                    in_flight[executor.submit(self._simulate_seed_in_worker, seed, profiler.enabled)] = seed
+                if len(in_flight) == 0:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    seed = in_flight.pop(future)
+                    simulation_df, profile = future.result()
+                    if profile is not None:
+                        profiler.merge(profile)
+                    if simulation_df is not None:
+                        estimates.add(seed, simulation_df)
+                        self._report_progress(progress, estimates, simulation_df)
+                        stopping = self._check(estimates) or stopping
+                if stopping:
+                    # simulations that already started are completed, the others are cancelled
+                    in_flight = {future: seed for future, seed in in_flight.items() if not future.cancel()}
+        finally:
+            if own_executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        final_estimates = estimates.estimates()
+        logging.info(f"campaign stopped after {estimates.number_of_simulations} simulations:\n{final_estimates}")
+        if profiler.enabled:
+            logging.info(f"profile of the campaign:\n{profiler.report()}")
+        return final_estimates
+
+    def rerun(
+        self, executor: Executor = None, number_of_workers: int = 5, reevaluation_batch_size: int = 1000
+    ) -> pd.DataFrame:
+        """brings the existing results of this campaign up to date with its current model and settings, then
+        continues the campaign until its stopping rule is satisfied (see `run`). Only what is affected by the
+        changes since the results were computed is recomputed (see `dependencies.plan_rerun`): seeds of which
+        the error path is affected are simulated again; if only the structure or the settings of the failure
+        probabilities changed, the failure probabilities of the recorded error paths are determined again (see
+        `Simulator.error_path_from_results`), in batches that share their base variates.
+
+        Args:
+            executor (Executor, optional): the executor that runs the simulations, see `run`. Defaults to None.
+            number_of_workers (int, optional): the number of workers of the executor, see `run`. Defaults to 5.
+            reevaluation_batch_size (int, optional): the number of error paths that are evaluated together.
+            Defaults to 1000.
+
+        Returns:
+            pd.DataFrame: the final estimates of the campaign, see `RunningEstimates.estimates`
+        """
+        old_metadata = read_metadata(self.metadata_file)
+        plan = self.plan_rerun()
+        logging.info(f"rerun of {self.output_directory}: {'; '.join(plan.reasons) or 'no changes'}")
+        self._determine_initial_failure_probabilities(old_metadata, plan)
+
+        failure_probability_columns = [*old_metadata["model"]["failure_modes"], "total"]
+        error_paths = {}
+        number_of_resimulated_seeds, number_of_reevaluated_seeds = 0, 0
+        for seed in self._seeds_with_results() if not plan.is_empty else []:
+            simulation_df = None if plan.resimulate_all else pd.read_csv(self.output_file(seed))
+            if plan.resimulate_all or plan.resimulates(simulation_df):
+                # the seed is simulated again by `run`
+                os.remove(self.output_file(seed))
+                number_of_resimulated_seeds += 1
+            elif plan.reevaluate:
+                error_paths[seed] = self.simulator.error_path_from_results(
+                    simulation_df, failure_probability_columns
+                )
+                if len(error_paths) >= reevaluation_batch_size:
+                    number_of_reevaluated_seeds += self._reevaluate(error_paths, executor)
+                    error_paths = {}
+        if error_paths:
+            number_of_reevaluated_seeds += self._reevaluate(error_paths, executor)
+        logging.info(
+            f"{number_of_resimulated_seeds} seeds are simulated again, "
+            f"the failure probabilities of {number_of_reevaluated_seeds} seeds were determined again"
+        )
+
+        write_metadata(self.metadata_file, self.metadata())
+        return self.run(executor, number_of_workers)
+
+    def _reevaluate(self, error_paths: dict[int, tuple[pd.DataFrame, list]], executor: Executor = None) -> int:
+        """determines the failure probabilities of recorded error paths again and writes the results"""
+        results = self.simulator.evaluate_error_paths(
+            error_paths, self.number_of_parameter_draws, self.parameter_draw_batch_size,
+            self.initial_failure_probabilities, seed=min(error_paths), executor=executor
+        )
+        for seed, simulation_df in results.items():
+            simulation_df.to_csv(self.output_file(seed), index=False)
+        return len(results)
+
+    def _report_progress(self, progress: dict, estimates: RunningEstimates, simulation_df: pd.DataFrame):
+        """keeps track of the simulated seeds and parameter draws, and reports the throughput and the estimated
+        time until the maximum number of simulations every `report_interval` seconds"""
+        progress["simulated"] += 1
+        number_of_evaluations = int(simulation_df["mutated_parameter"].notna().sum())
+        progress["draws"] += number_of_evaluations * int(self.number_of_parameter_draws)
+
+        now = time.perf_counter()
+        if now - progress["last_report"] < self.report_interval:
+            return
+        progress["last_report"] = now
+        elapsed = now - progress["start"]
+        seeds_per_second = progress["simulated"] / elapsed
+        remaining = max(0, self.stopping_rule.max_simulations - estimates.number_of_simulations)
+        logging.info(
+            f"{estimates.number_of_simulations} simulations ({progress['simulated']} new): "
+            f"{seeds_per_second:.2f} seeds/s, {progress['draws'] / elapsed:.3g} draws/s, "
+            f"at most {remaining / seeds_per_second:.0f} s remaining"
+        )
+        return
+
+    def _check(self, estimates: RunningEstimates) -> bool:
+        """evaluates the stopping rule every `check_interval` simulations"""
+        number_of_simulations = estimates.number_of_simulations
+        rule = self.stopping_rule
+        if number_of_simulations % rule.check_interval != 0 and number_of_simulations < rule.max_simulations:
+            return False
+        satisfied = rule.is_satisfied(estimates)
+        logging.info(f"{number_of_simulations} simulations, stopping rule satisfied: {satisfied}")
+        return satisfied
@@ -1,19 +1,52 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
 import numpy as np
-import pandas as pd
 
 from .task import Task
 from ..data_structures import TaskType
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class Check(Task):
 
     determine_hep = Task.__dict__['determine_hep']
 
-    def __init__(self, task_type: TaskType):
+    def __init__(self, task_type: TaskType, effectiveness: float = 0.72):
         self.task_type = task_type
+        self.effectiveness = effectiveness
+        return
+
+    @property
+    def effectiveness(self) -> float:
+        """the probability that this check corrects an error that occurred"""
+        return self._effectiveness
+
+    @effectiveness.setter
+    def effectiveness(self, value: float):
+        value = float(value)
+        if value < 0 or value > 1:
+            raise ValueError(f"effectiveness must lie between 0 and 1, received value: {value}")
+        self._effectiveness = value
         return
 
-    def do_check(self, task_result: pd.Series, rng: np.random.Generator = None) -> pd.Series:
+    def do_check(
+        self, task_result: pd.Series, rng: np.random.Generator = None, record_draws: bool = False
+    ) -> pd.Series:
+        """checks the result of a task, an error that occurred is corrected with a probability equal to the
+        effectiveness of this check
+
+        Args:
+            task_result (pd.Series): the result of the task to check
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+            record_draws (bool, optional): if True, the draw that determines the correction is added to the
+            result. Defaults to False.
+
+        Returns:
+            pd.Series: whether an error occurred and whether it was corrected
+        """
+        import pandas as pd
 
         if rng is None:
             rng = np.random.default_rng()
@@ -25,7 +58,10 @@ class Check(Task):
             # hep_data = self.determine_hep(rng=rng)
             # check_hep = hep_data["hep"]
             # error_corrected = bool(check_hep < rng.uniform(0, 1))
-            error_corrected = bool(0.72 > rng.uniform(0, 1))
+            check_draw = rng.uniform(0, 1)
+            error_corrected = bool(self.effectiveness > check_draw)
+            if record_draws:
+                check_result["check_draw"] = check_draw
             # for index, value in hep_data.items():
             #     check_result[f"check_{index}"] = value
 
@@ -0,0 +1,227 @@
+from __future__ import annotations
+import os
+import json
+import hashlib
+import tempfile
+import dataclasses
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .simulator import Simulator
+
+
+def normalize(value):
+    """converts a value to the value that is read back after writing it as JSON, such that it can be compared
+    to metadata that was read
+
+    Args:
+        value: the value, of which values that are not JSON serializable are written as strings
+
+    Returns:
+        the value as read back from JSON
+    """
+    return json.loads(json.dumps(value, sort_keys=True, default=str))
+
+
+def _hash(value) -> str:
+    """a short hash of a JSON serializable value"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def describe(obj: object) -> dict | None:
+    """describes an object (e.g. a biasing) by its type and public attributes, such that a change of the object
+    can be detected
+
+    Args:
+        obj (object): the object, or None
+
+    Returns:
+        dict | None: the name of the type and the public attributes of the object, None if the object is None
+    """
+    if obj is None:
+        return None
+    attributes = {name: value for name, value in vars(obj).items() if not name.startswith("_")}
+    return normalize({"type": type(obj).__name__, **attributes})
+
+
+def model_hashes(simulator: Simulator) -> dict:
+    """hashes every element of the model of a simulator, such that the elements that changed between two
+    versions of a model can be determined. Only the properties that affect a simulation are hashed.
+
+    Args:
+        simulator (Simulator): the simulator
+
+    Returns:
+        dict: the hashes of the factors, task types, tasks, scenarios and structure parameters by their names,
+        the order of the tasks, the names of the failure modes and the hash of the check
+    """
+    factors, task_types, scenarios = {}, {}, {}
+    for task in simulator.tasks:
+        task_type = task.task_type
+        task_types[task_type.name] = _hash([task_type.nhep, [factor.name for factor in task_type.factors]])
+        for factor in task_type.factors:
+            factors[factor.name] = _hash(dataclasses.asdict(factor))
+        for scenario in task.scenarios:
+            scenarios[scenario.name] = _hash(scenario.possible_parameter_mutation)
+    check = simulator.check
+    return {
+        "factors": factors,
+        "task_types": task_types,
+        "tasks": {
+            task.name: _hash([
+                task.task_type.name, [scenario.name for scenario in task.scenarios], task.scenario_probabilities
+            ])
+            for task in simulator.tasks
+        },
+        "task_order": [task.name for task in simulator.tasks],
+        "scenarios": scenarios,
+        "structure": {
+            parameter.name: _hash([
+                parameter.value, parameter.standard_deviation, parameter.distribution_function.__name__
+            ])
+            for parameter in simulator.structure.parameters
+        },
+        "failure_modes": [failure_mode.__name__ for failure_mode in simulator.structure.failure_modes],
+        "check": None if check is None else _hash([check.task_type.name, check.effectiveness]),
+    }
+
+
+def read_metadata(file_path: str) -> dict | None:
+    """reads the metadata of a campaign
+
+    Args:
+        file_path (str): the path of the metadata file
+
+    Returns:
+        dict | None: the metadata, None if the file does not exist
+    """
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path) as f:
+        return json.load(f)
+
+
+def write_metadata(file_path: str, metadata: dict):
+    """writes the metadata of a campaign, the file is replaced at once such that it is never partially written
+
+    Args:
+        file_path (str): the path of the metadata file
+        metadata (dict): the metadata
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temporary_file = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w") as f:
+            json.dump(metadata, f, indent=2, sort_keys=True, default=str)
+        os.replace(temporary_file, file_path)
+    except BaseException:
+        os.remove(temporary_file)
+        raise
+    return
+
+
+@dataclass
+class RerunPlan:
+    """what has to be recomputed of the results of a campaign after its model or settings changed"""
+
+    resimulate_all: bool = False
+    "whether all seeds have to be simulated again"
+    scenarios: list[str] = field(default_factory=list)
+    "the scenarios that changed, the seeds of which an uncorrected error led to one of these are simulated again"
+    reevaluate: bool = False
+    "whether the failure probabilities of the recorded error paths have to be determined again"
+    structure_changed: bool = False
+    "whether the structure changed, i.e. the failure probabilities of the initial structure are out of date"
+    reasons: list[str] = field(default_factory=list)
+    "the changes that led to this plan"
+
+    @property
+    def is_empty(self) -> bool:
+        """whether nothing has to be recomputed"""
+        return not (self.resimulate_all or self.scenarios or self.reevaluate)
+
+    def resimulates(self, simulation_df) -> bool:
+        """determines whether a simulation has to be simulated again
+
+        Args:
+            simulation_df (pd.DataFrame): the results of the simulation
+
+        Returns:
+            bool: True if all seeds are simulated again or if an uncorrected error of the simulation led to a
+            changed scenario
+        """
+        if self.resimulate_all:
+            return True
+        if not self.scenarios:
+            return False
+        mutated = simulation_df["mutated_parameter"].notna()
+        return bool(simulation_df.loc[mutated, "scenario"].isin(self.scenarios).any())
+
+
+def _changed_names(old_hashes: dict[str, str], new_hashes: dict[str, str]) -> list[str]:
+    """the names of which the hash changed, was added or was removed"""
+    names = old_hashes.keys() | new_hashes.keys()
+    return sorted(name for name in names if old_hashes.get(name) != new_hashes.get(name))
+
+
+def plan_rerun(old_metadata: dict, new_metadata: dict) -> RerunPlan:
+    """determines what has to be recomputed of the results of a campaign, by comparing the metadata of the
+    results to the metadata of the campaign with the current model and settings.
+
+    A change of a factor, task type, task, the order of the tasks, the check, the biasing or the factor design
+    affects the error paths of all seeds. A change of a scenario only affects the seeds of which an uncorrected
+    error led to that scenario; as the mutations of the other seeds do not depend on the scenario, simulating
+    them again would yield the same results. A change of the structure, its failure modes or the settings of
+    the failure probabilities only affects the failure probabilities of the error paths.
+
+    Args:
+        old_metadata (dict): the metadata of the results
+        new_metadata (dict): the metadata of the campaign with the current model and settings
+
+    Returns:
+        RerunPlan: the plan
+    """
+    old_model, new_model = old_metadata["model"], normalize(new_metadata["model"])
+    old_settings, new_settings = old_metadata["settings"], normalize(new_metadata["settings"])
+    plan = RerunPlan()
+
+    for group in ("factors", "task_types", "tasks"):
+        changed = _changed_names(old_model[group], new_model[group])
+        if changed:
+            plan.resimulate_all = True
+            plan.reasons.append(f"{group} changed: {', '.join(changed)}")
+    if old_model["task_order"] != new_model["task_order"]:
+        plan.resimulate_all = True
+        plan.reasons.append("the order of the tasks changed")
+    if old_model["check"] != new_model["check"]:
+        plan.resimulate_all = True
+        plan.reasons.append("the check changed")
+    for setting in ("biasing", "factor_design"):
+        if old_settings[setting] != new_settings[setting]:
+            plan.resimulate_all = True
+            plan.reasons.append(f"the {setting.replace('_', ' ')} changed")
+
+    plan.scenarios = _changed_names(old_model["scenarios"], new_model["scenarios"])
+    if plan.scenarios:
+        plan.reasons.append(f"scenarios changed: {', '.join(plan.scenarios)}")
+
+    changed = _changed_names(old_model["structure"], new_model["structure"])
+    if changed:
+        plan.structure_changed = True
+        plan.reasons.append(f"structure parameters changed: {', '.join(changed)}")
+    if old_model["failure_modes"] != new_model["failure_modes"]:
+        plan.structure_changed = True
+        plan.reasons.append("the failure modes changed")
+    plan.reevaluate = plan.structure_changed
+    if old_settings["number_of_parameter_draws"] != new_settings["number_of_parameter_draws"]:
+        plan.reevaluate = True
+        plan.reasons.append("the number of parameter draws changed")
+    new_initial_failure_probabilities = new_settings["initial_failure_probabilities"]
+    if (
+        new_initial_failure_probabilities is not None
+        and old_settings["initial_failure_probabilities"] != new_initial_failure_probabilities
+    ):
+        plan.reevaluate = True
+        plan.reasons.append("the initial failure probabilities changed")
+    return plan
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import numpy as np
+
+from .task import Task
+
+
+class LatinHypercubeDesign:
+    """a stratified design of the factor draws of consecutive seeds.
+
+    The seeds are grouped into batches of `batch_size` consecutive seeds. Within a batch, the uniform effect draw
+    and multiplier draw of every factor of every task form a Latin hypercube: each of the `batch_size` equally
+    probable strata of a draw is sampled by exactly one seed of the batch. As the effect categories (negative,
+    none, positive) and the factor levels are intervals of these draws, every category is allocated to a number
+    of seeds that is proportional to its probability (up to one seed per category boundary). Campaign-level
+    estimates that depend on the factor draws (e.g. the mean HEP per task) therefore converge with fewer seeds
+    than with independent draws.
+
+    The design of a batch is determined by the seed of the design and the index of the batch only, so the draws
+    of a seed can be reproduced independently of the other seeds (e.g. in another worker).
+    """
+
+    def __init__(self, tasks: list[Task], batch_size: int = 100, seed: int = 0, first_seed: int = 1) -> None:
+        """
+        Args:
+            tasks (list[Task]): the tasks of the simulations, in the order in which they are performed
+            batch_size (int, optional): the number of consecutive seeds per batch. Defaults to 100.
+            seed (int, optional): the seed of the design. Defaults to 0.
+            first_seed (int, optional): the first seed of the first batch. Defaults to 1.
+        """
+        if batch_size < 1:
+            raise ValueError(f"the batch size of a design should be at least 1, received value: {batch_size}")
+        self.factors_per_task = [len(task.task_type.factors) for task in tasks]
+        self.batch_size = int(batch_size)
+        self.seed = seed
+        self.first_seed = first_seed
+        # the last generated batch, as one (index, draws) tuple such that threads never see a partial update
+        self._cached_batch = (None, None)
+        return
+
+    def batch(self, batch_index: int) -> np.ndarray:
+        """the factor draws of all seeds of a batch
+
+        Args:
+            batch_index (int): the index of the batch
+
+        Returns:
+            np.ndarray: the effect draw and multiplier draw of every factor of every task per seed of the batch,
+            with shape (batch size, total number of factors, 2)
+        """
+        cached_index, cached_draws = self._cached_batch
+        if batch_index == cached_index:
+            return cached_draws
+        rng = np.random.default_rng(np.random.SeedSequence([self.seed, batch_index]))
+        number_of_draws = 2 * sum(self.factors_per_task)
+        strata = rng.permuted(np.tile(np.arange(self.batch_size)[:, None], (1, number_of_draws)), axis=0)
+        draws = (strata + rng.uniform(0, 1, strata.shape)) / self.batch_size
+        draws = draws.reshape(self.batch_size, -1, 2)
+        self._cached_batch = (batch_index, draws)
+        return draws
+
+    def factor_draws(self, seed: int) -> list[np.ndarray]:
+        """the factor draws of a seed
+
+        Args:
+            seed (int): the seed of the simulation
+
+        Returns:
+            list[np.ndarray]: per task, the effect draw and multiplier draw of each of its factors, with shape
+            (number of factors, 2)
+        """
+        if seed < self.first_seed:
+            raise ValueError(f"seed {seed} precedes the first seed of the design: {self.first_seed}")
+        batch_index, position = divmod(seed - self.first_seed, self.batch_size)
+        draws = self.batch(batch_index)[position]
+        return np.split(draws, np.cumsum(self.factors_per_task)[:-1])
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import math
+import time
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .simulator import Simulator
+
+
+class NestedEstimator:
+    """a nested Monte Carlo estimator of the expected final failure probability of a campaign.
+
+    The final failure probability of each simulated error path (outer sample) is estimated with an inner Monte
+    Carlo simulation of n draws, which is unbiased for any n. The mean of M error paths therefore has the variance
+    (σ²_outer + E[Pf (1 - Pf)] / n) / M, where σ²_outer is the variance of the final failure probabilities
+    between error paths and E[Pf (1 - Pf)] the expected binomial variance of one inner draw (zero for error paths
+    that end in the initial state, these use the initial failure probabilities and need no inner draws). Pilot
+    samples estimate both variances and the costs of an error path and of an inner draw, from which the number of
+    inner draws n and error paths M that reach a target standard error at the least cost are determined.
+    """
+
+    def __init__(
+        self, simulator: Simulator, initial_failure_probabilities: dict[str: float], number_of_pilot_draws: int = 1e4,
+        max_number_of_draws: int = 1e8, parameter_draw_batch_size: int = 1e6, failure_mode: str = "total",
+        first_seed: int = 1, seed: int = None
+    ) -> None:
+        """
+        Args:
+            simulator (Simulator): the simulator of the error paths
+            initial_failure_probabilities (dict[str: float]): the failure probabilities of the initial structure
+            number_of_pilot_draws (int, optional): the number of inner draws of the pilot samples, the smallest
+            number of inner draws of an allocation. Defaults to 1e4.
+            max_number_of_draws (int, optional): the largest number of inner draws of an allocation.
+            Defaults to 1e8.
+            parameter_draw_batch_size (int, optional): the number of inner draws per batch. Defaults to 1e6.
+            failure_mode (str, optional): the failure mode of which the failure probability is estimated.
+            Defaults to "total".
+            first_seed (int, optional): the seed of the first error path, subsequent error paths use subsequent
+            seeds. Defaults to 1.
+            seed (int, optional): the seed of the inner draws. Defaults to None.
+        """
+        if number_of_pilot_draws < 2 or max_number_of_draws < number_of_pilot_draws:
+            raise ValueError(
+                "a nested estimator needs at least 2 pilot draws and at most as many pilot draws as maximum draws"
+            )
+        self.simulator = simulator
+        self.initial_failure_probabilities = initial_failure_probabilities
+        self.number_of_pilot_draws = int(number_of_pilot_draws)
+        self.max_number_of_draws = int(max_number_of_draws)
+        self.parameter_draw_batch_size = parameter_draw_batch_size
+        self.failure_mode = failure_mode
+        self.next_seed = first_seed
+        self.inner_seed = np.random.SeedSequence(seed).entropy
+        self.initial_state = simulator.structure.initial_state().as_tuple()
+        self.samples = []
+        "the inner estimate of each error path"
+        self.number_of_draws = []
+        "the number of inner draws of each error path, 0 if it ends in the initial state"
+        self.path_costs = []
+        "the time of simulating each error path [s]"
+        self.inner_costs = []
+        "the time of the inner estimate of each error path [s]"
+        return
+
+    def _failure_probability(self, state: tuple[float, ...], number_of_draws: int, path_seed: int) -> float:
+        """estimates the failure probability of a state with the inner draws of an error path"""
+        return self.simulator.structure.calculate_failure_probabilities_batch(
+            [state], number_of_draws, self.parameter_draw_batch_size, seed=[self.inner_seed, path_seed]
+        )[self.failure_mode].iloc[0]
+
+    def sample(self, number_of_samples: int, number_of_draws: int) -> np.ndarray:
+        """simulates new error paths and estimates their final failure probabilities
+
+        Args:
+            number_of_samples (int): the number of samples (error paths)
+            number_of_draws (int): the number of inner draws per error path
+
+        Returns:
+            np.ndarray: the inner estimates of the final failure probabilities of the error paths
+        """
+        samples = []
+        for path_seed in range(self.next_seed, self.next_seed + number_of_samples):
+            start = time.perf_counter()
+            path_df, states = self.simulator.simulate_error_path(path_seed)
+            state = states[int(path_df["state"].iloc[-1])]
+            path_end = time.perf_counter()
+            if state == self.initial_state:
+                samples.append(self.initial_failure_probabilities[self.failure_mode])
+                self.number_of_draws.append(0)
+            else:
+                samples.append(self._failure_probability(state, number_of_draws, path_seed))
+                self.number_of_draws.append(int(number_of_draws))
+            self.path_costs.append(path_end - start)
+            self.inner_costs.append(time.perf_counter() - path_end)
+        self.next_seed += number_of_samples
+        self.samples.extend(samples)
+        return np.array(samples)
+
+    def variances(self) -> tuple[float, float]:
+        """estimates the variance of the final failure probabilities between error paths and the expected
+        binomial variance of one inner draw, from the samples so far
+
+        Returns:
+            tuple[float, float]: the outer variance σ²_outer and the inner variance E[Pf (1 - Pf)]
+        """
+        samples, number_of_draws = np.array(self.samples), np.array(self.number_of_draws)
+        if len(samples) < 2:
+            return 0.0, 0.0
+        # Ŷ (1 - Ŷ) n / (n - 1) is unbiased for Pf (1 - Pf), error paths without inner draws have none
+        inner = np.zeros(len(samples))
+        sampled = number_of_draws > 1
+        inner[sampled] = samples[sampled] * (1 - samples[sampled]) * number_of_draws[sampled] / (
+            number_of_draws[sampled] - 1
+        )
+        inner_variance = float(np.mean(inner))
+        inner_noise = np.zeros(len(samples))
+        inner_noise[sampled] = inner[sampled] / number_of_draws[sampled]
+        outer_variance = max(float(np.var(samples, ddof=1) - np.mean(inner_noise)), 0.0)
+        return outer_variance, inner_variance
+
+    def allocation(self, target_standard_error: float) -> tuple[int, int]:
+        """determines the number of inner draws n and error paths M that reach a target standard error at the
+        least cost, from the variances and costs of the samples so far. The cost of M (c_path + c_draw n) is
+        minimal for n = sqrt(c_path E[Pf (1 - Pf)] / (c_draw σ²_outer)), limited to the pilot and maximum number
+        of inner draws.
+
+        Args:
+            target_standard_error (float): the target standard error of the estimate
+
+        Returns:
+            tuple[int, int]: the number of inner draws per error path and the total number of error paths
+        """
+        outer_variance, inner_variance = self.variances()
+        draws = sum(self.number_of_draws)
+        path_cost = max(float(np.mean(self.path_costs)) if self.path_costs else 0.0, np.finfo(float).tiny)
+        # the cost of an inner draw, per error path (error paths in the initial state take none)
+        draw_cost = max(sum(self.inner_costs) / draws if draws > 0 else 0.0, np.finfo(float).tiny)
+        draw_cost *= np.count_nonzero(self.number_of_draws) / max(len(self.number_of_draws), 1)
+        if inner_variance == 0:
+            number_of_draws = self.number_of_pilot_draws
+        elif outer_variance == 0:
+            number_of_draws = self.max_number_of_draws
+        else:
+            number_of_draws = math.sqrt(path_cost * inner_variance / (draw_cost * outer_variance))
+            number_of_draws = int(min(max(number_of_draws, self.number_of_pilot_draws), self.max_number_of_draws))
+        number_of_samples = math.ceil((outer_variance + inner_variance / number_of_draws) / target_standard_error ** 2)
+        return number_of_draws, max(2, number_of_samples)
+
+    def estimate(self) -> pd.Series:
+        """estimates the expected final failure probability from the samples so far
+
+        Returns:
+            pd.Series: the estimate with its standard error, the outer and inner variance (see `variances`), the
+            number of error paths, the total number of inner draws and the total time
+        """
+        import pandas as pd
+        samples = np.array(self.samples)
+        outer_variance, inner_variance = self.variances()
+        return pd.Series({
+            "estimate": np.mean(samples) if len(samples) > 0 else np.nan,
+            "standard_error": math.sqrt(np.var(samples, ddof=1) / len(samples)) if len(samples) > 1 else np.nan,
+            "outer_variance": outer_variance,
+            "inner_variance": inner_variance,
+            "number_of_samples": len(samples),
+            "total_draws": sum(self.number_of_draws),
+            "total_time": sum(self.path_costs) + sum(self.inner_costs),
+        })
+
+    def run(
+        self, target_standard_error: float, number_of_pilot_samples: int = 50, max_number_of_samples: int = None
+    ) -> pd.Series:
+        """runs the pilot samples, allocates the inner draws and error paths for the target standard error and
+        completes the allocated error paths
+
+        Args:
+            target_standard_error (float): the target standard error of the estimate
+            number_of_pilot_samples (int, optional): the number of pilot samples. Defaults to 50.
+            max_number_of_samples (int, optional): the maximum number of error paths. Defaults to None.
+
+        Returns:
+            pd.Series: the estimate, see `estimate`
+        """
+        if len(self.samples) < number_of_pilot_samples:
+            self.sample(number_of_pilot_samples - len(self.samples), self.number_of_pilot_draws)
+
+        number_of_draws, number_of_samples = self.allocation(target_standard_error)
+        if max_number_of_samples is not None:
+            number_of_samples = min(number_of_samples, max_number_of_samples)
+        if number_of_samples > len(self.samples):
+            self.sample(number_of_samples - len(self.samples), number_of_draws)
+        return self.estimate()
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import os
+import json
+import time
+import threading
+
+
+class _NullTimer:
+    """the timer of a disabled profiler, it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """a timer that adds the time spent in its context to a timer of a profiler"""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        return
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """timers and counters of the hot paths of a simulation, disabled by default.
+
+    When disabled, timers and counters do (almost) nothing. When enabled, a timer accumulates the time spent in
+    its context and the number of times it was entered, and a counter accumulates counts (e.g. draws or
+    failure probability evaluations). Updates are thread safe. A profiler that is copied to another process
+    (e.g. a forked worker) starts empty in that process, its data can be sent back with `pop` and aggregated
+    with `merge`.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Args:
+            enabled (bool, optional): whether the profiler is enabled. Defaults to False.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+        return
+
+    def reset(self):
+        """removes all timings and counts"""
+        self.timers: dict[str, list[float, int]] = {}
+        self.counters: dict[str, int] = {}
+        self._pid = os.getpid()
+        return
+
+    def _check_process(self):
+        """resets the data that was copied from another process"""
+        if self._pid != os.getpid():
+            self.reset()
+        return
+
+    def timer(self, name: str) -> _Timer:
+        """a context that adds the time spent in it to a timer
+
+        Args:
+            name (str): the name of the timer
+
+        Returns:
+            _Timer: the context
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def add_time(self, name: str, seconds: float, number_of_calls: int = 1):
+        """adds time to a timer
+
+        Args:
+            name (str): the name of the timer
+            seconds (float): the time to add [s]
+            number_of_calls (int, optional): the number of calls to add. Defaults to 1.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_process()
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += seconds
+            timer[1] += number_of_calls
+        return
+
+    def count(self, name: str, value: int = 1):
+        """adds to a counter
+
+        Args:
+            name (str): the name of the counter
+            value (int, optional): the value to add. Defaults to 1.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_process()
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+        return
+
+    def snapshot(self) -> dict:
+        """the timings and counts so far, as a JSON serializable dictionary
+
+        Returns:
+            dict: the total time [s] and number of calls per timer and the value per counter
+        """
+        with self._lock:
+            self._check_process()
+            return {
+                "timers": {
+                    name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timers.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def pop(self) -> dict:
+        """takes the timings and counts so far and resets them, e.g. to send them from a worker to the main
+        process
+
+        Returns:
+            dict: the snapshot, see `snapshot`
+        """
+        with self._lock:
+            self._check_process()
+            snapshot = {
+                "timers": {
+                    name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timers.items()
+                },
+                "counters": self.counters,
+            }
+            self.timers, self.counters = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        """adds the timings and counts of a snapshot (e.g. of a worker) to this profiler
+
+        Args:
+            snapshot (dict): the snapshot, see `snapshot`
+        """
+        with self._lock:
+            self._check_process()
+            for name, timer in snapshot["timers"].items():
+                total = self.timers.setdefault(name, [0.0, 0])
+                total[0] += timer["seconds"]
+                total[1] += timer["calls"]
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+        return
+
+    def to_json(self, file_path: str = None) -> str:
+        """exports the timings and counts as JSON
+
+        Args:
+            file_path (str, optional): if specified, the JSON is written to this file. Defaults to None.
+
+        Returns:
+            str: the JSON
+        """
+        text = json.dumps(self.snapshot(), indent=2, sort_keys=True)
+        if file_path is not None:
+            with open(file_path, "w") as f:
+                f.write(text)
+        return text
+
+    def report(self) -> str:
+        """a text report of the timings (slowest first) and counts
+
+        Returns:
+            str: the report
+        """
+        snapshot = self.snapshot()
+        lines = [f"{'timer':<40}{'seconds':>12}{'calls':>12}{'ms/call':>12}"]
+        for name, timer in sorted(snapshot["timers"].items(), key=lambda item: -item[1]["seconds"]):
+            milliseconds_per_call = 1e3 * timer["seconds"] / timer["calls"] if timer["calls"] else float("nan")
+            lines.append(f"{name:<40}{timer['seconds']:>12.3f}{timer['calls']:>12d}{milliseconds_per_call:>12.3f}")
+        lines.append(f"{'counter':<40}{'value':>12}")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name:<40}{value:>12d}")
+        return "\n".join(lines)
+
+
+profiler = Profiler(enabled=os.environ.get("HOFSS_PROFILE", "") not in ("", "0"))
+"the profiler of this package, enable it with `profiler.enabled = True` or the environment variable HOFSS_PROFILE=1"
@@ -1,10 +1,9 @@
 from __future__ import annotations
 import dataclasses
 from copy import copy
-import pandas as pd
 import numpy as np
 
-from ..data_structures import Parameter, FactorLevel
+from ..data_structures import Parameter, FactorLevel, StructureState
 
 
 class Scenario:
@@ -24,21 +23,26 @@ class Scenario:
         ]
         return
 
+    def _draw_mutation(self, complexity_level: FactorLevel, rng: np.random.Generator) -> tuple[str, float]:
+        """draws the parameter that is mutated by this scenario and the magnitude of the error"""
+        error_magnitude = rng.lognormal(0, complexity_level.value)
+        mutation, mutated_parameter = rng.choice(self.possible_parameter_mutation)
+        if mutation == "increase" and error_magnitude < 1.0:
+            error_magnitude = 1 / error_magnitude
+        elif mutation == "decrase" and error_magnitude > 1.0:
+            error_magnitude = 1 / error_magnitude
+        return mutated_parameter, error_magnitude
+
     def update_parameters(
         self, initial_parameters: list[Parameter], complexity_level: FactorLevel, rng: np.random.Generator = None
     ) -> tuple[list[Parameter], float]:
 
         if rng is None:
-            rng = np.random.default_rng
+            rng = np.random.default_rng()
 
         parameters = copy(initial_parameters)
 
-        error_magnitude = rng.lognormal(0, complexity_level.value)
-        mutation, mutated_parameter = rng.choice(self.possible_parameter_mutation)
-        if mutation == "increase" and error_magnitude < 1.0:
-            error_magnitude = 1 / error_magnitude
-        elif mutation == "decrase" and error_magnitude > 1.0:
-            error_magnitude = 1 / error_magnitude
+        mutated_parameter, error_magnitude = self._draw_mutation(complexity_level, rng)
 
         for i, parameter in enumerate(parameters):
             if parameter.name != mutated_parameter:
@@ -51,9 +55,32 @@ class Scenario:
             break
         return parameters, mutated_parameter, error_magnitude
 
+    def update_state(
+        self, state: StructureState, complexity_level: FactorLevel, rng: np.random.Generator = None
+    ) -> tuple[str, float]:
+        """applies this scenario to a structure state in place: the value of one of the parameters of this
+        scenario is multiplied by the magnitude of the error
+
+        Args:
+            state (StructureState): the state of the structure
+            complexity_level (FactorLevel): the complexity level of the task in which the error occurred
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+
+        Returns:
+            tuple[str, float]: the name of the mutated parameter and the magnitude of the error
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        mutated_parameter, error_magnitude = self._draw_mutation(complexity_level, rng)
+        if mutated_parameter in state.index:
+            state.multiply(mutated_parameter, error_magnitude)
+        return mutated_parameter, error_magnitude
+
     @classmethod
     def parse_from_file(cls, scenario_file_path: str) -> list[Scenario]:
 
+        import pandas as pd
         scenario_data = pd.read_csv(scenario_file_path, header=0).fillna("")
 
         scenarios = []
@@ -0,0 +1,324 @@
+from __future__ import annotations
+import os
+import copy
+import json
+import hashlib
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+
+from .simulator import Simulator
+from .analysis import RunningEstimates, final_results, read_simulations
+from .dependencies import model_hashes, read_metadata, write_metadata
+
+
+INITIAL_FAILURE_PROBABILITIES_FILENAME = "initial_failure_probabilities.json"
+"the name of the file in the output directory of a scheduler that contains the initial failure probabilities"
+
+
+@dataclass
+class Variant:
+    """a variant of a model in a variant study, see `CampaignScheduler`, e.g.
+    `Variant("thick slab", "data", filenames={"structure_filename": "structure_thick.csv"})`"""
+
+    name: str
+    "the name of the variant, its results are written to the subdirectory of the output directory with this name"
+    input_directory: str
+    "the directory containing the input files of the variant"
+    include_check: bool = True
+    "whether the simulator of the variant includes the check"
+    filenames: dict[str, str] = field(default_factory=dict)
+    "the input files that replace the defaults, by the arguments of `Simulator.load_from_directory`"
+
+
+def _key(value) -> str:
+    """a short hash of a JSON serializable value"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _simulate_batch(
+    simulators: dict[str, Simulator], seeds: list[int], number_of_parameter_draws: int,
+    parameter_draw_batch_size: int, initial_failure_probabilities: dict[str, float], seed: list[int],
+    max_batch_elements: int, states_per_chunk: int
+) -> dict[str, dict[int, pd.DataFrame]]:
+    """simulates the error paths of seeds for simulators of which the structures are equal, then determines the
+    failure probabilities of all their distinct states at once (see `Simulator.evaluate_error_paths`)
+
+    Returns:
+        dict[str, dict[int, pd.DataFrame]]: the simulation results by their seeds, by the keys of the simulators
+    """
+    error_paths = {
+        (key, path_seed): simulator.simulate_error_path(path_seed)
+        for key, simulator in simulators.items() for path_seed in seeds
+    }
+    results = next(iter(simulators.values())).evaluate_error_paths(
+        error_paths, number_of_parameter_draws, parameter_draw_batch_size, initial_failure_probabilities, seed,
+        max_batch_elements=max_batch_elements, states_per_chunk=states_per_chunk
+    )
+    simulations = {key: {} for key in simulators}
+    for (key, path_seed), simulation_df in results.items():
+        simulations[key][path_seed] = simulation_df
+    return simulations
+
+
+class CampaignScheduler:
+    """runs the simulations of many variants of a model (e.g. with and without check, alternative structures or
+    modified HOF tables) on one pool of workers, sharing the work that variants have in common.
+
+    The variants are simulated in two phases (see `Simulator.simulate_error_path` and
+    `Simulator.evaluate_error_paths`). Work is shared as follows:
+
+    - variants with the same input files are parsed once, a variant without check is a copy of the parsed
+      simulator with its check removed;
+    - variants of which the models are equal (see `dependencies.model_hashes`) are simulated once, and their
+      results are written for each of them;
+    - the initial failure probabilities are determined once per distinct structure;
+    - the error paths of all variants with the same structure are evaluated together, with one sample of base
+      variates per batch of seeds: a parameter state that occurs in several paths is evaluated once. As the
+      tasks, the checks and the mutations draw from independent random streams, a variant with and a variant
+      without check share the error path of every seed of which the check corrected no error, and the
+      failure probabilities of that path are determined only once. The variants are compared with common
+      random numbers, which makes their differences more precise than those of separate campaigns.
+
+    The jobs are ordered such that the initial failure probabilities (the longest jobs) start first and the
+    batches of seeds of all structures alternate, so all variants progress at the same pace. The results of
+    each variant are written to its own subdirectory of the output directory, one file per seed as by
+    `Campaign`; seeds of which the results exist are not simulated again.
+
+    The memory in use is bounded regardless of the number of seeds per job and variants: a job evaluates its
+    distinct states in chunks of `states_per_chunk` states, in passes of at most `max_batch_elements` draws per
+    parameter, which take about (number of parameters + a few) * `max_batch_elements` * 8 bytes. At most
+    `number_of_workers` jobs run at once, so with the defaults and the 14 parameters of the example slab, the
+    failure probability evaluations take at most about 150 MB per worker.
+    """
+
+    def __init__(
+        self, variants: list[Variant], output_directory: str, number_of_seeds: int = 1000, first_seed: int = 1,
+        number_of_parameter_draws: int = 1e6, parameter_draw_batch_size: int = 1e6,
+        number_of_initial_draws: int = 1e7, seeds_per_job: int = 50, seed: int = 0,
+        max_batch_elements: int = 1e6, states_per_chunk: int = 256
+    ) -> None:
+        """
+        Args:
+            variants (list[Variant]): the variants, with distinct names
+            output_directory (str): the directory to which the results are written
+            number_of_seeds (int, optional): the number of seeds per variant. Defaults to 1000.
+            first_seed (int, optional): the first seed, subsequent simulations use subsequent seeds.
+            Defaults to 1.
+            number_of_parameter_draws (int, optional): the number of draws per failure probability calculation.
+            Defaults to 1e6.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            number_of_initial_draws (int, optional): the number of draws of the failure probabilities of the
+            initial structures. Defaults to 1e7.
+            seeds_per_job (int, optional): the number of seeds of which the error paths are evaluated together.
+            Defaults to 50.
+            seed (int, optional): the seed of the base variates. Defaults to 0.
+            max_batch_elements (int, optional): the maximum number of draws per parameter of a pass of the failure
+            probability evaluations, see `Structure.calculate_failure_probabilities_batch`. Defaults to 1e6.
+            states_per_chunk (int, optional): the number of states per failure probability evaluation of a job.
+            Defaults to 256.
+        """
+        names = [variant.name for variant in variants]
+        if len(set(names)) < len(names):
+            raise ValueError(f"the names of the variants should be distinct, received names: {names}")
+        self.variants = variants
+        self.output_directory = output_directory
+        self.number_of_seeds = int(number_of_seeds)
+        self.first_seed = first_seed
+        self.number_of_parameter_draws = int(number_of_parameter_draws)
+        self.parameter_draw_batch_size = int(parameter_draw_batch_size)
+        self.number_of_initial_draws = int(number_of_initial_draws)
+        self.seeds_per_job = int(seeds_per_job)
+        self.seed = seed
+        self.max_batch_elements = int(max_batch_elements)
+        self.states_per_chunk = int(states_per_chunk)
+        self.groups = None
+        "the variants grouped by their structures, see `load`"
+        return
+
+    def output_file(self, variant: Variant, seed: int) -> str:
+        """the path of the output file of a seed of a variant"""
+        return os.path.join(self.output_directory, variant.name, f"{seed}.csv")
+
+    def load(self) -> list[dict]:
+        """parses the simulators of the variants and groups them by their structures
+
+        Returns:
+            list[dict]: per distinct structure: its key, the distinct simulators by the keys of their models
+            ('simulators'), the variants by the keys of their models ('variants') and the initial failure
+            probabilities ('initial_failure_probabilities', None until determined)
+        """
+        snapshot_directory = os.path.join(self.output_directory, ".snapshots")
+        os.makedirs(snapshot_directory, exist_ok=True)
+        parsed = {}
+        groups = {}
+        for variant in self.variants:
+            input_key = _key([os.path.abspath(variant.input_directory), variant.filenames])
+            if input_key not in parsed:
+                parsed[input_key] = Simulator.load_from_directory(
+                    variant.input_directory,
+                    snapshot_file=os.path.join(snapshot_directory, f"{input_key}.pkl"),
+                    include_check=True, **variant.filenames
+                )
+            simulator = parsed[input_key]
+            if not variant.include_check and simulator.check is not None:
+                simulator = copy.copy(simulator)
+                simulator.check = None
+
+            model = model_hashes(simulator)
+            structure_key = _key([model["structure"], model["failure_modes"]])
+            group = groups.setdefault(structure_key, {
+                "key": structure_key, "simulators": {}, "variants": {}, "initial_failure_probabilities": None
+            })
+            model_key = _key(model)
+            group["simulators"].setdefault(model_key, simulator)
+            group["variants"].setdefault(model_key, []).append(variant)
+
+        # the groups with the most simulators first, as their jobs take longest
+        self.groups = sorted(groups.values(), key=lambda group: -len(group["simulators"]))
+        logging.info(
+            f"{len(self.variants)} variants: {sum(len(group['simulators']) for group in self.groups)} distinct "
+            f"models, {len(self.groups)} distinct structures"
+        )
+        return self.groups
+
+    def _jobs(self) -> deque[tuple[dict, list[int]]]:
+        """the batches of seeds of all groups that have not been simulated yet, alternating between groups"""
+        seeds = list(range(self.first_seed, self.first_seed + self.number_of_seeds))
+        jobs = deque()
+        for start in range(0, len(seeds), self.seeds_per_job):
+            for group in self.groups:
+                batch_seeds = seeds[start:start + self.seeds_per_job]
+                variants = [variant for variants in group["variants"].values() for variant in variants]
+                if all(
+                    os.path.exists(self.output_file(variant, seed)) for variant in variants for seed in batch_seeds
+                ):
+                    continue
+                jobs.append((group, batch_seeds))
+        return jobs
+
+    def _write(self, group: dict, simulations: dict[str, dict[int, pd.DataFrame]]):
+        """writes the simulation results of a group for each of its variants"""
+        for model_key, model_simulations in simulations.items():
+            for variant in group["variants"][model_key]:
+                for seed, simulation_df in model_simulations.items():
+                    simulation_df.to_csv(self.output_file(variant, seed), index=False)
+        return
+
+    def run(self, executor: Executor = None, number_of_workers: int = 5) -> pd.DataFrame:
+        """runs the simulations of all variants
+
+        Args:
+            executor (Executor, optional): the executor that runs the jobs. Defaults to None, i.e. a pool of
+            threads.
+            number_of_workers (int, optional): the number of workers of the executor, used to keep the workers
+            busy and, if no executor is specified, as the number of threads. Defaults to 5.
+
+        Returns:
+            pd.DataFrame: the estimates per variant (the first level of the index), see
+            `RunningEstimates.estimates`
+        """
+        if self.groups is None:
+            self.load()
+        for variant in self.variants:
+            os.makedirs(os.path.join(self.output_directory, variant.name), exist_ok=True)
+
+        # the initial failure probabilities are determined once per structure and kept for subsequent runs
+        initial_failure_probabilities_file = os.path.join(
+            self.output_directory, INITIAL_FAILURE_PROBABILITIES_FILENAME
+        )
+        known_failure_probabilities = read_metadata(initial_failure_probabilities_file) or {}
+        for group in self.groups:
+            known = known_failure_probabilities.get(group["key"])
+            if known is not None and known["number_of_draws"] == self.number_of_initial_draws:
+                group["initial_failure_probabilities"] = known["failure_probabilities"]
+
+        jobs = self._jobs()
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=number_of_workers)
+        in_flight = {}
+        try:
+            for group in self.groups:
+                if group["initial_failure_probabilities"] is None:
+                    structure = next(iter(group["simulators"].values())).structure
+                    future = executor.submit(
+                        structure.calculate_failure_probabilities, self.number_of_initial_draws,
+                        self.parameter_draw_batch_size
+                    )
+                    in_flight[future] = (group, None)
+
+            while True:
+                # keep the workers busy with the jobs of which the initial failure probabilities are known
+                for _ in range(len(jobs)):
+                    if len(in_flight) >= 2 * number_of_workers:
+                        break
+                    group, seeds = jobs.popleft()
+                    if group["initial_failure_probabilities"] is None:
+                        jobs.append((group, seeds))
+                        continue
+                    future = executor.submit(
+                        _simulate_batch, group["simulators"], seeds, self.number_of_parameter_draws,
+                        self.parameter_draw_batch_size, group["initial_failure_probabilities"], [self.seed, seeds[0]],
+                        self.max_batch_elements, self.states_per_chunk
+                    )
+                    in_flight[future] = (group, seeds)
+                if len(in_flight) == 0:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group, seeds = in_flight.pop(future)
+                    if seeds is not None:
+                        self._write(group, future.result())
+                        continue
+                    group["initial_failure_probabilities"] = {
+                        failure_mode: float(failure_probability)
+                        for failure_mode, failure_probability in dict(future.result()).items()
+                    }
+                    known_failure_probabilities[group["key"]] = {
+                        "number_of_draws": self.number_of_initial_draws,
+                        "failure_probabilities": group["initial_failure_probabilities"],
+                    }
+                    write_metadata(initial_failure_probabilities_file, known_failure_probabilities)
+        finally:
+            if own_executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        estimates_df = self.estimates()
+        logging.info(f"estimates of the variants:\n{estimates_df}")
+        return estimates_df
+
+    def results(self) -> pd.DataFrame:
+        """summarizes each simulation of each variant by its final state
+
+        Returns:
+            pd.DataFrame: the final results (see `analysis.final_results`) with the name of the variant and the
+            seed as index
+        """
+        return pd.concat({
+            variant.name: final_results(read_simulations(os.path.join(self.output_directory, variant.name)))
+            for variant in self.variants
+        }, names=["variant", "seed"])
+
+    def estimates(self, quantiles: list[float] = (0.95, 0.99)) -> pd.DataFrame:
+        """estimates the reported quantities of each variant from its results
+
+        Args:
+            quantiles (list[float], optional): the quantiles of the final failure probability. Defaults to
+            (0.95, 0.99).
+
+        Returns:
+            pd.DataFrame: the estimates per variant (the first level of the index), see
+            `RunningEstimates.estimates`
+        """
+        estimates = {}
+        for variant in self.variants:
+            variant_estimates = RunningEstimates(quantiles)
+            simulations = read_simulations(os.path.join(self.output_directory, variant.name))
+            for seed, simulation_df in simulations.items():
+                variant_estimates.add(seed, simulation_df)
+            estimates[variant.name] = variant_estimates.estimates()
+        return pd.concat(estimates, names=["variant", "quantity"])
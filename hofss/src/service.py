@@ -0,0 +1,419 @@
+from __future__ import annotations
+import copy
+import json
+import logging
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+import numpy as np
+
+from .simulator import Simulator
+from .._version import __version__
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "::1")
+"the host names of the local machine, from which requests are accepted by default"
+MAX_REQUEST_SIZE = 1 << 20
+"the largest body of a request [bytes]"
+
+
+def _frame_to_json(df: pd.DataFrame) -> dict:
+    """a DataFrame as a JSON serializable dictionary, see `_frame_from_json`"""
+    return df.to_dict(orient="split")
+
+
+def _frame_from_json(data: dict) -> pd.DataFrame:
+    """the DataFrame of a dictionary created by `_frame_to_json`"""
+    import pandas as pd
+    return pd.DataFrame(data["data"], index=data["index"], columns=data["columns"])
+
+
+class SimulationService:
+    """a simulator that is kept warm in a long running process, such that notebooks and scripts can query it
+    without parsing the model and determining the initial failure probabilities themselves.
+
+    The service holds the parsed simulator, a copy of it without a check, the failure probabilities of the
+    initial structure, the retained base sample of the structure (if any, see `Structure.retain_base_sample`)
+    and a pool of worker threads that simulate seeds. It answers requests through its methods, `serve` exposes
+    these over HTTP and `SimulationClient` calls them.
+    """
+
+    def __init__(
+        self, simulator: Simulator, number_of_parameter_draws: int = 1e6, parameter_draw_batch_size: int = 1e6,
+        number_of_workers: int = 4, max_number_of_seeds: int = 10000, max_number_of_parameter_draws: int = 1e8
+    ) -> None:
+        """
+        Args:
+            simulator (Simulator): the simulator, its initial failure probabilities are determined with
+            `number_of_parameter_draws` draws if these are unknown
+            number_of_parameter_draws (int, optional): the default number of draws per failure probability
+            calculation. Defaults to 1e6.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            number_of_workers (int, optional): the number of threads that simulate seeds. Defaults to 4.
+            max_number_of_seeds (int, optional): the largest number of seeds of one request. Defaults to 10000.
+            max_number_of_parameter_draws (int, optional): the largest number of draws per failure probability
+            calculation of a request. Defaults to 1e8.
+        """
+        if simulator.initial_failure_probabilities is None:
+            simulator.initial_failure_probabilities = dict(simulator.structure.calculate_failure_probabilities(
+                number_of_parameter_draws, parameter_draw_batch_size
+            ))
+        self.simulators = {True: simulator, False: simulator}
+        "the simulator with and without a check, by whether it includes the check"
+        if simulator.check is not None:
+            unchecked_simulator = copy.copy(simulator)
+            unchecked_simulator.check = None
+            self.simulators[False] = unchecked_simulator
+        self.number_of_parameter_draws = int(number_of_parameter_draws)
+        self.parameter_draw_batch_size = int(parameter_draw_batch_size)
+        self.max_number_of_seeds = int(max_number_of_seeds)
+        self.max_number_of_parameter_draws = int(max_number_of_parameter_draws)
+        self.number_of_workers = int(number_of_workers)
+        self.executor = ThreadPoolExecutor(number_of_workers)
+        return
+
+    def _number_of_parameter_draws(self, number_of_parameter_draws: int = None) -> int:
+        """the number of draws of a request, the default of this service if not specified"""
+        if number_of_parameter_draws is None:
+            return self.number_of_parameter_draws
+        if not 0 < number_of_parameter_draws <= self.max_number_of_parameter_draws:
+            raise ValueError(
+                f"the number of parameter draws should be between 1 and {self.max_number_of_parameter_draws}; "
+                f"received: {number_of_parameter_draws}"
+            )
+        return int(number_of_parameter_draws)
+
+    def _check_number_of_seeds(self, number_of_seeds: int):
+        if number_of_seeds > self.max_number_of_seeds:
+            raise ValueError(
+                f"at most {self.max_number_of_seeds} seeds can be simulated per request; received: {number_of_seeds}"
+            )
+        return
+
+    @property
+    def simulator(self) -> Simulator:
+        """the simulator of this service"""
+        return self.simulators[True]
+
+    def close(self):
+        """stops the workers of this service"""
+        self.executor.shutdown(cancel_futures=True)
+        return
+
+    def info(self) -> dict:
+        """describes the model of this service
+
+        Returns:
+            dict: the version of this package, the names of the tasks, the values of the parameters of the
+            structure, the names of the failure modes, the initial failure probabilities and whether the
+            simulator includes a check
+        """
+        structure = self.simulator.structure
+        return {
+            "version": __version__,
+            "tasks": [task.name for task in self.simulator.tasks],
+            "parameters": {parameter.name: parameter.value for parameter in structure.parameters},
+            "failure_modes": [failure_mode.__name__ for failure_mode in structure.failure_modes],
+            "initial_failure_probabilities": {
+                name: float(value) for name, value in self.simulator.initial_failure_probabilities.items()
+            },
+            "check": self.simulator.check is not None,
+            "base_sample": structure.base_sample is not None,
+        }
+
+    def failure_probabilities(
+        self, values: dict[str, float] = None, multipliers: dict[str, float] = None,
+        number_of_parameter_draws: int = None, seed: int = None
+    ) -> dict[str, float]:
+        """determines the failure probabilities of a state of the structure
+
+        Args:
+            values (dict[str, float], optional): the values of the parameters that differ from the initial
+            state. Defaults to None.
+            multipliers (dict[str, float], optional): the multipliers of the (initial or specified) values of
+            parameters, as the magnitudes of errors. Defaults to None.
+            number_of_parameter_draws (int, optional): the number of draws. Defaults to None, i.e. the default
+            of this service.
+            seed (int, optional): the seed of the draws. Defaults to None.
+
+        Raises:
+            ValueError: if the structure has no parameter with one of the names, or if the number of draws is
+            larger than the maximum of this service
+
+        Returns:
+            dict[str, float]: the failure probability per failure mode and in total
+        """
+        structure = self.simulator.structure
+        state = structure.initial_state()
+        for name in [*(values or {}), *(multipliers or {})]:
+            if name not in state.index:
+                raise ValueError(f"the structure has no parameter named {name!r}")
+        for name, value in (values or {}).items():
+            state.values[state.index[name]] = float(value)
+        for name, multiplier in (multipliers or {}).items():
+            state.multiply(name, float(multiplier))
+        number_of_parameter_draws = self._number_of_parameter_draws(number_of_parameter_draws)
+        failure_probabilities = structure.calculate_failure_probabilities(
+            number_of_parameter_draws, self.parameter_draw_batch_size, state, np.random.default_rng(seed)
+        )
+        return {name: float(value) for name, value in dict(failure_probabilities).items()}
+
+    def simulate(
+        self, seeds: list[int], check: bool = True, number_of_parameter_draws: int = None
+    ) -> dict[int, pd.DataFrame]:
+        """simulates seeds on the workers of this service, see `Simulator.simulate`
+
+        Args:
+            seeds (list[int]): the seeds
+            check (bool, optional): whether the simulations include the check. Defaults to True.
+            number_of_parameter_draws (int, optional): the number of draws per failure probability
+            calculation. Defaults to None, i.e. the default of this service.
+
+        Raises:
+            ValueError: if the number of seeds or draws is larger than the maximum of this service
+
+        Returns:
+            dict[int, pd.DataFrame]: the results of the simulations by their seeds
+        """
+        seeds = [int(seed) for seed in seeds]
+        self._check_number_of_seeds(len(seeds))
+        number_of_parameter_draws = self._number_of_parameter_draws(number_of_parameter_draws)
+        simulations = self.simulators[bool(check)].simulate_seeds(
+            seeds, number_of_parameter_draws, self.parameter_draw_batch_size, executor=self.executor,
+            number_of_workers=self.number_of_workers
+        )
+        return dict(sorted(simulations, key=lambda simulation: simulation[0]))
+
+    def run(
+        self, number_of_seeds: int, first_seed: int = 1, check: bool = True, number_of_parameter_draws: int = None
+    ) -> pd.DataFrame:
+        """simulates consecutive seeds and summarizes each simulation by its final state
+
+        Args:
+            number_of_seeds (int): the number of seeds
+            first_seed (int, optional): the first seed. Defaults to 1.
+            check (bool, optional): whether the simulations include the check. Defaults to True.
+            number_of_parameter_draws (int, optional): the number of draws per failure probability
+            calculation. Defaults to None, i.e. the default of this service.
+
+        Raises:
+            ValueError: if the number of seeds or draws is larger than the maximum of this service
+
+        Returns:
+            pd.DataFrame: the final results of the simulations, see `analysis.final_results`
+        """
+        from .analysis import final_results
+        self._check_number_of_seeds(number_of_seeds)
+        seeds = range(first_seed, first_seed + number_of_seeds)
+        return final_results(self.simulate(seeds, check, number_of_parameter_draws))
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """handles the requests to a `SimulationService`: GET /info, and POST /failure_probabilities, /simulate and
+    /run with the arguments of the corresponding method as a JSON object.
+
+    Requests are only accepted with a `Host` (and, if sent, `Origin`) of the allowed hosts of the server, and
+    POST requests only with a JSON body (`Content-Type: application/json`) of at most `MAX_REQUEST_SIZE` bytes.
+    As a browser sends a JSON body from another origin only after a preflight request, which is not answered,
+    and a page of a rebound domain sends its own host name, web pages cannot submit simulations.
+    """
+
+    server: _Server
+
+    def _respond(self, status: int, body: dict):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return
+
+    # the handlers of the requests by their paths, each returns the JSON serializable response
+    handlers = {
+        "info": lambda service, arguments: service.info(**arguments),
+        "failure_probabilities": lambda service, arguments: service.failure_probabilities(**arguments),
+        "simulate": lambda service, arguments: {
+            str(seed): _frame_to_json(df) for seed, df in service.simulate(**arguments).items()
+        },
+        "run": lambda service, arguments: _frame_to_json(service.run(**arguments)),
+    }
+
+    def _dispatch(self, arguments: dict):
+        handler = self.handlers.get(self.path.strip("/"))
+        if handler is None:
+            self._respond(404, {"error": f"unknown request: {self.path}"})
+            return
+        try:
+            response = handler(self.server.service, arguments)
+        except (TypeError, ValueError) as e:
+            self._respond(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logging.exception(f"request {self.path} failed")
+            self._respond(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._respond(200, response)
+        return
+
+    def _is_allowed(self) -> bool:
+        """whether the host and origin of the request are allowed, responds with an error if not"""
+        host = urllib.parse.urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        origin = self.headers.get("Origin")
+        origin_host = None if origin is None else urllib.parse.urlsplit(origin).hostname
+        for name in [host, *([] if origin is None else [origin_host])]:
+            if name not in self.server.allowed_hosts:
+                self._respond(403, {"error": f"host not allowed: {name}"})
+                return False
+        return True
+
+    def do_GET(self):
+        if self._is_allowed():
+            self._dispatch({})
+        return
+
+    def do_POST(self):
+        if not self._is_allowed():
+            return
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._respond(415, {"error": "the body of a request should be JSON (Content-Type: application/json)"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_REQUEST_SIZE:
+            self._respond(413, {"error": f"the body of a request should be at most {MAX_REQUEST_SIZE} bytes"})
+            return
+        try:
+            arguments = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            self._respond(400, {"error": f"invalid JSON: {e}"})
+            return
+        self._dispatch(arguments)
+        return
+
+    def log_message(self, format: str, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+        return
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, address: tuple[str, int], service: SimulationService, allowed_hosts: tuple[str, ...]
+    ) -> None:
+        super().__init__(address, _RequestHandler)
+        self.service = service
+        self.allowed_hosts = allowed_hosts
+        return
+
+
+def serve(
+    service: SimulationService, host: str = "127.0.0.1", port: int = 8765, background: bool = False,
+    allowed_hosts: tuple[str, ...] = LOOPBACK_HOSTS
+) -> ThreadingHTTPServer:
+    """serves a simulation service over HTTP, every request is handled in its own thread
+
+    Args:
+        service (SimulationService): the service
+        host (str, optional): the address to listen on, only the local machine by default. Defaults to
+        "127.0.0.1".
+        port (int, optional): the port to listen on, 0 for any free port. Defaults to 8765.
+        background (bool, optional): if True, the server runs in a daemon thread and this function returns
+        immediately; otherwise it serves until interrupted. Defaults to False.
+        allowed_hosts (tuple[str, ...], optional): the host names of the requests that are accepted, the host
+        to listen on is accepted as well (unless it is a wildcard address). Defaults to `LOOPBACK_HOSTS`.
+
+    Returns:
+        ThreadingHTTPServer: the server, its `server_address` is the address it listens on and `shutdown`
+        stops it
+    """
+    if host not in ("", "0.0.0.0", "::"):
+        allowed_hosts = (*allowed_hosts, host)
+    server = _Server((host, port), service, tuple(allowed_hosts))
+    logging.info(f"serving the simulator on http://{server.server_address[0]}:{server.server_address[1]}")
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return server
+
+
+class SimulationClient:
+    """calls a `SimulationService` that is served over HTTP (see `serve` and `python -m hofss serve`), e.g.
+    from a notebook"""
+
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = None) -> None:
+        """
+        Args:
+            url (str, optional): the address of the service. Defaults to "http://127.0.0.1:8765".
+            timeout (float, optional): the number of seconds to wait for a response. Defaults to None, i.e.
+            without limit.
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        return
+
+    def _request(self, method: str, arguments: dict = None):
+        data = None if arguments is None else json.dumps(arguments).encode()
+        request = urllib.request.Request(
+            f"{self.url}/{method}", data=data, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{method} failed: {json.loads(e.read()).get('error')}") from None
+
+    def info(self) -> dict:
+        """see `SimulationService.info`"""
+        return self._request("info")
+
+    def failure_probabilities(
+        self, values: dict[str, float] = None, multipliers: dict[str, float] = None,
+        number_of_parameter_draws: int = None, seed: int = None
+    ) -> pd.Series:
+        """see `SimulationService.failure_probabilities`
+
+        Returns:
+            pd.Series: the failure probability per failure mode and in total
+        """
+        import pandas as pd
+        return pd.Series(self._request("failure_probabilities", {
+            "values": values, "multipliers": multipliers, "number_of_parameter_draws": number_of_parameter_draws,
+            "seed": seed
+        }))
+
+    def simulate(
+        self, seeds: list[int], check: bool = True, number_of_parameter_draws: int = None
+    ) -> dict[int, pd.DataFrame]:
+        """see `SimulationService.simulate`"""
+        simulations = self._request("simulate", {
+            "seeds": [int(seed) for seed in seeds], "check": check,
+            "number_of_parameter_draws": number_of_parameter_draws
+        })
+        return {int(seed): _frame_from_json(data) for seed, data in simulations.items()}
+
+    def run(
+        self, number_of_seeds: int, first_seed: int = 1, check: bool = True, number_of_parameter_draws: int = None
+    ) -> pd.DataFrame:
+        """see `SimulationService.run`"""
+        return _frame_from_json(self._request("run", {
+            "number_of_seeds": number_of_seeds, "first_seed": first_seed, "check": check,
+            "number_of_parameter_draws": number_of_parameter_draws
+        }))
@@ -1,23 +1,54 @@
 from __future__ import annotations
 import os
 import re
+import time
+from typing import Iterable, Iterator, TYPE_CHECKING
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
 import numpy as np
-import pandas as pd
 
 from .task import Task
 from .check import Check
 from .structure import Structure
 from .scenario import Scenario
+from .biasing import ErrorBiasing
+from .design import LatinHypercubeDesign
+from .nested import NestedEstimator
+from . import snapshot
+from .profiling import profiler
 from ..data_structures import Factor, TaskType
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _log_likelihood_ratio(
+    outcomes: np.ndarray, modified_probability: np.ndarray | float, probability: np.ndarray | float
+) -> np.ndarray:
+    """the log likelihood ratio of Bernoulli outcomes under a modified and the simulated probability. Outcomes
+    that are impossible under the simulated probability (a probability of 0 or 1) cannot be reweighted, they get
+    a ratio of 0 (-inf) rather than an undefined one, as do outcomes that are impossible under the modified
+    probability."""
+    with np.errstate(divide="ignore"):
+        log_modified = np.where(outcomes, np.log(modified_probability), np.log1p(-modified_probability))
+        log_simulated = np.where(outcomes, np.log(probability), np.log1p(-probability))
+    log_ratio = np.full(np.shape(outcomes), -np.inf)
+    possible = np.isfinite(log_simulated)
+    log_ratio[possible] = log_modified[possible] - log_simulated[possible]
+    return log_ratio
+
 
 class Simulator:
 
-    def __init__(self, structure: Structure, tasks: list[Task], check=None) -> None:
+    def __init__(
+        self, structure: Structure, tasks: list[Task], check=None,
+        initial_failure_probabilities: dict[str: float] = None
+    ) -> None:
 
         self.tasks = tasks
         self.structure = structure
         self.check = check
+        # the failure probabilities of the initial structure, if known; used when a simulation specifies none
+        self.initial_failure_probabilities = initial_failure_probabilities
 
         return
 
@@ -29,65 +60,670 @@ class Simulator:
         else:
             return (s, None, None)
 
-    def simulate(
+    def _sort_columns(self, collective_df: pd.DataFrame) -> pd.DataFrame:
+        """sorts the columns of a simulation result in a way that is more convenient to read"""
+        sorted_columns = [
+            "task", "error_occurred", "error_corrected", "scenario",
+            "complexity_level", "mutated_parameter", "error_magnitude", "hep", "bendingMomentULS", "total",
+            "likelihood_ratio"
+        ]
+        other_columns = []
+        for column in collective_df.columns:
+            if column in sorted_columns:
+                continue
+            other_columns.append(column)
+        sorted_columns = [column for column in sorted_columns if column in collective_df.columns]
+        sorted_columns.extend(sorted(other_columns, key=self._data_column_sort_key))
+        return collective_df[sorted_columns]
+
+    def _do_task_and_check(
+        self, task: Task, rng: np.random.Generator, check_rng: np.random.Generator = None, record_draws: bool = False,
+        factor_draws: np.ndarray = None
+    ) -> tuple[pd.Series, pd.Series]:
+        """performs a task and, if a check is defined, checks its result
+
+        Args:
+            task (Task): the task to perform
+            rng (np.random.Generator): the random number generator used to perform the task
+            check_rng (np.random.Generator, optional): the random number generator used to perform the check.
+            Defaults to the generator of the task.
+            record_draws (bool, optional): if True, the draws of the task and check are added to their results.
+            Defaults to False.
+            factor_draws (np.ndarray, optional): the factor draws of the task, see `Task.determine_hep`.
+            Defaults to None.
+
+        Returns:
+            tuple[pd.Series, pd.Series]: the task result and the check result
+        """
+        import pandas as pd
+        if check_rng is None:
+            check_rng = rng
+
+        with profiler.timer("task"):
+            task_result = task.do_task(rng=rng, record_draws=record_draws, factor_draws=factor_draws)
+            task_result["error_magnitude"] = None
+            task_result["mutated_parameter"] = None
+
+        if self.check is None:
+            check_result = pd.Series({
+                "error_occurred": bool(task_result["scenario"] is not None),
+                "error_corrected": False
+            })
+        else:
+            with profiler.timer("check"):
+                check_result = self.check.do_check(task_result, rng=check_rng, record_draws=record_draws)
+        return task_result, check_result
+
+    def _do_tasks_biased(
+        self, biasing: ErrorBiasing, rng: np.random.Generator, record_draws: bool = False,
+        factor_draws: list[np.ndarray] = None
+    ) -> tuple[list[tuple[pd.Series, pd.Series]], float]:
+        """performs all tasks and checks at once, sampling the errors and their corrections from a biased
+        distribution
+
+        Args:
+            biasing (ErrorBiasing): the biased distribution of the errors and their corrections
+            rng (np.random.Generator): the random number generator
+            record_draws (bool, optional): if True, the draws that determine the HEPs are added to the task
+            results. Defaults to False.
+            factor_draws (list[np.ndarray], optional): the factor draws of each task, see
+            `LatinHypercubeDesign.factor_draws`. Defaults to None.
+
+        Returns:
+            tuple[list[tuple[pd.Series, pd.Series]], float]: the task result and check result of each task, and
+            the likelihood ratio of the sampled errors and corrections
+        """
+        import pandas as pd
+        if factor_draws is None:
+            factor_draws = [None] * len(self.tasks)
+        hep_data = [
+            task.determine_hep(rng=rng, record_draws=record_draws, factor_draws=task_factor_draws)
+            for task, task_factor_draws in zip(self.tasks, factor_draws)
+        ]
+        correction_probability = None if self.check is None else self.check.effectiveness
+        errors, corrections, likelihood_ratio = biasing.sample_errors(
+            np.array([task_hep_data["hep"] for task_hep_data in hep_data]), correction_probability, rng
+        )
+
+        task_outcomes = []
+        for task, task_hep_data, error, corrected in zip(self.tasks, hep_data, errors, corrections):
+            task_result = {"task": task.name, "scenario": None}
+            task_result.update(task_hep_data)
+            if error:
+                task_result["scenario"] = task.draw_scenario(rng=rng)
+            task_result["error_magnitude"] = None
+            task_result["mutated_parameter"] = None
+
+            error_occurred = bool(task_result["scenario"] is not None)
+            check_result = pd.Series({
+                "error_occurred": error_occurred, "error_corrected": bool(error_occurred and corrected)
+            })
+            task_outcomes.append((pd.Series(task_result), check_result))
+        return task_outcomes, likelihood_ratio
+
+    def iter_simulate(
         self, seed: int, number_of_parameter_draws: int = 1e8,
-        parameter_draw_batch_size: int = 1e6, initial_failure_probabilities: dict[str: float] = None
-    ) -> pd.Dataframe:
+        parameter_draw_batch_size: int = 1e6, initial_failure_probabilities: dict[str: float] = None,
+        biasing: ErrorBiasing = None, record_draws: bool = False, factor_design: LatinHypercubeDesign = None
+    ) -> Iterator[pd.Series]:
+        """simulates the tasks, checks and resulting failure probabilities of the structure for one seed, and
+        yields the record of each task as soon as it is done, see `simulate` for the arguments.
+
+        The first record contains the failure probabilities of the initial structure, every subsequent record
+        contains the result of a task, its check and the failure probabilities of the structure after the task.
+        If a biasing is specified, every record contains the likelihood ratio of the simulation. The records
+        are the rows of the result of `simulate`, before its columns are sorted.
+
+        Yields:
+            pd.Series: the record of the initial structure, then the record of each task
+        """
+        import pandas as pd
+        start = time.perf_counter()
 
         # create a random number generator
         rng = np.random.default_rng(seed)
 
-        # make a copy of self.structure, such that the initial values remain
-        structure_copy = self.structure.make_copy(rng)
+        # the state of the structure's parameters that is mutated, such that the initial values remain
+        state = self.structure.initial_state()
 
         # run the simulation
         if initial_failure_probabilities is None:
-            initial_failure_probabilities = structure_copy.calculate_failure_probabilities(
-                number_of_parameter_draws, parameter_draw_batch_size
-            )
-        failure_probabily_rows = [initial_failure_probabilities]
-        failure_probabilities = initial_failure_probabilities
-        for task in self.tasks:
-            task_result = task.do_task(rng=rng)
-            task_result["error_magnitude"] = None
-            task_result["mutated_parameter"] = None
+            initial_failure_probabilities = self.initial_failure_probabilities
+        if initial_failure_probabilities is None:
+            with profiler.timer("failure_probability"):
+                initial_failure_probabilities = self.structure.calculate_failure_probabilities(
+                    number_of_parameter_draws, parameter_draw_batch_size, state, rng
+                )
+        else:
+            profiler.count("initial_failure_probability_cache_hits")
+            initial_failure_probabilities = pd.Series(initial_failure_probabilities, dtype=float)
+        factor_draws = [None] * len(self.tasks) if factor_design is None else factor_design.factor_draws(seed)
+        task_outcomes, likelihood_ratio = None, None
+        if biasing is not None:
+            task_outcomes, likelihood_ratio = self._do_tasks_biased(biasing, rng, record_draws, factor_draws)
+            initial_failure_probabilities = initial_failure_probabilities.copy()
+            initial_failure_probabilities["likelihood_ratio"] = likelihood_ratio
+        # the counters are also recorded if the consumer stops early, with the tasks that were done
+        number_of_tasks = 0
+        try:
+            yield initial_failure_probabilities
+
+            failure_probabilities = initial_failure_probabilities.drop("likelihood_ratio", errors="ignore")
+            for i, task in enumerate(self.tasks):
+                if task_outcomes is None:
+                    task_result, check_result = self._do_task_and_check(
+                        task, rng, record_draws=record_draws, factor_draws=factor_draws[i]
+                    )
+                else:
+                    task_result, check_result = task_outcomes[i]
+                number_of_tasks += 1
+                profiler.count("errors", check_result["error_occurred"])
+
+                # if no error occured during this task, continue to the next task
+                if check_result["error_occurred"] and not check_result["error_corrected"]:
+                    profiler.count("uncorrected_errors")
+                    mutated_parameter, error_magnitude = self.structure.update_state(state, task_result, rng)
+                    task_result["error_magnitude"] = error_magnitude
+                    task_result["mutated_parameter"] = mutated_parameter
+                    with profiler.timer("failure_probability"):
+                        failure_probabilities = self.structure.calculate_failure_probabilities(
+                            number_of_iterations=number_of_parameter_draws, state=state, rng=rng
+                        )
+                    task_result["scenario"] = task_result["scenario"].name
+                with profiler.timer("result_assembly"):
+                    record = pd.concat([task_result, check_result, failure_probabilities])
+                    if likelihood_ratio is not None:
+                        record["likelihood_ratio"] = likelihood_ratio
+                yield record
+        finally:
+            profiler.count("seeds")
+            profiler.count("tasks", number_of_tasks)
+            profiler.add_time("simulate", time.perf_counter() - start)
+        return
+
+    def simulate(
+        self, seed: int, number_of_parameter_draws: int = 1e8,
+        parameter_draw_batch_size: int = 1e6, initial_failure_probabilities: dict[str: float] = None,
+        biasing: ErrorBiasing = None, record_draws: bool = False, factor_design: LatinHypercubeDesign = None
+    ) -> pd.Dataframe:
+        """simulates the tasks, checks and resulting failure probabilities of the structure for one seed
+
+        Args:
+            seed (int): the seed of the simulation
+            number_of_parameter_draws (int, optional): the number of draws per failure probability calculation.
+            Defaults to 1e8.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            initial_failure_probabilities (dict[str: float], optional): the failure probabilities of the
+            initial structure, if known these are not determined again. Defaults to None, i.e. the initial
+            failure probabilities of this simulator, if known.
+            biasing (ErrorBiasing, optional): if specified, the errors and their corrections are sampled from
+            this biased distribution and the simulation's likelihood ratio is added in the column
+            'likelihood_ratio'. Defaults to None.
+            record_draws (bool, optional): if True, the draws behind the error path are recorded, such that
+            the results can be reweighted afterwards, see `reweight`. Defaults to False.
+            factor_design (LatinHypercubeDesign, optional): if specified, the factor draws of the tasks are taken
+            from this stratified design instead of being drawn independently. Defaults to None.
+
+        Returns:
+            pd.Dataframe: the results of the initial structure and of each task
+        """
+        import pandas as pd
+        failure_probabily_rows = list(self.iter_simulate(
+            seed, number_of_parameter_draws, parameter_draw_batch_size, initial_failure_probabilities, biasing,
+            record_draws, factor_design
+        ))
+
+        # combine the failure probability results of each task in one dataframe
+        with profiler.timer("result_assembly"):
+            collective_df = pd.concat(failure_probabily_rows, axis=1).T
+            if biasing is not None:
+                collective_df["likelihood_ratio"] = collective_df["likelihood_ratio"].astype(float)
+            collective_df = self._sort_columns(collective_df)
+        return collective_df
+
+    def simulate_seeds(
+        self, seeds: Iterable[int], number_of_parameter_draws: int = 1e8, parameter_draw_batch_size: int = 1e6,
+        initial_failure_probabilities: dict[str: float] = None, biasing: ErrorBiasing = None,
+        record_draws: bool = False, factor_design: LatinHypercubeDesign = None, executor: Executor = None,
+        number_of_workers: int = 4, max_pending: int = None
+    ) -> Iterator[tuple[int, pd.DataFrame]]:
+        """simulates a stream of seeds and yields each simulation as soon as it is completed, see `simulate` for
+        the arguments of the simulations.
+
+        At most `max_pending` seeds are submitted to the executor at a time, so the stream may be infinite (e.g.
+        `itertools.count(1)`) and the memory that is held is bounded. If the consumer stops early (e.g. once a
+        failure probability exceeds a threshold), the seeds that did not start yet are cancelled.
+
+        Args:
+            seeds (Iterable[int]): the seeds to simulate
+            executor (Executor, optional): the executor that runs the simulations (e.g. a pool of threads or
+            processes). Defaults to None, i.e. the seeds are simulated one by one when the next simulation is
+            requested.
+            number_of_workers (int, optional): the number of workers of the executor. Defaults to 4.
+            max_pending (int, optional): the maximum number of submitted seeds that are not yet yielded.
+            Defaults to None, i.e. twice the number of workers.
+
+        Yields:
+            tuple[int, pd.DataFrame]: the seed and the results of a simulation, in the order of completion
+        """
+        arguments = (
+            number_of_parameter_draws, parameter_draw_batch_size, initial_failure_probabilities, biasing,
+            record_draws, factor_design
+        )
+        if executor is None:
+            for seed in seeds:
+                yield seed, self.simulate(seed, *arguments)
+            return
+
+        if max_pending is None:
+            max_pending = 2 * number_of_workers
+        seeds = iter(seeds)
+        pending = {}
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    seed = next(seeds, None)
+                    if seed is None:
+                        break
+                    pending[executor.submit(self.simulate, seed, *arguments)] = seed
+                if len(pending) == 0:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def simulate_error_path(
+        self, seed: int, biasing: ErrorBiasing = None, record_draws: bool = False,
+        factor_design: LatinHypercubeDesign = None
+    ) -> tuple[pd.DataFrame, list[tuple[float, ...]]]:
+        """simulates the error path of a seed (phase one of a two-phase simulation), i.e. performs all tasks
+        and checks and applies the scenarios of uncorrected errors to the structure, without determining any
+        failure probability.
 
-            if self.check is None:
-                check_result = pd.Series({
-                    "error_occurred": bool(task_result["scenario"] is not None),
-                    "error_corrected": False
-                })
+        The tasks, the checks and the mutations of each task draw from independent random streams that are
+        spawned from the seed, such that an error path does not depend on how its failure probabilities are
+        determined afterwards. Note that an error path therefore differs from the path that `simulate` yields
+        for the same seed.
+
+        Args:
+            seed (int): the seed of the simulation
+            biasing (ErrorBiasing, optional): if specified, the errors and their corrections are sampled from
+            this biased distribution and the likelihood ratio is added in the column 'likelihood_ratio'.
+            Defaults to None.
+            record_draws (bool, optional): if True, the draws behind the error path are recorded, see
+            `reweight`. Defaults to False.
+            factor_design (LatinHypercubeDesign, optional): the stratified design of the factor draws, see
+            `simulate`. Defaults to None.
+
+        Returns:
+            tuple[pd.DataFrame, list[tuple[float, ...]]]: the task and check results per task, with a column
+            'state' referring to the parameter state of the structure after each task, and the parameter
+            states themselves (the values of the structure's parameters). The first row and the first state
+            are those of the initial structure.
+        """
+        import pandas as pd
+        start = time.perf_counter()
+
+        # spawn independent random streams for the tasks, the checks and the mutations of each task
+        task_seed, check_seed, mutation_seed = np.random.SeedSequence(seed).spawn(3)
+        task_rng = np.random.default_rng(task_seed)
+        check_rng = np.random.default_rng(check_seed)
+        mutation_seeds = mutation_seed.spawn(len(self.tasks))
+
+        state = self.structure.initial_state()
+        states = [state.as_tuple()]
+        factor_draws = [None] * len(self.tasks) if factor_design is None else factor_design.factor_draws(seed)
+        task_outcomes, likelihood_ratio = None, None
+        if biasing is not None:
+            task_outcomes, likelihood_ratio = self._do_tasks_biased(biasing, task_rng, record_draws, factor_draws)
+        path_rows = [pd.Series({"state": 0})]
+        for i, (task, task_mutation_seed) in enumerate(zip(self.tasks, mutation_seeds)):
+            if task_outcomes is None:
+                task_result, check_result = self._do_task_and_check(
+                    task, task_rng, check_rng, record_draws, factor_draws[i]
+                )
             else:
-                check_result = self.check.do_check(task_result, rng=rng)
+                task_result, check_result = task_outcomes[i]
 
-            # if no error occured during this task, continue to the next task
             if check_result["error_occurred"] and not check_result["error_corrected"]:
-                mutated_parameter, error_magnitude = structure_copy.update_parameters(task_result, rng)
+                mutated_parameter, error_magnitude = self.structure.update_state(
+                    state, task_result, np.random.default_rng(task_mutation_seed)
+                )
                 task_result["error_magnitude"] = error_magnitude
                 task_result["mutated_parameter"] = mutated_parameter
-                failure_probabilities = structure_copy.calculate_failure_probabilities(
-                    number_of_iterations=number_of_parameter_draws
-                )
                 task_result["scenario"] = task_result["scenario"].name
-            failure_probabily_rows.append(pd.concat([task_result, check_result, failure_probabilities]))
+                states.append(state.as_tuple())
+            path_rows.append(pd.concat([task_result, check_result, pd.Series({"state": len(states) - 1})]))
 
-        # combine the failure probability results of each task in one dataframe
-        collective_df = pd.concat(failure_probabily_rows, axis=1).T
+        path_df = pd.concat(path_rows, axis=1).T
+        if likelihood_ratio is not None:
+            path_df["likelihood_ratio"] = likelihood_ratio
 
-        # sort the columns in a way that is more convenient to read
-        sorted_columns = [
-            "task", "error_occurred", "error_corrected", "scenario",
-            "complexity_level", "mutated_parameter", "error_magnitude", "hep", "bendingMomentULS", "total"
-        ]
-        other_columns = []
-        for column in collective_df.columns:
-            if column in sorted_columns:
+        profiler.count("error_paths")
+        profiler.add_time("error_path", time.perf_counter() - start)
+        return path_df, states
+
+    def error_path_from_results(
+        self, simulation_df: pd.DataFrame, failure_probability_columns: list[str]
+    ) -> tuple[pd.DataFrame, list[tuple[float, ...]]]:
+        """reconstructs the error path of a simulation from its results, by applying the recorded mutations
+        (the mutated parameter and the magnitude of the error of each task) to the initial state of the
+        structure. The error path can be evaluated again, e.g. with other failure probability settings or
+        a modified structure, see `evaluate_error_paths`.
+
+        Args:
+            simulation_df (pd.DataFrame): the results of the simulation, e.g. as read from its output file
+            failure_probability_columns (list[str]): the columns of the failure probabilities in the results,
+            these are removed
+
+        Returns:
+            tuple[pd.DataFrame, list[tuple[float, ...]]]: the error path, see `simulate_error_path`
+        """
+        state = self.structure.initial_state()
+        states = [state.as_tuple()]
+        state_ids = [0]
+        mutations = zip(simulation_df["mutated_parameter"].iloc[1:], simulation_df["error_magnitude"].iloc[1:])
+        for mutated_parameter, error_magnitude in mutations:
+            if isinstance(mutated_parameter, str):
+                # as in `Scenario.update_state`, parameters that the structure does not have are not mutated
+                if mutated_parameter in state.index:
+                    state.multiply(mutated_parameter, float(error_magnitude))
+                states.append(state.as_tuple())
+            state_ids.append(len(states) - 1)
+        path_df = simulation_df.drop(
+            columns=[column for column in failure_probability_columns if column in simulation_df.columns]
+        )
+        path_df["state"] = state_ids
+        return path_df, states
+
+    def evaluate_error_paths(
+        self, error_paths: dict[int, tuple[pd.DataFrame, list[tuple[float, ...]]]],
+        number_of_parameter_draws: int = 1e8, parameter_draw_batch_size: int = 1e6,
+        initial_failure_probabilities: dict[str: float] = None, seed: int = None, executor: Executor = None,
+        max_batch_elements: int = 4e6, states_per_chunk: int = 1024
+    ) -> dict[int, pd.DataFrame]:
+        """determines the failure probabilities of simulated error paths (phase two of a two-phase simulation).
+
+        The distinct parameter states of all error paths are collected and evaluated through
+        `Structure.calculate_failure_probabilities_batch` in chunks of `states_per_chunk` states, which all
+        share one sample of base variates. States that occur in several paths (e.g. the initial state) are
+        evaluated only once. The memory in use is bounded by the passes of at most `max_batch_elements` draws
+        per parameter, about (number of parameters + a few) * `max_batch_elements` * 8 bytes per process.
+
+        Args:
+            error_paths (dict[int, tuple[pd.DataFrame, list[tuple[float, ...]]]]): the error paths by their
+            seeds, as returned by `simulate_error_path`
+            number_of_parameter_draws (int, optional): the number of draws per state. Defaults to 1e8.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            initial_failure_probabilities (dict[str: float], optional): the failure probabilities of the
+            initial structure, if known these are not determined again. Defaults to None, i.e. the initial
+            failure probabilities of this simulator, if known.
+            seed (int, optional): the seed of the base variates. Defaults to None.
+            executor (Executor, optional): the executor that evaluates the states in parallel jobs.
+            Defaults to None.
+            max_batch_elements (int, optional): the maximum number of draws per parameter of a pass.
+            Defaults to 4e6.
+            states_per_chunk (int, optional): the number of states per evaluation. Defaults to 1024.
+
+        Returns:
+            dict[int, pd.DataFrame]: the simulation results by their seeds, formatted as by `simulate`
+        """
+        import pandas as pd
+
+        if initial_failure_probabilities is None:
+            initial_failure_probabilities = self.initial_failure_probabilities
+
+        # collect the distinct states of all error paths
+        initial_state = self.structure.initial_state().as_tuple()
+        state_ids = {initial_state: 0}
+        path_state_ids = {}
+        for path_seed, (path_df, states) in error_paths.items():
+            ids = [state_ids.setdefault(state, len(state_ids)) for state in states]
+            path_state_ids[path_seed] = np.array(ids)[path_df["state"].to_numpy(dtype=int)]
+        profiler.count("state_cache_hits", sum(len(ids) for ids in path_state_ids.values()) - len(state_ids))
+
+        # evaluate the failure probabilities of all distinct states in batched passes
+        distinct_states = list(state_ids.keys())
+        if initial_failure_probabilities is not None:
+            distinct_states = distinct_states[1:]
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        with profiler.timer("failure_probability_batch"):
+            failure_probabilities = pd.concat([
+                self.structure.calculate_failure_probabilities_batch(
+                    distinct_states[start:start + int(states_per_chunk)], number_of_parameter_draws,
+                    parameter_draw_batch_size, seed=seed, max_batch_elements=max_batch_elements, executor=executor
+                )
+                for start in range(0, max(len(distinct_states), 1), int(states_per_chunk))
+            ], ignore_index=True)
+        if initial_failure_probabilities is not None:
+            initial_row = pd.DataFrame([pd.Series(initial_failure_probabilities)])
+            failure_probabilities = pd.concat([initial_row, failure_probabilities], ignore_index=True)
+
+        # join the failure probabilities back to the error paths
+        results = {}
+        with profiler.timer("result_assembly"):
+            for path_seed, (path_df, _) in error_paths.items():
+                path_failure_probabilities = failure_probabilities.iloc[path_state_ids[path_seed]]
+                collective_df = pd.concat([
+                    path_df.drop(columns="state").reset_index(drop=True),
+                    path_failure_probabilities.reset_index(drop=True)
+                ], axis=1)
+                results[path_seed] = self._sort_columns(collective_df)
+        return results
+
+    def simulate_two_phase(
+        self, seeds: list[int], number_of_parameter_draws: int = 1e8, parameter_draw_batch_size: int = 1e6,
+        initial_failure_probabilities: dict[str: float] = None, seed: int = None, biasing: ErrorBiasing = None,
+        record_draws: bool = False, factor_design: LatinHypercubeDesign = None
+    ) -> dict[int, pd.DataFrame]:
+        """simulates multiple seeds in two phases: first the error paths of all seeds are simulated, then the
+        failure probabilities of all distinct parameter states are determined in batched passes.
+
+        Args:
+            seeds (list[int]): the seeds to simulate
+            number_of_parameter_draws (int, optional): the number of draws per state. Defaults to 1e8.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            initial_failure_probabilities (dict[str: float], optional): the failure probabilities of the
+            initial structure, if known these are not determined again. Defaults to None.
+            seed (int, optional): the seed of the base variates that are used in the second phase.
+            Defaults to None.
+            biasing (ErrorBiasing, optional): the biased distribution of the errors and their corrections, see
+            `simulate_error_path`. Defaults to None.
+            record_draws (bool, optional): if True, the draws behind the error paths are recorded, see
+            `reweight`. Defaults to False.
+            factor_design (LatinHypercubeDesign, optional): the stratified design of the factor draws, see
+            `simulate`. Defaults to None.
+
+        Returns:
+            dict[int, pd.DataFrame]: the simulation results by their seeds, formatted as by `simulate`
+        """
+        error_paths = {
+            path_seed: self.simulate_error_path(path_seed, biasing, record_draws, factor_design) for path_seed in seeds
+        }
+        return self.evaluate_error_paths(
+            error_paths, number_of_parameter_draws, parameter_draw_batch_size, initial_failure_probabilities, seed
+        )
+
+    def estimate_final_failure_probability(
+        self, target_standard_error: float, initial_failure_probabilities: dict[str: float] = None,
+        number_of_pilot_draws: int = 1e4, max_number_of_draws: int = 1e8, parameter_draw_batch_size: int = 1e6,
+        number_of_pilot_samples: int = 50, max_number_of_samples: int = None, seed: int = None
+    ) -> pd.Series:
+        """estimates the expected final failure probability of a campaign with a nested Monte Carlo estimator
+        that allocates the error paths and their inner draws for a target standard error, see `NestedEstimator`.
+
+        Args:
+            target_standard_error (float): the target standard error of the estimate
+            initial_failure_probabilities (dict[str: float], optional): the failure probabilities of the
+            initial structure. Defaults to None, i.e. those of this simulator or, if unknown, these are
+            determined with 1e7 draws.
+            number_of_pilot_draws (int, optional): the number of inner draws of the pilot samples.
+            Defaults to 1e4.
+            max_number_of_draws (int, optional): the largest number of inner draws per error path.
+            Defaults to 1e8.
+            parameter_draw_batch_size (int, optional): the number of inner draws per batch. Defaults to 1e6.
+            number_of_pilot_samples (int, optional): the number of pilot samples. Defaults to 50.
+            max_number_of_samples (int, optional): the maximum number of error paths. Defaults to None.
+            seed (int, optional): the seed of the inner draws. Defaults to None.
+
+        Returns:
+            pd.Series: the estimate, see `NestedEstimator.estimate`
+        """
+        if initial_failure_probabilities is None:
+            initial_failure_probabilities = self.initial_failure_probabilities
+        if initial_failure_probabilities is None:
+            initial_failure_probabilities = self.structure.calculate_failure_probabilities(
+                1e7, parameter_draw_batch_size
+            )
+        estimator = NestedEstimator(
+            self, initial_failure_probabilities, number_of_pilot_draws, max_number_of_draws,
+            parameter_draw_batch_size, seed=seed
+        )
+        return estimator.run(target_standard_error, number_of_pilot_samples, max_number_of_samples)
+
+    def recorded_draws(self, simulations: dict[int, pd.DataFrame]) -> tuple[np.ndarray, list[dict]]:
+        """extracts the recorded draws and outcomes of each task from simulations, such that the simulations can
+        be weighted under many modified models (see `likelihood_ratios`) without extracting these again. The
+        simulations should have been simulated with `record_draws`, see `reweight`.
+
+        Args:
+            simulations (dict[int, pd.DataFrame]): the simulation results by their seeds
+
+        Raises:
+            RuntimeError: if no draws are recorded for a factor of a task
+
+        Returns:
+            tuple[np.ndarray, list[dict]]: the log likelihood ratio of each simulation and, per task, the HEPs,
+            errors, checked errors, corrections and the effect and multiplier draws of each factor
+        """
+        import pandas as pd
+        from . import analysis
+        simulations_df = pd.concat(simulations, names=["seed", "row"])
+        log_likelihood_ratios = np.zeros(len(simulations))
+        if "likelihood_ratio" in simulations_df:
+            with np.errstate(divide="ignore"):
+                log_likelihood_ratios += np.log(
+                    simulations_df["likelihood_ratio"].xs(0, level="row").to_numpy(dtype=float)
+                )
+
+        recorded_draws = []
+        for i, task in enumerate(self.tasks, start=1):
+            task_df = simulations_df.xs(i, level="row")
+            hep = task_df["hep"].to_numpy(dtype=float)
+            # an error occurs if its draw is at most the HEP, also if the task has no scenario to apply (then no
+            # error is reported); simulations without the draw (e.g. biased ones) report their errors
+            checked = analysis._as_bool(task_df["error_occurred"]).to_numpy()
+            errors = checked.copy()
+            if "error_draw" in task_df:
+                error_draws = task_df["error_draw"].to_numpy(dtype=float)
+                recorded = ~np.isnan(error_draws)
+                errors[recorded] = error_draws[recorded] <= hep[recorded]
+            task_draws = {
+                "hep": np.clip(hep, 0, 1),
+                "errors": errors,
+                "checked": checked,
+                "corrections": checked & analysis._as_bool(task_df["error_corrected"]).to_numpy(),
+                "factor_draws": {}
+            }
+            for factor in task.task_type.factors:
+                effect_draw_column = f"{factor.name}_effect_draw"
+                if effect_draw_column not in task_df:
+                    raise RuntimeError(f"no draws are recorded for factor '{factor.name}' of task '{task.name}'")
+                task_draws["factor_draws"][factor.name] = (
+                    task_df[effect_draw_column].to_numpy(dtype=float),
+                    task_df[f"{factor.name}_multiplier_draw"].to_numpy(dtype=float)
+                )
+            recorded_draws.append(task_draws)
+        return log_likelihood_ratios, recorded_draws
+
+    def likelihood_ratios(
+        self, log_likelihood_ratios: np.ndarray, recorded_draws: list[dict], factors: list[Factor] = None,
+        nheps: dict[str, float] = None, check_effectiveness: float = None
+    ) -> np.ndarray:
+        """determines the weight of each simulation under a modified model from its recorded draws, see
+        `reweight`
+
+        Args:
+            log_likelihood_ratios (np.ndarray): the log likelihood ratio of each simulation, see `recorded_draws`
+            recorded_draws (list[dict]): the recorded draws and outcomes of each task, see `recorded_draws`
+            factors (list[Factor], optional): modified factors, they replace the factors of this simulator that
+            have the same name. Defaults to None.
+            nheps (dict[str, float], optional): modified nominal HEPs by the name of their task type.
+            Defaults to None.
+            check_effectiveness (float, optional): the modified effectiveness of the check. Defaults to None.
+
+        Raises:
+            ValueError: if the effectiveness of the check is modified while this simulator has no check
+
+        Returns:
+            np.ndarray: the weight of each simulation, in the order of the simulations of `recorded_draws`
+        """
+        if check_effectiveness is not None and self.check is None:
+            raise ValueError("unable to reweight the effectiveness of the check, this simulator has no check")
+        modified_factors = {factor.name: factor for factor in (factors or [])}
+        nheps = nheps or {}
+
+        log_weights = np.array(log_likelihood_ratios, dtype=float)
+        for task, task_draws in zip(self.tasks, recorded_draws):
+            errors, hep = task_draws["errors"], task_draws["hep"]
+
+            # recompute the HEP of this task under the modified model
+            multipliers = [
+                modified_factors.get(factor.name, factor).multipliers_from_draws(
+                    *task_draws["factor_draws"][factor.name]
+                )
+                for factor in task.task_type.factors
+            ]
+            nhep = nheps.get(task.task_type.name, task.task_type.nhep)
+            modified_hep = np.prod(multipliers, axis=0) ** (1.0 / len(multipliers)) * nhep
+            modified_hep = np.clip(modified_hep, 0, 1)
+
+            log_weights += _log_likelihood_ratio(errors, modified_hep, hep)
+
+            # weight the corrections of the checked errors with the modified effectiveness of the check
+            if check_effectiveness is None:
                 continue
-            other_columns.append(column)
-        sorted_columns.extend(sorted(other_columns, key=self._data_column_sort_key))
-        collective_df = collective_df[sorted_columns]
+            checked = task_draws["checked"]
+            log_weights[checked] += _log_likelihood_ratio(
+                task_draws["corrections"][checked], check_effectiveness, self.check.effectiveness
+            )
 
-        return collective_df
+        return np.exp(log_weights)
+
+    def reweight(
+        self, simulations: dict[int, pd.DataFrame], factors: list[Factor] = None, nheps: dict[str, float] = None,
+        check_effectiveness: float = None
+    ) -> pd.Series:
+        """determines the weights of existing simulations under a modified model, such that results can be
+        estimated under that model without simulating again (see `analysis.summarize`).
+
+        The simulations should have been simulated with `record_draws`. The HEP of each task is recomputed under
+        the modified model from the recorded draws of its factors, and each simulation is weighted with the
+        likelihood ratio of its errors and corrections under the modified and the simulated model (multiplied
+        with its own likelihood ratio, if it was simulated with a biasing). Note that errors with a HEP of 0 in
+        the simulated model are never sampled, so modifications that make these possible are not represented;
+        likewise, with a simulated check effectiveness of 0 or 1, modifications of the check effectiveness get a
+        weight of 0 for the outcomes that were never sampled rather than an undefined weight.
+
+        Args:
+            simulations (dict[int, pd.DataFrame]): the simulation results by their seeds
+            factors (list[Factor], optional): modified factors, they replace the factors of this simulator that
+            have the same name. Defaults to None.
+            nheps (dict[str, float], optional): modified nominal HEPs by the name of their task type.
+            Defaults to None.
+            check_effectiveness (float, optional): the modified effectiveness of the check. Defaults to None.
+
+        Returns:
+            pd.Series: the weight of each simulation by its seed
+        """
+        import pandas as pd
+        log_likelihood_ratios, recorded_draws = self.recorded_draws(simulations)
+        weights = self.likelihood_ratios(log_likelihood_ratios, recorded_draws, factors, nheps, check_effectiveness)
+        return pd.Series(weights, index=list(simulations.keys()), name="weight")
 
     @classmethod
     def parse_from_directory(
@@ -113,3 +749,84 @@ class Simulator:
         else:
             check = None
         return cls(structure, tasks, check)
+
+    @classmethod
+    def load_from_directory(
+        cls, directory: str, snapshot_file: str = None, number_of_initial_draws: int = None,
+        initial_draw_batch_size: int = 1e7, hofs_filename: str = "hofs_frequencies_and_multipliers.csv",
+        task_types_filename: str = "gtt_nhep_hofs.csv", structure_filename: str = "structure.csv",
+        scenarios_filename: str = "scenarios.csv", tasks_filename: str = "tasks.csv",
+        include_check: bool = True, initial_seed: int = 1
+    ) -> Simulator:
+        """loads a simulator from a snapshot of the parsed model, if the snapshot is up to date with the input
+        files in a directory; otherwise the simulator is parsed (see `parse_from_directory`) and the snapshot is
+        (re)written. Loading a snapshot does not read the input files (only their hashes are determined) and
+        does not import pandas.
+
+        The failure probabilities of the initial structure are stored in a snapshot of their own (next to the
+        snapshot of the model), by the number of draws with which they were determined, and assigned to the
+        simulator. As they only depend on the structure file and the failure modes, changes of the other input
+        files do not invalidate them; they are determined with a seeded generator, so that they are reproduced
+        if they are determined again.
+
+        Args:
+            directory (str): the directory containing the input files
+            snapshot_file (str, optional): the path of the snapshot file. Defaults to None, i.e. a file named
+            `.hofss_snapshot.pkl` in the directory.
+            number_of_initial_draws (int, optional): the number of draws with which the failure probabilities of
+            the initial structure are determined, if these are not in the snapshot yet. Defaults to None, i.e.
+            the initial failure probabilities are not determined.
+            initial_draw_batch_size (int, optional): the number of draws per batch when determining the initial
+            failure probabilities. Defaults to 1e7.
+            include_check (bool, optional): whether the simulator includes a check. Defaults to True.
+            initial_seed (int, optional): the seed of the draws of the initial failure probabilities.
+            Defaults to 1.
+            For the other arguments, see `parse_from_directory`.
+
+        Returns:
+            Simulator: the simulator
+        """
+        if snapshot_file is None:
+            snapshot_file = os.path.join(directory, ".hofss_snapshot.pkl")
+        file_paths = [
+            os.path.join(directory, filename) for filename in
+            [hofs_filename, task_types_filename, structure_filename, scenarios_filename, tasks_filename]
+        ]
+        key = snapshot.snapshot_key(file_paths, include_check=include_check)
+
+        content = snapshot.load_snapshot(snapshot_file, key)
+        if content is None:
+            content = {
+                "simulator": cls.parse_from_directory(
+                    directory, hofs_filename, task_types_filename, structure_filename, scenarios_filename,
+                    tasks_filename, include_check
+                )
+            }
+            snapshot.save_snapshot(snapshot_file, key, content)
+        simulator: Simulator = content["simulator"]
+        if number_of_initial_draws is None:
+            return simulator
+
+        # the initial failure probabilities are stored by the number of draws with which they were determined
+        failure_probabilities_file = f"{os.path.splitext(snapshot_file)[0]}_initial_failure_probabilities.pkl"
+        failure_probabilities_key = snapshot.snapshot_key(
+            [os.path.join(directory, structure_filename)],
+            failure_modes=[failure_mode.__name__ for failure_mode in simulator.structure.failure_modes],
+            batch_size=int(initial_draw_batch_size), seed=initial_seed
+        )
+        cached_failure_probabilities = snapshot.load_snapshot(failure_probabilities_file, failure_probabilities_key)
+        if cached_failure_probabilities is None:
+            cached_failure_probabilities = {}
+        number_of_initial_draws = int(number_of_initial_draws)
+        if number_of_initial_draws not in cached_failure_probabilities:
+            initial_failure_probabilities = simulator.structure.calculate_failure_probabilities(
+                number_of_initial_draws, initial_draw_batch_size, simulator.structure.initial_state(),
+                np.random.default_rng(initial_seed)
+            )
+            cached_failure_probabilities[number_of_initial_draws] = {
+                failure_mode: float(failure_probability)
+                for failure_mode, failure_probability in initial_failure_probabilities.items()
+            }
+            snapshot.save_snapshot(failure_probabilities_file, failure_probabilities_key, cached_failure_probabilities)
+        simulator.initial_failure_probabilities = dict(cached_failure_probabilities[number_of_initial_draws])
+        return simulator
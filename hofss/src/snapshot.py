@@ -0,0 +1,91 @@
+from __future__ import annotations
+import os
+import pickle
+import hashlib
+import tempfile
+
+from .._version import __version__
+
+
+SNAPSHOT_FORMAT = 2
+"the version of the snapshot format, snapshots of another format are not loaded"
+
+
+def file_hash(file_path: str) -> str:
+    """determines the SHA-256 hash of the content of a file
+
+    Args:
+        file_path (str): the path of the file
+
+    Returns:
+        str: the hexadecimal hash
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def snapshot_key(file_paths: list[str], **settings) -> dict:
+    """creates the key of a snapshot: a snapshot is only valid for the same format, version of this package,
+    input files (by their content) and settings
+
+    Args:
+        file_paths (list[str]): the paths of the input files of the snapshot
+        **settings: other settings that affect the content of the snapshot
+
+    Returns:
+        dict: the key
+    """
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": __version__,
+        "files": {os.path.basename(file_path): file_hash(file_path) for file_path in file_paths},
+        "settings": settings,
+    }
+
+
+def save_snapshot(snapshot_file: str, key: dict, content: dict):
+    """saves a snapshot to a file, the file is replaced at once such that concurrent readers never see a partial
+    snapshot
+
+    Args:
+        snapshot_file (str): the path of the snapshot file
+        key (dict): the key of the snapshot, see `snapshot_key`
+        content (dict): the content of the snapshot, it should be picklable
+    """
+    directory = os.path.dirname(os.path.abspath(snapshot_file))
+    file_descriptor, temporary_file = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            pickle.dump({"key": key, "content": content}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file, snapshot_file)
+    except BaseException:
+        os.remove(temporary_file)
+        raise
+    return
+
+
+def load_snapshot(snapshot_file: str, key: dict) -> dict:
+    """loads the content of a snapshot, if the snapshot exists and has the specified key.
+
+    Note that a snapshot is a pickle file, only load snapshots that you created yourself.
+
+    Args:
+        snapshot_file (str): the path of the snapshot file
+        key (dict): the expected key of the snapshot, see `snapshot_key`
+
+    Returns:
+        dict: the content of the snapshot, None if the snapshot does not exist, cannot be read or has another key
+    """
+    if not os.path.exists(snapshot_file):
+        return None
+    try:
+        with open(snapshot_file, "rb") as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("key") != key:
+        return None
+    return snapshot["content"]
@@ -2,14 +2,71 @@ from __future__ import annotations
 import os
 import copy
 import dataclasses
-from typing import Iterable, Callable
+from typing import Iterable, Callable, TYPE_CHECKING
+from concurrent.futures import Executor
 import numpy as np
-import pandas as pd
 
 from .scenario import Scenario
-from ..data_structures import Parameter, FactorLevel
+from .base_sample import BaseSample
+from .system_reliability import SystemReliability
+from .profiling import profiler
+from ..data_structures import Parameter, FactorLevel, StructureState
 from ..failure_modes import failure_mode_functions
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _draw_base_variates(
+    parameter: Parameter, seed: np.random.SeedSequence, number_of_draws: int
+) -> np.ndarray | dict[float, np.ndarray] | None:
+    """draws the standard normal variates of a normal or lognormal parameter, of which the draws for any value
+    are a transformation; None for a parameter without a standard deviation and an (empty) cache of the draws by
+    value for other distributions"""
+    if parameter.standard_deviation == 0:
+        return None
+    if parameter.distribution_function.__name__ not in ("normal", "lognormal"):
+        return {}
+    return np.random.default_rng(seed).standard_normal(number_of_draws)
+
+
+def _transform_base_variates(
+    parameter: Parameter, values: np.ndarray, base_variates: np.ndarray | dict[float, np.ndarray] | None,
+    seed: np.random.SeedSequence, number_of_draws: int, max_cached_draws: int
+) -> np.ndarray:
+    """the draws of a parameter for several values of it, with one row per value (a single row if all values
+    are equal), as `Parameter.draw` draws them from a random number generator with the given seed. Draws that
+    are not a transformation of base variates are kept in their cache, up to `max_cached_draws` draws."""
+    if np.all(values == values[0]):
+        values = values[:1]
+    if parameter.standard_deviation == 0:
+        return values[:, np.newaxis]
+    if isinstance(base_variates, dict):
+        distinct_values, inverse = np.unique(values, return_inverse=True)
+        function_name = parameter.distribution_function.__name__
+        draws = np.empty((len(distinct_values), number_of_draws))
+        for k, value in enumerate(distinct_values.tolist()):
+            if value not in base_variates:
+                if (len(base_variates) + 1) * number_of_draws > max_cached_draws:
+                    base_variates.clear()
+                rng = np.random.default_rng(seed)
+                base_variates[value] = dataclasses.replace(
+                    parameter, value=value, distribution_function=getattr(rng, function_name)
+                ).draw(number_of_draws)
+            draws[k] = base_variates[value]
+        return draws[inverse]
+    standard_deviation = parameter.standard_deviation
+    if parameter.distribution_function.__name__ == "normal":
+        # loc + scale * z, as numpy draws normal variates
+        draws = np.multiply.outer(np.full(len(values), standard_deviation), base_variates)
+        draws += values[:, np.newaxis]
+        return draws
+    mu = np.log(values ** 2 / np.sqrt(values ** 2 + standard_deviation ** 2))
+    sigma = np.sqrt(np.log(1 + standard_deviation ** 2 / values ** 2))
+    draws = np.multiply.outer(sigma, base_variates)
+    draws += mu[:, np.newaxis]
+    return np.exp(draws, out=draws)
+
 
 class Structure:
 
@@ -44,6 +101,9 @@ class Structure:
             if not isinstance(value, Parameter):
                 raise TypeError(f"item at index '{i}' is not of type: Parameter; received: {type(value).__name__}")
         self._parameters = list(values)
+        self._state = None
+        self.base_sample = None
+        self.system_reliability = None
         return
 
     @property
@@ -59,6 +119,8 @@ class Structure:
             if not isinstance(value, Callable):
                 raise TypeError(f"item at index '{i}' is not callable; received type: {type(value).__name__}")
         self._failure_modes = list(values)
+        self.base_sample = None
+        self.system_reliability = None
         return
 
     def update_parameters(self, task_result: pd.Series, rng: np.random.Generator = None) -> tuple[float, None]:
@@ -82,33 +144,149 @@ class Structure:
         )
         return mutated_parameter, error_magnitude
 
-    def draw_parameter_values(self, n: int = 1) -> dict[str, list[float]]:
+    def initial_state(self) -> StructureState:
+        """a copy of the state of this structure's parameters, which can be mutated without affecting this
+        structure (see `update_state`). The state is created once, when the parameters are assigned."""
+        if self._state is None:
+            self._state = StructureState.from_parameters(self.parameters)
+        return self._state.copy()
+
+    def update_state(
+        self, state: StructureState, task_result: pd.Series, rng: np.random.Generator = None
+    ) -> tuple[str, float]:
+        """updates a state of this structure in place according to the scenario of a task result, the
+        counterpart of `update_parameters` for states
+
+        Args:
+            state (StructureState): the state of this structure
+            task_result (pd.Series): the result of the task in which the error occurred
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+
+        Returns:
+            tuple[str, float]: the mutated parameter and the magnitude of the error, both None if the task
+            result has no scenario
+        """
+        scenario: Scenario = task_result["scenario"]
+        if scenario is None:
+            return None, None
+        with profiler.timer("update_state"):
+            return scenario.update_state(state, task_result["complexity_level"], rng)
+
+    def retain_base_sample(
+        self, number_of_draws: int = 1e6, parameter_draw_batch_size: int = 1e6,
+        min_effective_sample_fraction: float = 0.1, seed: int = None
+    ) -> BaseSample:
+        """draws a sample of the initial state of this structure that is retained to estimate the failure
+        probabilities of mutated states by reweighting, see `BaseSample`. Once retained, the failure
+        probabilities of a state (see `calculate_failure_probabilities`) are only determined with new draws if
+        the state cannot be reweighted. The sample is discarded when the parameters or failure modes of this
+        structure are assigned.
+
+        Args:
+            number_of_draws (int, optional): the number of draws of the sample. Defaults to 1e6.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            min_effective_sample_fraction (float, optional): the minimum effective sample size of the weights
+            of a state, as a fraction of the number of draws. Defaults to 0.1.
+            seed (int, optional): the seed of the sample. Defaults to None.
+
+        Returns:
+            BaseSample: the retained sample
+        """
+        self.base_sample = BaseSample(
+            self.initial_state(), self.failure_modes, number_of_draws, parameter_draw_batch_size,
+            min_effective_sample_fraction, seed
+        )
+        return self.base_sample
+
+    def use_system_reliability(
+        self, max_relative_width: float = 0.1, number_of_correlation_draws: int = 1e4, seed: int = None
+    ) -> SystemReliability:
+        """estimates the failure probabilities of mutated states mode by mode and bounds their total, instead of
+        sampling all failure modes jointly, see `SystemReliability`. Once in use, the failure probabilities of a
+        state (see `calculate_failure_probabilities`) are only determined by joint sampling if the bounds of the
+        total are too wide. The system reliability is discarded when the parameters or failure modes of this
+        structure are assigned.
+
+        Args:
+            max_relative_width (float, optional): the maximum width of the bounds of the total failure
+            probability, relative to its upper bound. Defaults to 0.1.
+            number_of_correlation_draws (int, optional): the number of draws with which the correlations
+            between the failure modes are estimated. Defaults to 1e4.
+            seed (int, optional): the seed of the draws of the correlations. Defaults to None.
+
+        Returns:
+            SystemReliability: the system reliability in use
+        """
+        self.system_reliability = SystemReliability(
+            self.initial_state(), self.failure_modes, max_relative_width, number_of_correlation_draws, seed
+        )
+        return self.system_reliability
+
+    def draw_parameter_values(
+        self, n: int = 1, state: StructureState = None, rng: np.random.Generator = None
+    ) -> dict[str, list[float]]:
         """draws parameter values for this structures from this structure's
         parameter definitions using
 
         Args:
             n (int): number of draws per parameter.
+            state (StructureState, optional): if specified, the values are drawn for this state with `rng`
+            instead of for the parameters of this structure with their own distribution functions.
+            Defaults to None.
+            rng (np.random.Generator, optional): the random number generator of the draws for a state.
+            Defaults to None.
 
         Returns:
             dict[str, np.array[float]]: a dictionary with a numpy array of values (size = n)
             by their respective parameter's names
         """
+        if state is not None:
+            return state.draw(np.random.default_rng() if rng is None else rng, n)
         return {p.name: p.draw(n) for p in self.parameters}
 
     def calculate_failure_probabilities(
-        self, number_of_iterations: int = 1e6, parameter_draw_batch_size: int = 1e6
+        self, number_of_iterations: int = 1e6, parameter_draw_batch_size: int = 1e6,
+        state: StructureState = None, rng: np.random.Generator = None
     ) -> dict[str, float]:
         """calculates the failure probabilities for each failure mode through a Monte Carlo simulation
 
         Args:
             number_of_iterations (int, optional): the number of iterations in the
             Monte Carlo simulation. Defaults to 1e6.
-            monte_carlo_seed (int, optional): the seed that is used to create the randomness
-            in the Monte Carlos simulation. Defaults to None.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            state (StructureState, optional): the state of this structure to evaluate, see
+            `draw_parameter_values`. If a base sample is retained (see `retain_base_sample`), the failure
+            probabilities of the state are estimated by reweighting it, if possible. Otherwise, if a system
+            reliability is in use (see `use_system_reliability`), the failure probabilities are estimated mode by
+            mode with bounds of the total, if these are narrow enough. Defaults to None, i.e. this structure's
+            parameters.
+            rng (np.random.Generator, optional): the random number generator of the draws for a state.
+            Defaults to None.
 
         Returns:
             dict[str, float]: a dictionary with the failure probability per failure mode
         """
+        import pandas as pd
+        if state is not None and self.base_sample is not None:
+            with profiler.timer("base_sample_reweighting"):
+                failure_probability_by_mode = self.base_sample.failure_probabilities(state)
+            if failure_probability_by_mode is not None:
+                profiler.count("reweighted_failure_probabilities")
+                return pd.Series(failure_probability_by_mode)
+            profiler.count("base_sample_fallbacks")
+
+        if state is not None and rng is None:
+            rng = np.random.default_rng()
+
+        if state is not None and self.system_reliability is not None:
+            with profiler.timer("system_reliability"):
+                failure_probability_by_mode = self.system_reliability.failure_probabilities(
+                    state, number_of_iterations, parameter_draw_batch_size, rng
+                )
+            if failure_probability_by_mode is not None:
+                profiler.count("system_reliability_bounds")
+                return pd.Series(failure_probability_by_mode)
+            profiler.count("system_reliability_fallbacks")
 
         number_of_total_draws = 0
         number_of_failures_by_mode = {failure_mode.__name__: 0 for failure_mode in self.failure_modes}
@@ -118,26 +296,214 @@ class Structure:
             number_of_total_draws += number_of_draws
 
             # draw the parameter values
-            parameter_values = self.draw_parameter_values(number_of_draws)
+            with profiler.timer("parameter_draws"):
+                parameter_values = self.draw_parameter_values(number_of_draws, state, rng)
 
             # determine if failure occured per iteration and per failure mode, and calculate the
             # failure probability per mode and for the total
-            total_failure = None
-            for failure_mode in self.failure_modes:
-                failure_criteria = failure_mode(**parameter_values)
-                failure_occured = failure_criteria < 0
-                number_of_failures_by_mode[failure_mode.__name__] += np.sum(failure_occured, axis=0)
-                if total_failure is None:
-                    total_failure = failure_occured
-                else:
-                    total_failure = np.logical_or(total_failure, failure_occured)
-            total_number_of_failures += np.sum(total_failure)
-
+            with profiler.timer("failure_functions"):
+                total_failure = None
+                for failure_mode in self.failure_modes:
+                    failure_criteria = failure_mode(**parameter_values)
+                    failure_occured = failure_criteria < 0
+                    number_of_failures_by_mode[failure_mode.__name__] += np.sum(failure_occured, axis=0)
+                    if total_failure is None:
+                        total_failure = failure_occured
+                    else:
+                        total_failure = np.logical_or(total_failure, failure_occured)
+                total_number_of_failures += np.sum(total_failure)
+
+        profiler.count("failure_probability_evaluations")
+        profiler.count("parameter_draws", number_of_iterations)
         number_of_failures_by_mode["total"] = total_number_of_failures
         failure_probability_by_mode = {k: v / number_of_iterations for k, v in number_of_failures_by_mode.items()}
+        if self.system_reliability is not None:
+            self.system_reliability.record(
+                self.initial_state() if state is None else state, number_of_iterations, failure_probability_by_mode
+            )
 
         return pd.Series(failure_probability_by_mode)
 
+    def calculate_failure_probabilities_batch(
+        self, states: list[tuple[float, ...]], number_of_iterations: int = 1e6,
+        parameter_draw_batch_size: int = 1e6, seed: int = None, max_batch_elements: int = 4e6,
+        executor: Executor = None, states_per_job: int = 64
+    ) -> pd.DataFrame:
+        """calculates the failure probabilities for each failure mode of many parameter states at once through
+        a Monte Carlo simulation that shares one sample of base variates across all states.
+
+        For every parameter, one sample of base variates is drawn per batch of draws (standard normal variates
+        for normal and lognormal distributions), which is transformed to the draws of each state. The states are
+        thus evaluated with common random numbers, and the parameters are drawn only once for all states. The
+        states are evaluated in passes of up to `max_batch_elements` draws per parameter, the draws of a pass are
+        only transformed when it is evaluated, such that the memory in use is bounded by `max_batch_elements`
+        rather than by the number of states. Other distributions (e.g. gamma) are drawn for each distinct value
+        from the same random stream instead, and kept (up to `max_batch_elements` draws per parameter) for
+        later passes.
+
+        Args:
+            states (list[tuple[float, ...]]): the parameter states to evaluate, each state contains a value
+            for every parameter of this structure (in the same order). A 2-D array of stacked state values
+            (see `StructureState.stack`) is accepted as well.
+            number_of_iterations (int, optional): the number of iterations in the
+            Monte Carlo simulation per state. Defaults to 1e6.
+            parameter_draw_batch_size (int, optional): the number of draws per parameter and state in one
+            batch. Defaults to 1e6.
+            seed (int, optional): the seed of the base variates. Defaults to None.
+            max_batch_elements (int, optional): the maximum number of draws per parameter that are
+            evaluated in one vectorized pass, a batch of draws is not larger than this either. Defaults to 4e6.
+            executor (Executor, optional): if specified, the states are split in jobs that are evaluated by this
+            executor (e.g. a process pool), all jobs share the same base variates. Defaults to None.
+            states_per_job (int, optional): the number of states per job of the executor. Defaults to 64.
+
+        Returns:
+            pd.DataFrame: the failure probabilities per failure mode (columns) for each state (rows)
+        """
+        import pandas as pd
+        if executor is not None and len(states) > states_per_job:
+            if seed is None:
+                seed = np.random.SeedSequence().entropy
+            futures = [
+                executor.submit(
+                    self.calculate_failure_probabilities_batch, states[start:start + states_per_job],
+                    number_of_iterations, parameter_draw_batch_size, seed, max_batch_elements
+                )
+                for start in range(0, len(states), states_per_job)
+            ]
+            return pd.concat([future.result() for future in futures], ignore_index=True)
+
+        state_values = np.array(states, dtype=float).reshape(len(states), len(self.parameters))
+        number_of_states = len(state_values)
+        failure_mode_names = [failure_mode.__name__ for failure_mode in self.failure_modes]
+        number_of_failures = np.zeros((number_of_states, len(failure_mode_names) + 1))
+
+        seed_sequence = np.random.SeedSequence(seed)
+        number_of_total_draws = 0
+        while number_of_total_draws < number_of_iterations:
+            number_of_draws = int(min(
+                parameter_draw_batch_size, max_batch_elements, number_of_iterations - number_of_total_draws
+            ))
+            number_of_total_draws += number_of_draws
+            parameter_seeds = seed_sequence.spawn(1)[0].spawn(len(self.parameters))
+
+            # draw the base variates once per parameter, all states share them
+            with profiler.timer("parameter_draws"):
+                base_variates = [
+                    _draw_base_variates(parameter, parameter_seed, number_of_draws)
+                    for parameter, parameter_seed in zip(self.parameters, parameter_seeds)
+                ]
+
+            # evaluate the failure modes for as many states at once as the batch size allows
+            states_per_pass = max(1, int(max_batch_elements // number_of_draws))
+            for start in range(0, number_of_states, states_per_pass):
+                end = min(start + states_per_pass, number_of_states)
+                with profiler.timer("parameter_draws"):
+                    parameter_values = {
+                        parameter.name: _transform_base_variates(
+                            parameter, state_values[start:end, j], base_variates[j], parameter_seeds[j],
+                            number_of_draws, max_batch_elements
+                        )
+                        for j, parameter in enumerate(self.parameters)
+                    }
+                with profiler.timer("failure_functions"):
+                    total_failure = np.zeros((end - start, number_of_draws), dtype=bool)
+                    for i, failure_mode in enumerate(self.failure_modes):
+                        failure_occured = np.broadcast_to(failure_mode(**parameter_values) < 0, total_failure.shape)
+                        number_of_failures[start:end, i] += np.sum(failure_occured, axis=1)
+                        total_failure |= failure_occured
+                    number_of_failures[start:end, -1] += np.sum(total_failure, axis=1)
+                del parameter_values, total_failure
+
+        profiler.count("failure_probability_evaluations", number_of_states)
+        profiler.count("parameter_draws", number_of_states * int(number_of_iterations))
+        return pd.DataFrame(number_of_failures / number_of_iterations, columns=[*failure_mode_names, "total"])
+
+    def sweep(
+        self, grid: dict[str, Iterable[float]] | pd.DataFrame, errors: dict[str, dict[str, float]] = None,
+        number_of_iterations: int = 1e6, parameter_draw_batch_size: int = 1e6, seed: int = None,
+        max_batch_elements: int = 4e6, executor: Executor = None, states_per_job: int = 64,
+        states_per_chunk: int = 1024
+    ) -> pd.DataFrame:
+        """calculates the failure probabilities of this structure over a grid of nominal design values, e.g. to
+        study how the failure probability depends on the height and reinforcement of a slab.
+
+        The design points are evaluated with `calculate_failure_probabilities_batch` in chunks of
+        `states_per_chunk` states, all in batched passes over one shared sample of base variates (common random
+        numbers), such that the differences between design points are estimated more precisely than with
+        independent samples, and the memory in use is bounded by the chunks and passes rather than by the size
+        of the grid. The design points can
+        be evaluated without errors and under errors, given as multipliers of the nominal values as the
+        magnitudes of errors of scenarios.
+
+        Args:
+            grid (dict[str, Iterable[float]] | pd.DataFrame): the nominal values per parameter, of which every
+            combination is a design point, or a DataFrame with one design point per row and one column per
+            parameter. Parameters that are not in the grid keep their values.
+            errors (dict[str, dict[str, float]], optional): the multipliers of the nominal values by parameter,
+            per error (e.g. `{"span 20% too long": {"L": 1.2}}`), each error is applied to every design point.
+            Defaults to None, i.e. only the design points without errors.
+            number_of_iterations (int, optional): the number of iterations in the Monte Carlo simulation per
+            design point and error. Defaults to 1e6.
+            executor (Executor, optional): the executor that evaluates the design points in jobs, e.g. a process
+            pool. Defaults to None.
+            states_per_chunk (int, optional): the number of states (design points under errors) that are
+            evaluated at once. Defaults to 1024.
+            For the other arguments, see `calculate_failure_probabilities_batch`.
+
+        Raises:
+            ValueError: if the grid or an error contains a parameter that this structure does not have
+
+        Returns:
+            pd.DataFrame: one row per design point, error and failure mode (including the total): the values
+            of the parameters of the grid, the name of the error (if errors are specified, None without error),
+            the failure mode, the failure probability and its (binomial) standard error
+        """
+        import pandas as pd
+        if isinstance(grid, pd.DataFrame):
+            design_df = grid.reset_index(drop=True)
+        else:
+            grid = {name: np.atleast_1d(np.asarray(values, dtype=float)) for name, values in grid.items()}
+            mesh = np.meshgrid(*grid.values(), indexing="ij")
+            design_df = pd.DataFrame({name: values.ravel() for name, values in zip(grid, mesh)})
+        error_names = None if errors is None else [None, *errors]
+        errors = [{}] if errors is None else [{}, *errors.values()]
+
+        initial_state = self.initial_state()
+        for name in [*design_df.columns, *[name for multipliers in errors for name in multipliers]]:
+            if name not in initial_state.index:
+                raise ValueError(f"structure {self.name} has no parameter named {name!r}")
+
+        # the states of all design points under all errors, as stacked values
+        design_values = np.tile(initial_state.values, (len(design_df), 1))
+        for name in design_df.columns:
+            design_values[:, initial_state.index[name]] = design_df[name].to_numpy(dtype=float)
+        state_values = []
+        for multipliers in errors:
+            error_values = design_values.copy()
+            for name, multiplier in multipliers.items():
+                error_values[:, initial_state.index[name]] *= multiplier
+            state_values.append(error_values)
+        state_values = np.vstack(state_values)
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        failure_probabilities_df = pd.concat([
+            self.calculate_failure_probabilities_batch(
+                state_values[start:start + int(states_per_chunk)], number_of_iterations, parameter_draw_batch_size,
+                seed, max_batch_elements, executor, states_per_job
+            )
+            for start in range(0, len(state_values), int(states_per_chunk))
+        ], ignore_index=True)
+
+        points_df = pd.concat([design_df] * len(errors), ignore_index=True)
+        if error_names is not None:
+            points_df["error"] = pd.Series(error_names, dtype=object).repeat(len(design_df)).to_numpy()
+        sweep_df = pd.concat([points_df, failure_probabilities_df], axis=1).melt(
+            id_vars=list(points_df.columns), var_name="failure_mode", value_name="failure_probability"
+        )
+        p = sweep_df["failure_probability"].to_numpy()
+        sweep_df["standard_error"] = np.sqrt(p * (1 - p) / number_of_iterations)
+        return sweep_df
+
     def make_copy(self, rng: np.random.Generator = None) -> Structure:
 
         if rng is None:
@@ -174,6 +540,7 @@ class Structure:
         Returns:
             Structure: the structure that was parsed from the structure file.
         """
+        import pandas as pd
         structure_data = pd.read_csv(structure_file_path, header=0, index_col=0)
         parameters = []
         structure_failure_modes = {}
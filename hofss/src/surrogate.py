@@ -0,0 +1,261 @@
+from __future__ import annotations
+import logging
+import threading
+import numpy as np
+
+from .profiling import profiler
+
+
+class GaussianProcess:
+    """a Gaussian-process regression model (kriging) with a linear trend and a squared exponential kernel.
+
+    The inputs are standardized and share one length scale, which is chosen on a grid by maximizing the
+    marginal likelihood; the process variance is estimated from the residuals of the trend.
+    """
+
+    length_scales = np.geomspace(0.1, 100, 31)
+    "the candidate length scales of the kernel (of the standardized inputs)"
+
+    def __init__(self, nugget: float = 1e-10) -> None:
+        """
+        Args:
+            nugget (float, optional): the noise added to the diagonal of the kernel matrix, relative to the
+            process variance, for numerical stability. Defaults to 1e-10.
+        """
+        self.nugget = nugget
+        return
+
+    def _trend_basis(self, x: np.ndarray) -> np.ndarray:
+        """the basis functions of the trend: a constant and, if there are enough points, the varying inputs"""
+        if self.linear_trend:
+            return np.hstack([np.ones((len(x), 1)), x[:, self.varying_inputs]])
+        return np.ones((len(x), 1))
+
+    def _kernel(self, x_1: np.ndarray, x_2: np.ndarray, length_scale: float) -> np.ndarray:
+        squared_distances = (
+            np.sum(x_1 ** 2, axis=1)[:, np.newaxis] + np.sum(x_2 ** 2, axis=1)[np.newaxis, :] - 2 * x_1 @ x_2.T
+        )
+        return np.exp(-0.5 * np.maximum(squared_distances, 0) / length_scale ** 2)
+
+    def fit(self, x: np.ndarray, y: np.ndarray) -> GaussianProcess:
+        """fits the model to observations
+
+        Args:
+            x (np.ndarray): the inputs, with shape (number of observations, number of inputs)
+            y (np.ndarray): the observed outputs, with shape (number of observations,)
+
+        Returns:
+            GaussianProcess: this model
+        """
+        self.center = x.mean(axis=0)
+        self.scale = x.std(axis=0)
+        self.varying_inputs = self.scale > 0
+        self.scale[~self.varying_inputs] = 1.0
+        x = (x - self.center) / self.scale
+        self.linear_trend = len(x) > np.sum(self.varying_inputs) + 2
+        basis = self._trend_basis(x)
+        self.trend_coefficients = np.linalg.lstsq(basis, y, rcond=None)[0]
+        residuals = y - basis @ self.trend_coefficients
+
+        best_log_likelihood = -np.inf
+        for length_scale in self.length_scales:
+            kernel = self._kernel(x, x, length_scale) + self.nugget * np.eye(len(x))
+            try:
+                cholesky = np.linalg.cholesky(kernel)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, residuals))
+            variance = max(residuals @ alpha / len(x), 1e-300)
+            log_likelihood = -0.5 * len(x) * np.log(variance) - np.sum(np.log(np.diag(cholesky)))
+            if log_likelihood > best_log_likelihood:
+                best_log_likelihood = log_likelihood
+                self.length_scale, self.variance, self.cholesky, self.alpha = length_scale, variance, cholesky, alpha
+        if best_log_likelihood == -np.inf:
+            raise RuntimeError("unable to fit a Gaussian process: the kernel matrix is singular for all length scales")
+        self.x = x
+        return self
+
+    def predict(
+        self, x: np.ndarray, standard_deviation_below: float = np.inf, batch_size: int = 100000
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """predicts the outputs of inputs
+
+        Args:
+            x (np.ndarray): the inputs, with shape (number of points, number of inputs)
+            standard_deviation_below (float, optional): the standard deviation is only determined for points of
+            which the absolute mean is below this multiple of the process standard deviation (the upper bound
+            of the standard deviation), it is the process standard deviation for the others. Defaults to
+            infinity, i.e. for all points.
+            batch_size (int, optional): the number of points that are predicted at once. Defaults to 100000.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: the mean and the standard deviation of the prediction of each point
+        """
+        mean, standard_deviation = np.empty(len(x)), np.full(len(x), np.sqrt(self.variance))
+        for start in range(0, len(x), batch_size):
+            points = (x[start:start + batch_size] - self.center) / self.scale
+            kernel = self._kernel(points, self.x, self.length_scale)
+            batch_mean = self._trend_basis(points) @ self.trend_coefficients + kernel @ self.alpha
+            mean[start:start + batch_size] = batch_mean
+            uncertain = np.abs(batch_mean) < standard_deviation_below * np.sqrt(self.variance)
+            weights = np.linalg.solve(self.cholesky, kernel[uncertain].T)
+            variance = self.variance * np.maximum(1 - np.sum(weights ** 2, axis=0), 0)
+            standard_deviation[start:start + batch_size][uncertain] = np.sqrt(variance)
+        return mean, standard_deviation
+
+
+class SurrogateLimitState:
+    """a failure mode of which the failure function is replaced by an adaptively refined Gaussian-process
+    surrogate (AK-MCS: active learning reliability with kriging and Monte Carlo simulation).
+
+    A surrogate limit state is called like the failure function it replaces, with a sample of parameter values.
+    The surrogate is fitted to the failure function in a few points of the sample, then refined one point at a
+    time: the failure function is evaluated in the point of which the sign of the failure criterion is most
+    uncertain, i.e. the point with the lowest learning function U = |mean| / standard deviation, until U
+    exceeds `learning_threshold` in all points. The criterion of the sample is the mean of the surrogate,
+    except for the points in which the failure function was evaluated. The evaluated points are kept for
+    subsequent calls (e.g. for mutated structures), such that later calls need few new evaluations.
+
+    Use it in place of a failure function of a structure, e.g.
+    `Structure.parse_from_file(path, failure_functions=[SurrogateLimitState(bendingMomentULS)])`.
+    """
+
+    active_set_threshold = 3.0
+    "points of which U exceeds this multiple of the learning threshold are not predicted during the refinement"
+
+    def __init__(
+        self, failure_function: callable, learning_threshold: float = 2.0, initial_design_size: int = 20,
+        max_evaluations_per_call: int = 100, max_design_size: int = 500, seed: int = None
+    ) -> None:
+        """
+        Args:
+            failure_function (callable): the (expensive) failure function, Z < 0 means failure
+            learning_threshold (float, optional): the value of the learning function U above which the sign of
+            the criterion in a point is considered certain. Defaults to 2, i.e. a probability of a wrong sign of
+            about 2%.
+            initial_design_size (int, optional): the number of points of the sample in which the failure
+            function is evaluated before the first fit. Defaults to 20.
+            max_evaluations_per_call (int, optional): the maximum number of evaluations of the failure function
+            per call. Defaults to 100.
+            max_design_size (int, optional): the maximum number of points of the surrogate, once reached the
+            surrogate is no longer refined. Defaults to 500.
+            seed (int, optional): the seed of the selection of the initial points. Defaults to None.
+        """
+        self.failure_function = failure_function
+        self.__name__ = failure_function.__name__
+        self.learning_threshold = learning_threshold
+        self.initial_design_size = initial_design_size
+        self.max_evaluations_per_call = max_evaluations_per_call
+        self.max_design_size = max_design_size
+        self.rng = np.random.default_rng(seed)
+        self.parameter_names = None
+        self.design_x, self.design_y = None, None
+        self.number_of_evaluations = 0
+        "the total number of evaluations of the failure function"
+        self.number_of_calls = 0
+        "the number of calls of this limit state"
+        self._lock = threading.Lock()
+        return
+
+    def __getstate__(self) -> dict:
+        # the lock cannot be copied to another process
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        return
+
+    def _initial_design(self, x: np.ndarray) -> np.ndarray:
+        """selects the initial points of the surrogate from a sample: half of the points at random and half in
+        the tails of the sample (the points farthest from its mean), where failures usually occur"""
+        size = min(self.initial_design_size, len(x))
+        scale = x.std(axis=0)
+        scale[scale == 0] = 1.0
+        distances = np.sum(((x - x.mean(axis=0)) / scale) ** 2, axis=1)
+        tail_points = np.argsort(distances)[len(x) - size // 2:]
+        other_points = np.setdiff1d(np.arange(len(x)), tail_points)
+        random_points = self.rng.choice(other_points, size - len(tail_points), replace=False)
+        return np.concatenate([tail_points, random_points])
+
+    def _evaluate(self, parameter_values: dict[str, np.ndarray], x: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """evaluates the failure function in points of a sample and adds them to the design of the surrogate"""
+        y = np.asarray(self.failure_function(**{
+            name: values[indices] for name, values in parameter_values.items()
+        }), dtype=float).reshape(-1)
+        y = np.broadcast_to(y, len(indices))
+        if self.design_x is None:
+            self.design_x, self.design_y = x[indices], y.copy()
+        else:
+            self.design_x = np.vstack([self.design_x, x[indices]])
+            self.design_y = np.concatenate([self.design_y, y])
+        self.number_of_evaluations += len(indices)
+        profiler.count("failure_function_evaluations", len(indices))
+        return y
+
+    def __call__(self, **parameter_values: np.ndarray | float) -> np.ndarray:
+        """determines the failure criterion of a sample of parameter values with the surrogate
+
+        Args:
+            **parameter_values (np.ndarray | float): the values of the parameters, arrays of draws or scalars
+            that broadcast to a common shape
+
+        Returns:
+            np.ndarray: the failure criterion of each point, of the common shape of the parameter values
+        """
+        names = sorted(parameter_values)
+        arrays = np.broadcast_arrays(*[np.asarray(parameter_values[name], dtype=float) for name in names])
+        shape = arrays[0].shape
+        flat_values = {name: array.reshape(-1) for name, array in zip(names, arrays)}
+        x = np.column_stack(list(flat_values.values()))
+
+        with self._lock:
+            if names != self.parameter_names:
+                self.parameter_names, self.design_x, self.design_y = names, None, None
+            number_of_evaluations = self.number_of_evaluations
+            evaluated = np.zeros(len(x), dtype=bool)
+            criteria = np.empty(len(x))
+
+            if self.design_x is None or len(self.design_x) < self.initial_design_size:
+                indices = self._initial_design(x)
+                criteria[indices] = self._evaluate(flat_values, x, indices)
+                evaluated[indices] = True
+
+            # the refinement only predicts the points of which the sign is not yet nearly certain (the active
+            # points), once these are certain all points are predicted again to verify
+            mean, learning_function = np.empty(len(x)), np.empty(len(x))
+            active = np.arange(len(x))
+            while True:
+                model = GaussianProcess().fit(self.design_x, self.design_y)
+                active_mean, active_standard_deviation = model.predict(
+                    x[active], standard_deviation_below=self.learning_threshold
+                )
+                mean[active] = active_mean
+                learning_function[active] = np.abs(active_mean) / np.maximum(active_standard_deviation, 1e-300)
+                learning_function[evaluated] = np.inf
+                candidate = active[np.argmin(learning_function[active])]
+                if (
+                    self.number_of_evaluations - number_of_evaluations >= self.max_evaluations_per_call
+                    or len(self.design_x) >= self.max_design_size
+                ):
+                    if len(active) < len(x):
+                        mean = model.predict(x, standard_deviation_below=0)[0]
+                    break
+                if learning_function[candidate] >= self.learning_threshold:
+                    if len(active) == len(x):
+                        break
+                    active = np.arange(len(x))
+                    continue
+                active = active[learning_function[active] < self.active_set_threshold * self.learning_threshold]
+                criteria[candidate] = self._evaluate(flat_values, x, np.array([candidate]))[0]
+                evaluated[candidate] = True
+
+            criteria[~evaluated] = mean[~evaluated]
+            self.number_of_calls += 1
+            logging.debug(
+                f"{self.__name__}: {self.number_of_evaluations - number_of_evaluations} evaluations of the failure "
+                f"function for {len(x)} points, minimum U {np.min(learning_function):.2f}"
+            )
+        return criteria.reshape(shape)
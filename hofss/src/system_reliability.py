@@ -0,0 +1,305 @@
+from __future__ import annotations
+import math
+import inspect
+from statistics import NormalDist
+import numpy as np
+
+from .profiling import profiler
+from ..data_structures import StructureState
+
+
+def _normal_cdf(x: float) -> float:
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+def reliability_index(failure_probability: float) -> float:
+    """the reliability index of a failure probability, beta = -inverse standard normal CDF(Pf)
+
+    Args:
+        failure_probability (float): the failure probability
+
+    Returns:
+        float: the reliability index, infinite for a failure probability of 0 (or 1)
+    """
+    if failure_probability <= 0:
+        return math.inf
+    if failure_probability >= 1:
+        return -math.inf
+    return -NormalDist().inv_cdf(failure_probability)
+
+
+def joint_failure_probability_bounds(
+    failure_probability_1: float, failure_probability_2: float, correlation: float
+) -> tuple[float, float]:
+    """bounds the probability that two failure modes both occur, from their failure probabilities and the
+    correlation between their (linearized) limit states, see Ditlevsen (1979). For a positive correlation the
+    joint probability of the equivalent normal limit states lies between the larger and the sum of the
+    probabilities of the two parts of the joint failure domain that are cut off by the other limit state.
+
+    Args:
+        failure_probability_1 (float): the failure probability of the first mode
+        failure_probability_2 (float): the failure probability of the second mode
+        correlation (float): the correlation between the limit states, NaN if unknown
+
+    Returns:
+        tuple[float, float]: the lower and upper bound of the joint failure probability
+    """
+    smallest = min(failure_probability_1, failure_probability_2)
+    if smallest <= 0:
+        return 0.0, 0.0
+    if math.isnan(correlation):
+        return 0.0, smallest
+    if correlation >= 1:
+        return smallest, smallest
+    beta_1, beta_2 = reliability_index(failure_probability_1), reliability_index(failure_probability_2)
+    if math.isinf(beta_1) or math.isinf(beta_2):
+        # one of the modes always occurs, the joint probability is the probability of the other
+        return smallest, smallest
+    root = math.sqrt(1 - correlation ** 2)
+    part_1 = failure_probability_1 * _normal_cdf(-(beta_2 - correlation * beta_1) / root)
+    part_2 = failure_probability_2 * _normal_cdf(-(beta_1 - correlation * beta_2) / root)
+    if correlation < 0:
+        return 0.0, min(part_1, part_2, smallest)
+    return max(part_1, part_2), min(part_1 + part_2, smallest)
+
+
+def ditlevsen_bounds(failure_probabilities: list[float], correlations: np.ndarray) -> tuple[float, float]:
+    """bounds the probability that any of several failure modes occurs (the failure probability of a series
+    system) by the second order bounds of Ditlevsen (1979), from the failure probabilities of the modes and the
+    correlations between their limit states. The modes are ordered by decreasing failure probability, which
+    usually gives the narrowest bounds. The bounds are never wider than the first order bounds: the largest
+    failure probability and the sum of the failure probabilities.
+
+    Args:
+        failure_probabilities (list[float]): the failure probability of each mode
+        correlations (np.ndarray): the correlations between the limit states of the modes, NaN if unknown
+
+    Returns:
+        tuple[float, float]: the lower and upper bound of the failure probability of the system
+    """
+    order = np.argsort(failure_probabilities)[::-1]
+    probabilities = np.asarray(failure_probabilities, dtype=float)[order]
+    correlations = np.asarray(correlations, dtype=float)[np.ix_(order, order)]
+    if len(probabilities) == 0:
+        return 0.0, 0.0
+
+    lower, upper = probabilities[0], probabilities[0]
+    for i in range(1, len(probabilities)):
+        joint_bounds = [
+            joint_failure_probability_bounds(probabilities[i], probabilities[j], correlations[i, j])
+            for j in range(i)
+        ]
+        lower += max(0.0, probabilities[i] - sum(joint_upper for _, joint_upper in joint_bounds))
+        upper += probabilities[i] - max(joint_lower for joint_lower, _ in joint_bounds)
+    lower = max(lower, probabilities[0])
+    upper = min(upper, np.sum(probabilities), 1.0)
+    return float(lower), float(max(lower, upper))
+
+
+def _failure_mode_parameters(failure_mode: callable, names: tuple[str, ...]) -> list[str]:
+    """the parameters of which a failure mode depends, by the named arguments of its function; all parameters if
+    these cannot be determined (e.g. a function that takes keyword arguments only)"""
+    try:
+        signature = inspect.signature(failure_mode)
+    except (TypeError, ValueError):
+        return list(names)
+    arguments = [
+        argument.name for argument in signature.parameters.values()
+        if argument.kind in (argument.POSITIONAL_OR_KEYWORD, argument.KEYWORD_ONLY)
+    ]
+    if not arguments or any(argument not in names for argument in arguments):
+        return list(names)
+    return [name for name in names if name in arguments]
+
+
+class SystemReliability:
+    """estimates the failure probabilities of the states of a structure mode by mode, and bounds the total
+    failure probability (any mode occurs) instead of sampling all modes jointly.
+
+    The failure probability of a mode only depends on the parameters of its failure function (its named
+    arguments), so it is only determined again if one of these changed: the modes that are affected by a
+    mutation are sampled jointly with their parameters only, the others are taken from earlier states. The
+    total is then bounded by the second order (Ditlevsen) bounds (see `ditlevsen_bounds`), with the
+    correlations between the limit states of the modes, which are estimated once from a sample of the initial
+    state as the correlations between the normal scores of the failure criteria. The total is the middle of the
+    bounds if their width is at most `max_relative_width` of the upper bound; otherwise the state is evaluated
+    by sampling all modes jointly (see `Structure.calculate_failure_probabilities`). The bounds themselves are
+    available from `total_bounds`. If all modes are affected, they are sampled jointly and the total is exact.
+    The cost of a mutation therefore grows with the number of modes that it affects rather than with the number
+    of modes of the structure.
+
+    Note that the correlations are rank correlations over the whole parameter space at the initial state, not
+    the correlations of the linearized limit states at their design points (α_i·α_j) that the bivariate bounds
+    assume. For modes of which the failures are dominated by the tails of the distributions, the correlation
+    in the failure domain can differ from the whole-space correlation, and the bounds (and their middle) may
+    then not contain the true total failure probability.
+    """
+
+    max_cache_size = 100000
+    "the maximum number of failure probabilities that are kept per mode"
+
+    def __init__(
+        self, initial_state: StructureState, failure_modes: list[callable], max_relative_width: float = 0.1,
+        number_of_correlation_draws: int = 1e4, seed: int = None
+    ) -> None:
+        """
+        Args:
+            initial_state (StructureState): the initial state of the structure
+            failure_modes (list[callable]): the failure modes of the structure
+            max_relative_width (float, optional): the maximum width of the bounds of the total failure
+            probability, relative to its upper bound. Defaults to 0.1.
+            number_of_correlation_draws (int, optional): the number of draws with which the correlations are
+            estimated. Defaults to 1e4.
+            seed (int, optional): the seed of the draws of the correlations. Defaults to None.
+        """
+        self.failure_modes = failure_modes
+        self.max_relative_width = max_relative_width
+        self.mode_parameters = [
+            _failure_mode_parameters(failure_mode, initial_state.names) for failure_mode in failure_modes
+        ]
+        self.correlations = self._estimate_correlations(initial_state, int(number_of_correlation_draws), seed)
+        # the failure probabilities of each mode, by the number of draws and the values of its parameters
+        self._failure_probabilities = [{} for _ in failure_modes]
+        return
+
+    def _estimate_correlations(self, initial_state: StructureState, number_of_draws: int, seed: int) -> np.ndarray:
+        """estimates the correlations between the limit states as the correlations between the normal scores
+        (the standard normal quantiles of the ranks) of the failure criteria of the modes"""
+        if len(self.failure_modes) < 2:
+            return np.ones((len(self.failure_modes), len(self.failure_modes)))
+        parameter_values = initial_state.draw(np.random.default_rng(seed), number_of_draws)
+        normal_dist = NormalDist()
+        scores = []
+        for failure_mode in self.failure_modes:
+            criteria = np.broadcast_to(failure_mode(**parameter_values), number_of_draws)
+            ranks = np.argsort(np.argsort(criteria, kind="stable"), kind="stable")
+            scores.append([normal_dist.inv_cdf((rank + 0.5) / number_of_draws) for rank in ranks.tolist()])
+            if np.ptp(criteria) == 0:
+                scores[-1] = np.full(number_of_draws, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlations = np.corrcoef(np.array(scores, dtype=float))
+        np.fill_diagonal(correlations, 1.0)
+        return correlations
+
+    def _key(self, i: int, state: StructureState, number_of_iterations: int) -> tuple:
+        return (int(number_of_iterations), *(state.values[state.index[name]] for name in self.mode_parameters[i]))
+
+    def record(self, state: StructureState, number_of_iterations: int, failure_probabilities: dict[str, float]):
+        """keeps the failure probabilities of the modes of a state that was evaluated otherwise (e.g. by
+        sampling all modes jointly)
+
+        Args:
+            state (StructureState): the state
+            number_of_iterations (int): the number of draws with which the state was evaluated
+            failure_probabilities (dict[str, float]): the failure probability per mode
+        """
+        for i, failure_mode in enumerate(self.failure_modes):
+            cache = self._failure_probabilities[i]
+            if len(cache) >= self.max_cache_size:
+                cache.clear()
+            cache[self._key(i, state, number_of_iterations)] = float(failure_probabilities[failure_mode.__name__])
+        return
+
+    def total_bounds(
+        self, state: StructureState, number_of_iterations: int = 1e6
+    ) -> dict[str, tuple[float, float]] | None:
+        """the bounds of the total failure probability of a state, from the failure probabilities of its modes that
+        were determined before (see `failure_probabilities`)
+
+        Args:
+            state (StructureState): the state of the structure
+            number_of_iterations (int, optional): the number of draws per mode with which the state was
+            evaluated. Defaults to 1e6.
+
+        Returns:
+            dict[str, tuple[float, float]] | None: the lower and upper bounds of the first order ('first_order':
+            the largest failure probability of a mode and the sum of those of all modes) and of the second order
+            ('second_order', see `ditlevsen_bounds`), None if a mode of the state has not been evaluated
+        """
+        failure_probabilities = []
+        for i in range(len(self.failure_modes)):
+            key = self._key(i, state, number_of_iterations)
+            if key not in self._failure_probabilities[i]:
+                return None
+            failure_probabilities.append(self._failure_probabilities[i][key])
+        return {
+            "first_order": (max(failure_probabilities), min(sum(failure_probabilities), 1.0)),
+            "second_order": ditlevsen_bounds(failure_probabilities, self.correlations),
+        }
+
+    def _sample_modes(
+        self, modes: list[int], state: StructureState, number_of_iterations: int, parameter_draw_batch_size: int,
+        rng: np.random.Generator
+    ) -> tuple[list[float], float]:
+        """the failure probabilities of some of the modes of a state, sampled jointly with the parameters of
+        these modes only
+
+        Returns:
+            tuple[list[float], float]: the failure probability of each of the modes, and the probability that
+            any of them occurs
+        """
+        names = set(name for i in modes for name in self.mode_parameters[i])
+        number_of_failures, number_of_any_failures = np.zeros(len(modes)), 0
+        number_of_total_draws = 0
+        while number_of_total_draws < number_of_iterations:
+            number_of_draws = int(min(parameter_draw_batch_size, number_of_iterations - number_of_total_draws))
+            number_of_total_draws += number_of_draws
+            with profiler.timer("parameter_draws"):
+                parameter_values = state.draw(rng, number_of_draws, names)
+            with profiler.timer("failure_functions"):
+                any_failure = np.zeros(number_of_draws, dtype=bool)
+                for k, i in enumerate(modes):
+                    failure_occured = np.broadcast_to(self.failure_modes[i](**parameter_values) < 0, number_of_draws)
+                    number_of_failures[k] += np.sum(failure_occured)
+                    any_failure |= failure_occured
+                number_of_any_failures += np.sum(any_failure)
+        profiler.count("failure_mode_evaluations", len(modes))
+        return (number_of_failures / number_of_iterations).tolist(), number_of_any_failures / number_of_iterations
+
+    def failure_probabilities(
+        self, state: StructureState, number_of_iterations: int = 1e6, parameter_draw_batch_size: int = 1e6,
+        rng: np.random.Generator = None
+    ) -> dict[str, float] | None:
+        """estimates the failure probability of each mode of a state, and bounds the total
+
+        Args:
+            state (StructureState): the state of the structure
+            number_of_iterations (int, optional): the number of draws per mode. Defaults to 1e6.
+            parameter_draw_batch_size (int, optional): the number of draws per batch. Defaults to 1e6.
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+
+        Returns:
+            dict[str, float] | None: the failure probability per mode and the total (the middle of its bounds),
+            None if the bounds are too wide
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        keys = [self._key(i, state, number_of_iterations) for i in range(len(self.failure_modes))]
+        modes = [i for i, key in enumerate(keys) if key not in self._failure_probabilities[i]]
+        profiler.count("failure_mode_cache_hits", len(self.failure_modes) - len(modes))
+
+        # the modes of which a parameter changed are sampled jointly, on one sample of their parameters
+        total = None
+        if modes:
+            mode_failure_probabilities, total = self._sample_modes(
+                modes, state, number_of_iterations, parameter_draw_batch_size, rng
+            )
+            for i, failure_probability in zip(modes, mode_failure_probabilities):
+                cache = self._failure_probabilities[i]
+                if len(cache) >= self.max_cache_size:
+                    cache.clear()
+                cache[keys[i]] = failure_probability
+        failure_probabilities = {
+            failure_mode.__name__: self._failure_probabilities[i][keys[i]]
+            for i, failure_mode in enumerate(self.failure_modes)
+        }
+        if len(modes) == len(self.failure_modes):
+            # all modes were sampled jointly, the total is exact
+            failure_probabilities["total"] = total
+            return failure_probabilities
+
+        lower, upper = ditlevsen_bounds(list(failure_probabilities.values()), self.correlations)
+        if upper - lower > self.max_relative_width * upper:
+            return None
+        failure_probabilities["total"] = (lower + upper) / 2
+        return failure_probabilities
@@ -1,12 +1,15 @@
 from __future__ import annotations
-from typing import Iterable
+from typing import Iterable, TYPE_CHECKING
 import random
-import pandas as pd
 import numpy as np
 
 from .scenario import Scenario
+from .profiling import profiler
 from ..data_structures import TaskType, FactorLevel
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class Task:
     """A task within the design or construction of a structure"""
@@ -87,9 +90,19 @@ class Task:
         self._scenarios = scenario_probabilities
         return
 
-    def determine_hep(self, rng: np.random.Generator = None) -> pd.Series:
+    def determine_hep(
+        self, rng: np.random.Generator = None, record_draws: bool = False, factor_draws: np.ndarray = None
+    ) -> pd.Series:
         """determines the Human Error Probability (HEP) for this task given the task's factors
 
+        Args:
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+            record_draws (bool, optional): if True, the effect and multiplier draws of each factor are added
+            to the result. Defaults to False.
+            factor_draws (np.ndarray, optional): the effect draw and multiplier draw of each factor, with shape
+            (number of factors, 2), e.g. of a `LatinHypercubeDesign`. Defaults to None, i.e. these are drawn
+            with the random number generator.
+
         Returns:
             float: the probability that this task leads to a human error
         """
@@ -100,9 +113,17 @@ class Task:
         hep_data = {}
         multiplier_values = []
         complexity_level = None
-        for factor in self.task_type.factors:
-            factor_multiplier, factor_level = factor.draw_multiplier(rng)
+        for i, factor in enumerate(self.task_type.factors):
+            if factor_draws is None:
+                effect_draw = rng.uniform(0, 1)
+                multiplier_draw = rng.uniform(0, 1)
+            else:
+                effect_draw, multiplier_draw = float(factor_draws[i, 0]), float(factor_draws[i, 1])
+            factor_multiplier, factor_level = factor.multiplier_from_draws(effect_draw, multiplier_draw)
             hep_data[f"{factor.name}_multiplier"] = factor_multiplier
+            if record_draws:
+                hep_data[f"{factor.name}_effect_draw"] = effect_draw
+                hep_data[f"{factor.name}_multiplier_draw"] = multiplier_draw
             multiplier_values.append(factor_multiplier)
             if "complexity" in factor.description:
                 complexity_level = factor_level
@@ -123,14 +144,24 @@ class Task:
         hep_data["hep"] = hep
         return hep_data
 
-    def do_task(self, rng: np.random.Generator = None) -> pd.Series:
+    def do_task(
+        self, rng: np.random.Generator = None, record_draws: bool = False, factor_draws: np.ndarray = None
+    ) -> pd.Series:
         """performs the task: first determines the Human Error Probability (HEP); if an error occurs resolves
         if the error is found and consequently fixed; if the error is not fixed, determines the scenario that
         arises from the human error and returns this scenario
 
+        Args:
+            rng (np.random.Generator, optional): the random number generator. Defaults to None.
+            record_draws (bool, optional): if True, the draws that determine the HEP and the occurrence of an
+            error are added to the result. Defaults to False.
+            factor_draws (np.ndarray, optional): the effect draw and multiplier draw of each factor, see
+            `determine_hep`. Defaults to None.
+
         Returns:
             None | Scenario: the scenario if an error occurs, None if no error occurs or if it is found and corrected
         """
+        import pandas as pd
 
         if rng is None:
             rng = np.random.default_rng()
@@ -139,15 +170,32 @@ class Task:
         task_result = {"task": self.name, "scenario": None}
 
         # determine the HEP
-        hep_data = self.determine_hep(rng=rng)
+        with profiler.timer("hof_sampling"):
+            hep_data = self.determine_hep(rng=rng, record_draws=record_draws, factor_draws=factor_draws)
         task_hep = hep_data["hep"]
         task_result.update(hep_data)
 
         # determine if human error occurs or not
-        if task_hep < rng.uniform(0, 1):
+        error_draw = rng.uniform(0, 1)
+        if record_draws:
+            task_result["error_draw"] = error_draw
+        if task_hep < error_draw:
             return pd.Series(task_result)  # no human error occurs
 
         # if this code is reached, the human error has occured, determin scenario
+        task_result["scenario"] = self.draw_scenario(rng=rng)
+        return pd.Series(task_result)
+
+    def draw_scenario(self, rng: np.random.Generator = None) -> Scenario:
+        """draws the scenario that arises from a human error in this task
+
+        Returns:
+            Scenario: the drawn scenario, None if this task has no scenarios
+        """
+
+        if rng is None:
+            rng = np.random.default_rng()
+
         scenario_draw = rng.uniform(0, 1)
         probability_sum = 0
         scenario = None
@@ -155,27 +203,29 @@ class Task:
             probability_sum += probability
             if scenario_draw < probability_sum:
                 break
-
-        task_result["scenario"] = scenario
-        return pd.Series(task_result)
+        return scenario
 
     @classmethod
     def parse_from_file(
         cls, task_file_path: str, project_task_types: list[TaskType], project_scenarios: list[Scenario]
     ) -> list[Task]:
 
+        import pandas as pd
         task_data = pd.read_csv(task_file_path, header=0, index_col=0).fillna("")
+
+        # look up tables of the task types and scenarios by their names, the first of equally named ones is used
+        task_type_lookup_table, scenario_lookup_table = {}, {}
+        for project_task_type in project_task_types:
+            task_type_lookup_table.setdefault(project_task_type.name, project_task_type)
+        for project_scenario in project_scenarios:
+            scenario_lookup_table.setdefault(project_scenario.name, project_scenario)
+
         tasks = []
         for index, row in task_data.iterrows():
 
             # find the instance of the task type from the specified list of task types
             task_type_name = row["task_type"]
-            task_type = None
-            for project_task_type in project_task_types:
-                if project_task_type.name == task_type_name:
-                    task_type = project_task_type
-                    break
-
+            task_type = task_type_lookup_table.get(task_type_name)
             if task_type is None:
                 raise ValueError(f"unable to find task type: '{task_type_name}' specified for task '{index}'")
 
@@ -197,12 +247,7 @@ class Task:
             # find the matching scenario instance with each scenario name
             scenarios = []
             for scenario_name in scenario_names:
-                scenario_match = None
-
-                for project_scenario in project_scenarios:
-                    if project_scenario.name == scenario_name:
-                        scenario_match = project_scenario
-                        break
+                scenario_match = scenario_lookup_table.get(scenario_name)
                 if scenario_match is None:
                     raise RuntimeError(f"unable to find scenario '{scenario_name}' that is defined for task '{index}'")
                 scenarios.append(scenario_match)
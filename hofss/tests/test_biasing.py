@@ -0,0 +1,64 @@
+from unittest import TestCase
+import numpy as np
+
+from ..src import InflatedErrorBiasing, StratifiedErrorBiasing, analysis
+
+
+class ErrorBiasingTest(TestCase):
+
+    error_probabilities = np.array([0.01, 0.05, 0.02, 0.1, 0.03])
+    correction_probability = 0.72
+
+    def _estimate(self, biasing, number_of_samples=20000):
+        rng = np.random.default_rng(1)
+        uncorrected, weights = [], []
+        for _ in range(number_of_samples):
+            errors, corrected, likelihood_ratio = biasing.sample_errors(
+                self.error_probabilities, self.correction_probability, rng
+            )
+            uncorrected.append(np.sum(errors & ~corrected))
+            weights.append(likelihood_ratio)
+        return np.array(uncorrected), np.array(weights)
+
+    def test_unbiased_inflation_has_unit_weights(self):
+        _, weights = self._estimate(InflatedErrorBiasing(1.0, 1.0), number_of_samples=100)
+        np.testing.assert_allclose(weights, 1.0)
+        return
+
+    def test_inflated_estimate_is_unbiased(self):
+        uncorrected, weights = self._estimate(InflatedErrorBiasing(5.0, 2.0))
+        exact = 1 - np.prod(1 - self.error_probabilities * (1 - self.correction_probability))
+        estimate, standard_error = analysis.weighted_mean(uncorrected > 0, weights)
+        self.assertLess(abs(estimate - exact), 4 * standard_error)
+        self.assertAlmostEqual(np.mean(weights), 1.0, delta=0.05)
+        return
+
+    def test_stratified_estimate_is_unbiased(self):
+        uncorrected, weights = self._estimate(StratifiedErrorBiasing({0: 0.2, 1: 0.5, 2: 0.3}))
+        self.assertTrue(set(np.unique(uncorrected)) <= {0, 1, 2})
+        uncorrected_probabilities = self.error_probabilities * (1 - self.correction_probability)
+        exact = 1 - np.prod(1 - uncorrected_probabilities)
+        estimate, standard_error = analysis.weighted_mean(uncorrected > 0, weights)
+        self.assertLess(abs(estimate - exact), 4 * standard_error + 1e-3)
+        return
+
+    def test_invalid_strata(self):
+        with self.assertRaises(ValueError):
+            StratifiedErrorBiasing({1: 0.5})
+        with self.assertRaises(ValueError):
+            StratifiedErrorBiasing({})
+        return
+
+
+class WeightedEstimatesTest(TestCase):
+
+    def test_effective_sample_size(self):
+        self.assertEqual(analysis.effective_sample_size(np.ones(10)), 10.0)
+        self.assertEqual(analysis.effective_sample_size([1.0, 0.0, 0.0]), 1.0)
+        return
+
+    def test_weighted_quantile(self):
+        values = np.array([1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(analysis.weighted_quantile(values, [0.5])[0], 2.0)
+        self.assertEqual(analysis.weighted_quantile(values, [0.5], weights=[0, 0, 1, 1])[0], 3.0)
+        return
@@ -0,0 +1,296 @@
+import io
+import os
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+import dataclasses
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+
+from ..src import Simulator, Campaign, StoppingRule, Profiler, profiler, analysis
+from ..src.analysis import RunningEstimates
+from ..src.service import SimulationService, SimulationClient, serve
+from ..src.scheduler import CampaignScheduler, Variant
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def synthetic_simulation(final_failure_probability: float, uncorrected_error: bool) -> pd.DataFrame:
+    """a simulation of one task, of which the error is uncorrected if specified"""
+    return pd.DataFrame({
+        "total": [1e-4, final_failure_probability],
+        "error_occurred": [None, uncorrected_error],
+        "error_corrected": [None, False],
+    })
+
+
+class RunningEstimatesTest(TestCase):
+
+    def test_estimates_converge(self):
+        rng = np.random.default_rng(1)
+        estimates = RunningEstimates(quantiles=[0.5])
+        for seed in range(2000):
+            estimates.add(seed, synthetic_simulation(rng.uniform(0, 1e-3), rng.uniform() < 0.2))
+        estimates_df = estimates.estimates()
+        self.assertEqual(estimates.number_of_simulations, 2000)
+        self.assertListEqual(list(estimates_df.index), ["mean", "p_uncorrected_error", "q0.5"])
+        for quantity, expected in [("mean", 5e-4), ("p_uncorrected_error", 0.2), ("q0.5", 5e-4)]:
+            self.assertLess(estimates_df.loc[quantity, "lower"], expected)
+            self.assertGreater(estimates_df.loc[quantity, "upper"], expected)
+            self.assertLess(estimates_df.loc[quantity, "relative_half_width"], 0.1)
+        return
+
+    def test_stopping_rule(self):
+        rule = StoppingRule(targets={"mean": 0.1, "q0.9": 0.2}, min_simulations=10, max_simulations=100)
+        self.assertListEqual(rule.quantiles, [0.9])
+        estimates = RunningEstimates(rule.quantiles)
+        for seed in range(5):
+            estimates.add(seed, synthetic_simulation(1e-4, False))
+        self.assertFalse(rule.is_satisfied(estimates))  # below the minimum number of simulations
+        for seed in range(5, 20):
+            estimates.add(seed, synthetic_simulation(1e-4, False))
+        self.assertTrue(rule.is_satisfied(estimates))  # all simulations are equal, the intervals have no width
+
+        estimates = RunningEstimates(rule.quantiles)
+        for seed in range(100):
+            estimates.add(seed, synthetic_simulation(1e-4 * (seed % 2), False))
+        self.assertTrue(rule.is_satisfied(estimates))  # maximum number of simulations
+        return
+
+    def test_stopping_rule_without_targets(self):
+        rule = StoppingRule(targets={}, min_simulations=10, max_simulations=100)
+        estimates = RunningEstimates(rule.quantiles)
+        for seed in range(50):
+            estimates.add(seed, synthetic_simulation(1e-4, False))
+        self.assertFalse(rule.is_satisfied(estimates))  # only the maximum number of simulations stops the campaign
+        for seed in range(50, 100):
+            estimates.add(seed, synthetic_simulation(1e-4, False))
+        self.assertTrue(rule.is_satisfied(estimates))
+        return
+
+
+class CampaignTest(TestCase):
+
+    def test_campaign_stops_and_resumes(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        initial_failure_probabilities = simulator.structure.calculate_failure_probabilities(1e4, 1e4)
+        rule = StoppingRule(targets={"mean": 1e-6}, min_simulations=4, max_simulations=6, check_interval=2)
+        with tempfile.TemporaryDirectory() as output_directory:
+            campaign = Campaign(simulator, output_directory, 1e3, 1e3, initial_failure_probabilities, rule)
+            estimates_df = campaign.run(number_of_workers=2)
+            self.assertListEqual(
+                sorted(name for name in os.listdir(output_directory) if name.endswith(".csv")),
+                [f"{seed}.csv" for seed in range(1, 7)]
+            )
+            self.assertIn("mean", estimates_df.index)
+
+            # a resumed campaign reads the existing results rather than simulating them again
+            modified_times = {
+                name: os.path.getmtime(os.path.join(output_directory, name)) for name in os.listdir(output_directory)
+            }
+            resumed_estimates_df = Campaign(
+                simulator, output_directory, 1e3, 1e3, initial_failure_probabilities, rule
+            ).run(number_of_workers=2)
+            for name, modified_time in modified_times.items():
+                self.assertEqual(os.path.getmtime(os.path.join(output_directory, name)), modified_time)
+            pd.testing.assert_frame_equal(resumed_estimates_df, estimates_df)
+        return
+
+    def test_rerun_recomputes_only_what_changed(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+        simulator.initial_failure_probabilities = dict(simulator.structure.calculate_failure_probabilities(1e3, 1e3))
+        rule = StoppingRule(targets={}, max_simulations=10)
+        with tempfile.TemporaryDirectory() as output_directory:
+            Campaign(simulator, output_directory, 1e3, 1e3, stopping_rule=rule).run(number_of_workers=2)
+            simulations = analysis.read_simulations(output_directory)
+
+            # change the mutations of a scenario that led to an uncorrected error in one of the simulations
+            hit_seeds = {
+                seed: set(simulation_df.loc[simulation_df["mutated_parameter"].notna(), "scenario"])
+                for seed, simulation_df in simulations.items()
+            }
+            changed_scenario = sorted(set.union(*hit_seeds.values()))[0]
+            for task in simulator.tasks:
+                for scenario in task.scenarios:
+                    if scenario.name == changed_scenario:
+                        scenario.possible_parameter_mutation = [("increase", "L"), ("decrease", "L")]
+            campaign = Campaign(simulator, output_directory, 1e3, 1e3, stopping_rule=rule)
+            with self.assertRaises(RuntimeError):
+                campaign.run()
+            plan = campaign.plan_rerun()
+            self.assertListEqual(plan.scenarios, [changed_scenario])
+            self.assertFalse(plan.resimulate_all or plan.reevaluate)
+
+            campaign.rerun(number_of_workers=2)
+            for seed, simulation_df in analysis.read_simulations(output_directory).items():
+                if changed_scenario in hit_seeds[seed]:
+                    # the simulation is simulated again, as a new campaign would
+                    expected_df = pd.read_csv(io.StringIO(simulator.simulate(seed, 1e3, 1e3).to_csv(index=False)))
+                    pd.testing.assert_frame_equal(simulation_df, expected_df)
+                else:
+                    pd.testing.assert_frame_equal(simulation_df, simulations[seed])
+            self.assertTrue(campaign.plan_rerun().is_empty)
+
+            # a change of the structure only affects the failure probabilities of the error paths
+            simulations = analysis.read_simulations(output_directory)
+            parameters = simulator.structure.parameters
+            parameters[0] = dataclasses.replace(parameters[0], value=parameters[0].value * 1.1)
+            simulator.structure.parameters = parameters
+            simulator.initial_failure_probabilities = None
+            campaign = Campaign(simulator, output_directory, 1e3, 1e3, stopping_rule=rule)
+            plan = campaign.plan_rerun()
+            self.assertTrue(plan.reevaluate and plan.structure_changed and not plan.resimulate_all)
+            failure_modes = [failure_mode.__name__ for failure_mode in simulator.structure.failure_modes]
+            campaign.initial_failure_probabilities = {name: 0.5 for name in [*failure_modes, "total"]}
+            campaign.rerun(number_of_workers=2)
+            for seed, simulation_df in analysis.read_simulations(output_directory).items():
+                task_columns = ["task", "scenario", "mutated_parameter", "error_magnitude", "error_occurred"]
+                pd.testing.assert_frame_equal(simulation_df[task_columns], simulations[seed][task_columns])
+                self.assertEqual(simulation_df["total"].iloc[0], 0.5)
+        return
+
+    def test_rerun_after_editing_a_scenario_file(self):
+        rule = StoppingRule(targets={}, max_simulations=4)
+        with tempfile.TemporaryDirectory() as directory:
+            data_directory = os.path.join(directory, "data")
+            shutil.copytree(DATA_DIRECTORY, data_directory)
+            output_directory = os.path.join(directory, "output")
+            simulator = Simulator.load_from_directory(data_directory, number_of_initial_draws=1e4, include_check=False)
+            Campaign(simulator, output_directory, 1e3, 1e3, stopping_rule=rule).run(number_of_workers=2)
+
+            scenarios_file = os.path.join(data_directory, "scenarios.csv")
+            with open(scenarios_file) as f:
+                scenarios = f.read()
+            with open(scenarios_file, "w") as f:
+                f.write(scenarios.replace("Wrong boundary conditions,,,theta_E", "Wrong boundary conditions,,,L"))
+            simulator = Simulator.load_from_directory(data_directory, number_of_initial_draws=1e4, include_check=False)
+            plan = Campaign(simulator, output_directory, 1e3, 1e3, stopping_rule=rule).plan_rerun()
+            # the initial failure probabilities are reused, so the failure probabilities are not determined again
+            self.assertListEqual(plan.scenarios, ["D3-S1"])
+            self.assertFalse(plan.resimulate_all or plan.reevaluate)
+        return
+
+
+class CampaignSchedulerTest(TestCase):
+
+    def test_variants_share_work(self):
+        variants = [
+            Variant("check", DATA_DIRECTORY), Variant("no_check", DATA_DIRECTORY, include_check=False),
+            Variant("check_copy", DATA_DIRECTORY)
+        ]
+        with tempfile.TemporaryDirectory() as output_directory:
+            scheduler = CampaignScheduler(
+                variants, output_directory, number_of_seeds=6, number_of_parameter_draws=1e3,
+                number_of_initial_draws=1e4, seeds_per_job=3, max_batch_elements=1e5, states_per_chunk=4
+            )
+            estimates_df = scheduler.run(number_of_workers=2)
+            self.assertEqual(len(scheduler.groups), 1)
+            self.assertEqual(len(scheduler.groups[0]["simulators"]), 2)
+            self.assertListEqual(list(estimates_df.index.unique("variant")), ["check", "no_check", "check_copy"])
+
+            simulations = {
+                variant.name: analysis.read_simulations(os.path.join(output_directory, variant.name))
+                for variant in variants
+            }
+            for seed, simulation_df in simulations["check"].items():
+                pd.testing.assert_frame_equal(simulation_df, simulations["check_copy"][seed])
+                # without corrected errors, the error path is shared by the variant without check
+                if not simulation_df["error_corrected"].iloc[1:].astype(bool).any():
+                    pd.testing.assert_frame_equal(simulation_df, simulations["no_check"][seed])
+        return
+
+
+class ProfilerTest(TestCase):
+
+    def test_disabled_profiler_records_nothing(self):
+        disabled_profiler = Profiler()
+        with disabled_profiler.timer("timer"):
+            disabled_profiler.count("counter")
+        self.assertDictEqual(disabled_profiler.snapshot(), {"timers": {}, "counters": {}})
+        return
+
+    def test_pop_and_merge(self):
+        worker_profiler, main_profiler = Profiler(enabled=True), Profiler(enabled=True)
+        for _ in range(3):
+            with worker_profiler.timer("timer"):
+                worker_profiler.count("counter", 2)
+        main_profiler.merge(worker_profiler.pop())
+        main_profiler.merge({"timers": {"timer": {"seconds": 1.0, "calls": 1}}, "counters": {"counter": 1}})
+        self.assertDictEqual(worker_profiler.snapshot(), {"timers": {}, "counters": {}})
+        snapshot = main_profiler.snapshot()
+        self.assertEqual(snapshot["timers"]["timer"]["calls"], 4)
+        self.assertGreaterEqual(snapshot["timers"]["timer"]["seconds"], 1.0)
+        self.assertEqual(snapshot["counters"]["counter"], 7)
+        self.assertIn("counter", main_profiler.report())
+        return
+
+    def test_campaign_is_profiled(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        rule = StoppingRule(targets={}, max_simulations=4)
+        profiler.reset()
+        profiler.enabled = True
+        try:
+            with tempfile.TemporaryDirectory() as output_directory:
+                Campaign(simulator, output_directory, 1e3, 1e3, {"bendingMomentULS": 1e-4, "total": 1e-4}, rule).run(
+                    number_of_workers=2
+                )
+            snapshot = profiler.snapshot()
+        finally:
+            profiler.enabled = False
+            profiler.reset()
+        self.assertEqual(snapshot["counters"]["seeds"], 4)
+        self.assertEqual(snapshot["counters"]["tasks"], 4 * len(simulator.tasks))
+        self.assertEqual(snapshot["counters"]["initial_failure_probability_cache_hits"], 4)
+        for timer in ["simulate", "task", "hof_sampling", "check", "result_assembly", "write_results"]:
+            self.assertIn(timer, snapshot["timers"])
+        return
+
+
+class ServiceTest(TestCase):
+
+    def test_client_queries_served_simulator(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        service = SimulationService(simulator, 1e3, 1e3, number_of_workers=2)
+        server = serve(service, port=0, background=True)
+        try:
+            client = SimulationClient(f"http://127.0.0.1:{server.server_address[1]}", timeout=60)
+            info = client.info()
+            self.assertTrue(info["check"])
+            self.assertSetEqual(set(info["initial_failure_probabilities"]), {*info["failure_modes"], "total"})
+
+            failure_probabilities = client.failure_probabilities(multipliers={"L": 1.5}, seed=1)
+            expected = service.failure_probabilities(multipliers={"L": 1.5}, seed=1)
+            self.assertDictEqual(failure_probabilities.to_dict(), expected)
+            with self.assertRaises(RuntimeError):
+                client.failure_probabilities(values={"no_parameter": 1.0})
+
+            # the simulations without a check equal those of a simulator without a check
+            simulations = client.simulate([2, 1], check=False)
+            self.assertListEqual(list(simulations), [1, 2])
+            unchecked_simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+            expected_df = unchecked_simulator.simulate(2, 1e3, 1e3, simulator.initial_failure_probabilities)
+            np.testing.assert_array_equal(
+                simulations[2]["total"].to_numpy(float), expected_df["total"].to_numpy(float)
+            )
+            self.assertEqual(len(client.run(3, first_seed=5)), 3)
+            with self.assertRaises(RuntimeError):
+                client.run(service.max_number_of_seeds + 1)
+
+            # requests that a web page can send (without a preflight) or a rebound domain are refused
+            url = f"http://127.0.0.1:{server.server_address[1]}/run"
+            for headers, status in [
+                ({"Content-Type": "text/plain"}, 415),
+                ({"Content-Type": "application/json", "Origin": "http://example.com"}, 403),
+                ({"Content-Type": "application/json", "Host": "attacker.example.com"}, 403),
+            ]:
+                request = urllib.request.Request(url, data=b'{"number_of_seeds": 1}', headers=headers)
+                with self.assertRaises(urllib.error.HTTPError) as context:
+                    urllib.request.urlopen(request, timeout=60)
+                self.assertEqual(context.exception.code, status)
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+        return
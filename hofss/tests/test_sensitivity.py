@@ -0,0 +1,69 @@
+import os
+import tracemalloc
+from unittest import TestCase
+import numpy as np
+
+from ..src import Simulator
+from .. import sensitivity
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+class SobolEstimatesTest(TestCase):
+
+    def test_saltelli_design(self):
+        design = sensitivity.saltelli_design(3, 10, np.random.default_rng(1))
+        self.assertEqual(design.shape, (5, 10, 3))
+        np.testing.assert_array_equal(design[2][:, 1:], design[0][:, 1:])
+        np.testing.assert_array_equal(design[2][:, 0], design[1][:, 0])
+        return
+
+    def test_additive_function(self):
+        design = sensitivity.saltelli_design(3, 20000, np.random.default_rng(2))
+        outputs = design[:, :, 0] + 2 * design[:, :, 1]
+        first_order, total = sensitivity._sobol_estimates(outputs)
+        np.testing.assert_allclose(first_order, [0.2, 0.8, 0.0], atol=0.03)
+        np.testing.assert_allclose(total, [0.2, 0.8, 0.0], atol=0.03)
+        return
+
+
+class SobolIndicesTest(TestCase):
+
+    def test_sobol_indices(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        inputs = [
+            sensitivity.SensitivityInput("check", "check", None, 0.8, 1.2),
+            sensitivity.SensitivityInput("L", "parameter", "L", 0.9, 1.1),
+            sensitivity.SensitivityInput("alpha", "parameter", "alpha", 0.9, 1.1),
+        ]
+        indices = sensitivity.sobol_indices(
+            simulator, inputs, number_of_samples=8, seeds=range(1, 11), number_of_parameter_draws=1e4,
+            parameter_draw_batch_size=1e4, number_of_resamples=20, seed=3
+        )
+        self.assertListEqual(list(indices.index), ["check", "L", "alpha"])
+        self.assertGreater(indices.loc["L", "ST"], indices.loc["alpha", "ST"])
+        self.assertEqual(indices.loc["alpha", "ST"], 0.0)
+        return
+
+    def test_all_inputs_in_bounded_memory(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        inputs = sensitivity.default_inputs(simulator)
+        tracemalloc.start()
+        try:
+            indices = sensitivity.sobol_indices(
+                simulator, inputs, number_of_samples=4, seeds=range(1, 6), number_of_parameter_draws=2e4,
+                parameter_draw_batch_size=2e4, number_of_resamples=20, seed=3, states_per_chunk=32,
+                max_batch_elements=1e5
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertListEqual(list(indices.index), [model_input.name for model_input in inputs])
+        # each of the hundreds of scaled final states has its own values of all random parameters
+        self.assertLess(peak, 40e6)
+        return
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            sensitivity.SensitivityInput("x", "unknown")
+        return
@@ -0,0 +1,522 @@
+import os
+import copy
+import math
+import pickle
+import shutil
+import itertools
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+
+from ..src import Simulator, StratifiedErrorBiasing, NestedEstimator, LatinHypercubeDesign, SurrogateLimitState
+from ..src import profiler
+from ..src import base_sample
+from ..src.system_reliability import ditlevsen_bounds
+from ..failure_modes import bendingMomentULS
+from ..data_structures import FactorLevel
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def deflectionSLS(h, theta_E, p_d, p_G, L, **kwargs):
+    """a synthetic serviceability failure mode, which does not depend on the reinforcement"""
+    return 2.2e-4 * (h / 200) ** 3 * (5000 / L) ** 4 - theta_E * (p_d + p_G) / 2.5
+
+
+class StructureStateTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+        return super().setUpClass()
+
+    def test_state_draws_match_parameter_draws(self):
+        structure = self.simulator.structure
+        state_draws = structure.draw_parameter_values(100, structure.initial_state(), np.random.default_rng(5))
+        parameter_draws = structure.make_copy(np.random.default_rng(5)).draw_parameter_values(100)
+        self.assertListEqual(list(state_draws), list(parameter_draws))
+        for name, draws in state_draws.items():
+            np.testing.assert_array_equal(draws, parameter_draws[name])
+        return
+
+    def test_state_update_matches_parameter_update(self):
+        structure = self.simulator.structure
+        task = self.simulator.tasks[0]
+        task_result = {"scenario": task.scenarios[0], "complexity_level": FactorLevel.MODERATE}
+        state = structure.initial_state()
+        mutated_parameter, error_magnitude = structure.update_state(state, task_result, np.random.default_rng(3))
+        structure_copy = structure.make_copy()
+        parameter_update = structure_copy.update_parameters(task_result, np.random.default_rng(3))
+        self.assertTupleEqual(parameter_update, (mutated_parameter, error_magnitude))
+        self.assertTupleEqual(state.as_tuple(), tuple(parameter.value for parameter in structure_copy.parameters))
+        self.assertNotEqual(state.as_tuple(), structure.initial_state().as_tuple())
+        return
+
+
+class TwoPhaseSimulationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+        cls.initial_failure_probabilities = cls.simulator.structure.calculate_failure_probabilities(1e4, 1e4)
+        return super().setUpClass()
+
+    def test_error_path_is_reproducible(self):
+        path_df_1, states_1 = self.simulator.simulate_error_path(3)
+        path_df_2, states_2 = self.simulator.simulate_error_path(3)
+        self.assertEqual(states_1, states_2)
+        self.assertListEqual(list(path_df_1["state"]), list(path_df_2["state"]))
+        self.assertEqual(len(path_df_1), len(self.simulator.tasks) + 1)
+        self.assertEqual(len(states_1), 1 + int(path_df_1["mutated_parameter"].notna().sum()))
+        return
+
+    def test_two_phase_matches_simulate_layout(self):
+        results = self.simulator.simulate_two_phase(
+            [1, 2, 3], 1e4, 1e4, self.initial_failure_probabilities, seed=1
+        )
+        reference = self.simulator.simulate(1, 1e3, 1e3, self.initial_failure_probabilities)
+        self.assertListEqual(sorted(results), [1, 2, 3])
+        for simulation_df in results.values():
+            self.assertListEqual(list(simulation_df.columns), list(reference.columns))
+            self.assertEqual(len(simulation_df), len(reference))
+            self.assertEqual(simulation_df["total"].iloc[0], self.initial_failure_probabilities["total"])
+        return
+
+    def test_chunks_share_base_variates(self):
+        error_paths = {path_seed: self.simulator.simulate_error_path(path_seed) for path_seed in range(1, 9)}
+        results = self.simulator.evaluate_error_paths(error_paths, 1e4, 1e4, self.initial_failure_probabilities, 1)
+        chunked_results = self.simulator.evaluate_error_paths(
+            error_paths, 1e4, 1e4, self.initial_failure_probabilities, 1, states_per_chunk=2
+        )
+        for path_seed, simulation_df in results.items():
+            pd.testing.assert_frame_equal(chunked_results[path_seed], simulation_df)
+        return
+
+    def test_identical_states_share_failure_probabilities(self):
+        initial_state = tuple(parameter.value for parameter in self.simulator.structure.parameters)
+        failure_probabilities = self.simulator.structure.calculate_failure_probabilities_batch(
+            [initial_state, initial_state], 1e4, 5e3, seed=2
+        )
+        self.assertEqual(len(failure_probabilities), 2)
+        self.assertListEqual(list(failure_probabilities.iloc[0]), list(failure_probabilities.iloc[1]))
+        return
+
+    def test_batch_memory_is_bounded(self):
+        initial_state = self.simulator.structure.initial_state()
+        states = np.tile(initial_state.values, (200, 1))
+        states[:, initial_state.index["h"]] = np.linspace(150, 250, 200)  # every state has its own sample of h
+        tracemalloc.start()
+        try:
+            self.simulator.structure.calculate_failure_probabilities_batch(states, 1e5, 1e5, max_batch_elements=1e5)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # one sample of h per state would take 160 MB, a pass takes a few draws per parameter of 1e5 draws
+        self.assertLess(peak, 40e6)
+        return
+
+    def test_biased_simulation_records_likelihood_ratio(self):
+        biasing = StratifiedErrorBiasing({2: 1.0})
+        simulation_df = self.simulator.simulate(4, 1e3, 1e3, self.initial_failure_probabilities, biasing=biasing)
+        self.assertIn("likelihood_ratio", simulation_df.columns)
+        self.assertEqual(simulation_df["likelihood_ratio"].nunique(), 1)
+        self.assertEqual(simulation_df["mutated_parameter"].notna().sum(), 2)
+        return
+
+
+class LatinHypercubeDesignTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+        return super().setUpClass()
+
+    def test_every_stratum_is_sampled_once_per_batch(self):
+        design = LatinHypercubeDesign(self.simulator.tasks, batch_size=20, first_seed=1)
+        draws = np.stack([np.concatenate(design.factor_draws(seed)) for seed in range(21, 41)])
+        strata = np.sort(np.floor(draws * 20).astype(int), axis=0)
+        np.testing.assert_array_equal(strata, np.broadcast_to(np.arange(20)[:, None, None], strata.shape))
+        np.testing.assert_array_equal(design.factor_draws(25)[3], design.factor_draws(25)[3])
+        return
+
+    def test_simulation_uses_design_draws(self):
+        design = LatinHypercubeDesign(self.simulator.tasks, batch_size=10)
+        path_df, _ = self.simulator.simulate_error_path(4, record_draws=True, factor_design=design)
+        factor = self.simulator.tasks[2].task_type.factors[1]
+        self.assertEqual(path_df[f"{factor.name}_effect_draw"].iloc[3], design.factor_draws(4)[2][1, 0])
+        return
+
+    def test_mean_hep_converges_faster(self):
+        task = self.simulator.tasks[0]
+        number_of_seeds, number_of_repeats = 50, 20
+        independent_means, stratified_means = [], []
+        rng = np.random.default_rng(1)
+        for repeat in range(number_of_repeats):
+            design = LatinHypercubeDesign([task], batch_size=number_of_seeds, seed=repeat)
+            independent_means.append(np.mean([task.determine_hep(rng)["hep"] for _ in range(number_of_seeds)]))
+            stratified_means.append(np.mean([
+                task.determine_hep(factor_draws=design.factor_draws(seed)[0])["hep"]
+                for seed in range(1, number_of_seeds + 1)
+            ]))
+        self.assertLess(np.var(stratified_means), np.var(independent_means))
+        return
+
+
+class SurrogateLimitStateTest(TestCase):
+
+    def test_surrogate_classifies_like_the_failure_function(self):
+        structure = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False).structure
+        surrogate = SurrogateLimitState(bendingMomentULS, seed=1)
+        number_of_draws = 20000
+        for name, multiplier in [("p_d", 5.0), ("h", 0.8)]:
+            state = structure.initial_state()
+            state.multiply(name, multiplier)
+            parameter_values = structure.draw_parameter_values(number_of_draws, state, np.random.default_rng(1))
+            failures = bendingMomentULS(**parameter_values) < 0
+            surrogate_failures = surrogate(**parameter_values) < 0
+            self.assertGreater(np.sum(failures), 0)
+            self.assertLessEqual(np.sum(failures != surrogate_failures), 0.05 * np.sum(failures))
+        self.assertEqual(surrogate.number_of_calls, 2)
+        self.assertLess(surrogate.number_of_evaluations, 0.02 * number_of_draws)
+        return
+
+
+class BaseSampleTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.structure = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False).structure
+        cls.base_sample = cls.structure.retain_base_sample(2e5, seed=1)
+        return super().setUpClass()
+
+    def test_reweighted_failure_probability(self):
+        state = self.structure.initial_state()
+        state.multiply("theta_E", 1.2)
+        failure_probabilities = self.structure.calculate_failure_probabilities(2e5, 2e5, state)
+        self.assertDictEqual(dict(failure_probabilities), self.base_sample.failure_probabilities(state))
+        exact = Simulator.parse_from_directory(DATA_DIRECTORY).structure.calculate_failure_probabilities(
+            2e6, 1e6, state, np.random.default_rng(1)
+        )
+        self.assertAlmostEqual(failure_probabilities["total"], exact["total"], delta=0.2 * exact["total"])
+        return
+
+    def test_fallbacks(self):
+        deterministic_state = self.structure.initial_state()
+        deterministic_state.multiply("A_s", 0.9)
+        self.assertIsNone(self.base_sample.failure_probabilities(deterministic_state))
+        distant_state = self.structure.initial_state()
+        distant_state.multiply("f_yd", 0.5)
+        self.assertIsNone(self.base_sample.failure_probabilities(distant_state))
+        self.assertGreater(self.structure.calculate_failure_probabilities(1e4, 1e4, distant_state)["total"], 0)
+        return
+
+    def test_copy_draws_the_same_sample(self):
+        state = self.structure.initial_state()
+        state.multiply("p_d", 1.1)
+        copied_base_sample = pickle.loads(pickle.dumps(self.base_sample))
+        self.assertDictEqual(
+            copied_base_sample.failure_probabilities(state), self.base_sample.failure_probabilities(state)
+        )
+        return
+
+    def test_only_the_last_redrawn_sample_is_kept(self):
+        copied_base_sample = pickle.loads(pickle.dumps(self.base_sample))
+        self.assertIs(pickle.loads(pickle.dumps(self.base_sample))._sample, copied_base_sample._sample)
+        other_base_sample = self.structure.make_copy().retain_base_sample(1e4, seed=2)
+        pickle.loads(pickle.dumps(other_base_sample))
+        self.assertListEqual(list(base_sample._redrawn_samples), [other_base_sample._key()])
+        return
+
+
+class SweepTest(TestCase):
+
+    def test_sweep_matches_batch(self):
+        structure = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False).structure
+        sweep_df = structure.sweep(
+            {"h": [180, 220], "A_s": [400, 500, 600]}, errors={"long span": {"L": 1.2}}, number_of_iterations=1e4,
+            seed=1
+        )
+        self.assertEqual(len(sweep_df), 2 * 6 * 2)  # errors, design points and failure modes (with the total)
+        state = structure.initial_state()
+        state.values[state.index["h"]], state.values[state.index["A_s"]] = 220, 400
+        state.multiply("L", 1.2)
+        expected = structure.calculate_failure_probabilities_batch([state.as_tuple()], 1e4, seed=1).loc[0, "total"]
+        row = sweep_df.query("h == 220 and A_s == 400 and error == 'long span' and failure_mode == 'total'")
+        self.assertEqual(row["failure_probability"].item(), expected)
+        self.assertAlmostEqual(row["standard_error"].item(), np.sqrt(expected * (1 - expected) / 1e4))
+        with self.assertRaises(ValueError):
+            structure.sweep({"no_parameter": [1.0]})
+        return
+
+    def test_large_grid_in_bounded_memory(self):
+        structure = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False).structure
+        grid = {"h": np.linspace(150, 250, 100), "A_s": [400, 500]}
+        errors = {"thin": {"h": 0.9}, "thick": {"h": 1.1}}
+        tracemalloc.start()
+        try:
+            sweep_df = structure.sweep(
+                grid, errors, number_of_iterations=2e4, seed=1, max_batch_elements=1e5, states_per_chunk=100
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(sweep_df), 3 * 200 * 2)
+        # 300 distinct values of h, with 2e4 draws each, would take 48 MB
+        self.assertLess(peak, 30e6)
+        return
+
+
+class SystemReliabilityTest(TestCase):
+
+    def test_ditlevsen_bounds(self):
+        failure_probabilities = [0.01, 0.02]
+        lower, upper = ditlevsen_bounds(failure_probabilities, np.eye(2))
+        independent = 0.01 + 0.02 - 0.01 * 0.02  # the exact failure probability of independent modes
+        self.assertLessEqual(lower, independent)
+        self.assertAlmostEqual(upper, independent)
+        self.assertTupleEqual(ditlevsen_bounds(failure_probabilities, np.ones((2, 2))), (0.02, 0.02))
+        return
+
+    def test_unaffected_modes_are_reused(self):
+        structure = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False).structure
+        structure.failure_modes = [bendingMomentULS, deflectionSLS]
+        system_reliability = structure.use_system_reliability(max_relative_width=0.2, seed=1)
+        self.assertListEqual(system_reliability.mode_parameters[1], sorted(
+            ["h", "theta_E", "p_d", "p_G", "L"], key=structure.initial_state().names.index
+        ))
+        structure.calculate_failure_probabilities(1e5, 1e5)
+
+        # the reinforcement only affects the bending mode, the total is bounded
+        state = structure.initial_state()
+        state.multiply("A_s", 0.8)
+        profiler.reset()
+        profiler.enabled = True
+        try:
+            failure_probabilities = structure.calculate_failure_probabilities(1e5, 1e5, state)
+            counters = profiler.snapshot()["counters"]
+        finally:
+            profiler.enabled = False
+            profiler.reset()
+        self.assertEqual(counters["failure_mode_cache_hits"], 1)
+        self.assertEqual(counters["system_reliability_bounds"], 1)
+        modes = failure_probabilities[["bendingMomentULS", "deflectionSLS"]]
+        self.assertGreaterEqual(failure_probabilities["total"], modes.max())
+        self.assertLessEqual(failure_probabilities["total"], modes.sum())
+
+        # the bounds contain the total of joint sampling, up to its standard error
+        bounds = system_reliability.total_bounds(state, 1e5)
+        lower, upper = bounds["second_order"]
+        self.assertLessEqual(bounds["first_order"][0], lower)
+        self.assertGreaterEqual(bounds["first_order"][1], upper)
+        self.assertAlmostEqual(failure_probabilities["total"], (lower + upper) / 2)
+        structure.system_reliability = None
+        joint_total = structure.calculate_failure_probabilities(1e6, 1e6, state, np.random.default_rng(1))["total"]
+        standard_error = math.sqrt(joint_total * (1 - joint_total) / 1e6) + math.sqrt(upper * (1 - upper) / 1e5)
+        self.assertGreater(joint_total, lower - 3 * standard_error)
+        self.assertLess(joint_total, upper + 3 * standard_error)
+
+        structure.system_reliability = system_reliability
+        structure.failure_modes = [bendingMomentULS]
+        self.assertIsNone(structure.system_reliability)
+        return
+
+
+class StreamingTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        cls.initial_failure_probabilities = {"bendingMomentULS": 1.5e-4, "total": 1.5e-4}
+        return super().setUpClass()
+
+    def test_records_match_simulate(self):
+        records = list(self.simulator.iter_simulate(2, 1e3, 1e3, self.initial_failure_probabilities))
+        simulation_df = self.simulator.simulate(2, 1e3, 1e3, self.initial_failure_probabilities)
+        self.assertEqual(len(records), len(self.simulator.tasks) + 1)
+        self.assertListEqual([record.get("task") for record in records[1:]], list(simulation_df["task"].iloc[1:]))
+        self.assertListEqual([record["total"] for record in records], list(simulation_df["total"]))
+        return
+
+    def test_early_stop_is_profiled(self):
+        profiler.reset()
+        profiler.enabled = True
+        try:
+            records = self.simulator.iter_simulate(2, 1e3, 1e3, self.initial_failure_probabilities)
+            list(itertools.islice(records, 3))  # the initial record and two tasks
+            records.close()
+            snapshot = profiler.snapshot()
+        finally:
+            profiler.enabled = False
+            profiler.reset()
+        self.assertEqual(snapshot["counters"]["seeds"], 1)
+        self.assertEqual(snapshot["counters"]["tasks"], 2)
+        self.assertIn("simulate", snapshot["timers"])
+        return
+
+    def test_stream_stops_early(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stream = self.simulator.simulate_seeds(
+                itertools.count(1), 1e3, 1e3, self.initial_failure_probabilities, executor=executor,
+                number_of_workers=2
+            )
+            seeds = [seed for seed, _ in itertools.islice(stream, 5)]
+            stream.close()
+        self.assertEqual(len(set(seeds)), 5)
+        serial_seeds = [seed for seed, _ in self.simulator.simulate_seeds(
+            [3, 4], 1e3, 1e3, self.initial_failure_probabilities
+        )]
+        self.assertListEqual(serial_seeds, [3, 4])
+        return
+
+
+class ReweightTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=True)
+        initial_failure_probabilities = cls.simulator.structure.calculate_failure_probabilities(1e3, 1e3)
+        cls.simulations = cls.simulator.simulate_two_phase(
+            range(1, 21), 1e3, 1e3, initial_failure_probabilities, seed=1, record_draws=True
+        )
+        return super().setUpClass()
+
+    def test_unmodified_model_has_unit_weights(self):
+        weights = self.simulator.reweight(self.simulations)
+        self.assertListEqual(list(weights.index), list(range(1, 21)))
+        np.testing.assert_allclose(weights.to_numpy(), 1.0)
+        return
+
+    def test_check_effectiveness(self):
+        weights = self.simulator.reweight(self.simulations, check_effectiveness=self.simulator.check.effectiveness)
+        np.testing.assert_allclose(weights.to_numpy(), 1.0)
+
+        weights = self.simulator.reweight(self.simulations, check_effectiveness=0.5)
+        for seed, simulation_df in self.simulations.items():
+            errors = simulation_df["error_occurred"].iloc[1:].astype(bool)
+            corrections = simulation_df["error_corrected"].iloc[1:].astype(bool)
+            expected = (0.5 / 0.72) ** corrections.sum() * (0.5 / 0.28) ** (errors & ~corrections).sum()
+            self.assertAlmostEqual(weights[seed], expected)
+        return
+
+    def test_nhep(self):
+        task_type = self.simulator.tasks[0].task_type
+        weights = self.simulator.reweight(self.simulations, nheps={task_type.name: 2 * task_type.nhep})
+        self.assertFalse(np.allclose(weights.to_numpy(), 1.0))
+        return
+
+    def test_degenerate_check_effectiveness(self):
+        for check_effectiveness in [0.0, 1.0]:
+            weights = self.simulator.reweight(self.simulations, check_effectiveness=check_effectiveness)
+            self.assertTrue(np.all(np.isfinite(weights.to_numpy())))
+            self.assertTrue(np.any(weights.to_numpy() == 0.0))
+
+        simulator = copy.copy(self.simulator)
+        simulator.check = copy.copy(self.simulator.check)
+        simulator.check.effectiveness = 1.0
+        weights = simulator.reweight(self.simulations, check_effectiveness=0.5)
+        self.assertTrue(np.all(np.isfinite(weights.to_numpy())))
+        return
+
+    def test_errors_follow_the_error_draws(self):
+        # an error without a scenario to apply is not reported, but it did occur with the probability of the HEP
+        simulations = {seed: simulation_df.copy() for seed, simulation_df in self.simulations.items()}
+        for simulation_df in simulations.values():
+            simulation_df["error_occurred"] = False
+            simulation_df["error_corrected"] = False
+        task_type = self.simulator.tasks[0].task_type
+        nheps = {task_type.name: 2 * task_type.nhep}
+        pd.testing.assert_series_equal(
+            self.simulator.reweight(simulations, nheps=nheps), self.simulator.reweight(self.simulations, nheps=nheps)
+        )
+        return
+
+
+class NestedEstimatorTest(TestCase):
+
+    def test_run(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+        initial_failure_probabilities = simulator.structure.calculate_failure_probabilities(1e4, 1e4)
+        estimator = NestedEstimator(
+            simulator, initial_failure_probabilities, number_of_pilot_draws=1e3, max_number_of_draws=1e5, seed=1
+        )
+        estimate = estimator.run(1e-3, number_of_pilot_samples=10, max_number_of_samples=30)
+        number_of_draws, _ = estimator.allocation(1e-3)
+        self.assertGreaterEqual(number_of_draws, 1e3)
+        self.assertLessEqual(number_of_draws, 1e5)
+        self.assertAlmostEqual(estimate["estimate"], np.mean(estimator.samples))
+        self.assertEqual(estimator.next_seed, 1 + estimate["number_of_samples"])
+        self.assertGreaterEqual(estimate["outer_variance"], 0)
+        return
+
+    def test_allocation_balances_inner_and_outer_variance(self):
+        simulator = Simulator.parse_from_directory(DATA_DIRECTORY, include_check=False)
+        estimator = NestedEstimator(simulator, {"total": 0.0}, number_of_pilot_draws=10, max_number_of_draws=1e6)
+        # synthetic pilot samples of 1e4 inner draws, which take 100 times as long as their error paths
+        estimator.samples = [0.49, 0.51] * 50
+        estimator.number_of_draws = [10000] * 100
+        estimator.path_costs, estimator.inner_costs = [1.0] * 100, [100.0] * 100
+        outer_variance, inner_variance = estimator.variances()
+        self.assertAlmostEqual(inner_variance, 0.2499 * 10000 / 9999)
+        self.assertAlmostEqual(outer_variance, np.var(estimator.samples, ddof=1) - inner_variance / 10000)
+        number_of_draws, number_of_samples = estimator.allocation(1e-3)
+        self.assertEqual(number_of_draws, int(math.sqrt(inner_variance / (0.01 * outer_variance))))
+        self.assertEqual(
+            number_of_samples, math.ceil((outer_variance + inner_variance / number_of_draws) / 1e-3 ** 2)
+        )
+        return
+
+
+class SnapshotTest(TestCase):
+
+    def test_snapshot_is_reused_until_an_input_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            data_directory = os.path.join(directory, "data")
+            shutil.copytree(DATA_DIRECTORY, data_directory)
+            snapshot_file = os.path.join(directory, "snapshot.pkl")
+
+            simulator = Simulator.load_from_directory(data_directory, snapshot_file, number_of_initial_draws=1e4)
+            snapshot_time = os.path.getmtime(snapshot_file)
+            loaded_simulator = Simulator.load_from_directory(data_directory, snapshot_file, 1e4)
+            self.assertEqual(os.path.getmtime(snapshot_file), snapshot_time)
+            self.assertDictEqual(
+                loaded_simulator.initial_failure_probabilities, simulator.initial_failure_probabilities
+            )
+            self.assertListEqual(
+                list(loaded_simulator.simulate(4, 1e3, 1e3)["total"]), list(simulator.simulate(4, 1e3, 1e3)["total"])
+            )
+
+            # a changed input file invalidates the snapshot of the model
+            with open(os.path.join(data_directory, "tasks.csv"), "a") as f:
+                f.write("\n")
+            reparsed_simulator = Simulator.load_from_directory(data_directory, snapshot_file)
+            self.assertNotEqual(os.path.getmtime(snapshot_file), snapshot_time)
+            self.assertIsNone(reparsed_simulator.initial_failure_probabilities)
+        return
+
+    def test_initial_failure_probabilities_depend_on_the_structure_only(self):
+        with tempfile.TemporaryDirectory() as directory:
+            data_directory = os.path.join(directory, "data")
+            shutil.copytree(DATA_DIRECTORY, data_directory)
+            snapshot_file = os.path.join(directory, "snapshot.pkl")
+            failure_probabilities_file = os.path.join(directory, "snapshot_initial_failure_probabilities.pkl")
+
+            simulator = Simulator.load_from_directory(data_directory, snapshot_file, 1e4)
+            snapshot_time = os.path.getmtime(failure_probabilities_file)
+            with open(os.path.join(data_directory, "scenarios.csv"), "a") as f:
+                f.write("\n")
+            reparsed_simulator = Simulator.load_from_directory(data_directory, snapshot_file, 1e4)
+            self.assertEqual(os.path.getmtime(failure_probabilities_file), snapshot_time)
+            self.assertDictEqual(
+                reparsed_simulator.initial_failure_probabilities, simulator.initial_failure_probabilities
+            )
+
+            # determined again, the initial failure probabilities are reproduced
+            os.remove(failure_probabilities_file)
+            reloaded_simulator = Simulator.load_from_directory(data_directory, snapshot_file, 1e4)
+            self.assertDictEqual(
+                reloaded_simulator.initial_failure_probabilities, simulator.initial_failure_probabilities
+            )
+        return